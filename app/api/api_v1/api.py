@@ -1,9 +1,26 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import kanji, compound_word, example_sentence, kanji_dict
+from app.api.api_v1.endpoints import (
+    kanji,
+    compound_word,
+    example_sentence,
+    kanji_dict,
+    text_annotation,
+    facet,
+    quiz,
+    sync,
+    related_kanji,
+    coverage,
+)
 
 api_router = APIRouter()
 api_router.include_router(kanji.router, prefix="/kanjis", tags=["kanjis"])
 api_router.include_router(compound_word.router, prefix="/compound-words", tags=["compound words"])
 api_router.include_router(example_sentence.router, prefix="/example-sentences", tags=["example sentences"])
-api_router.include_router(kanji_dict.router, prefix="/kanji-dictionaries", tags=["kanji dictionaries"])
\ No newline at end of file
+api_router.include_router(kanji_dict.router, prefix="/kanji-dictionaries", tags=["kanji dictionaries"])
+api_router.include_router(text_annotation.router, prefix="/text-annotations", tags=["text annotations"])
+api_router.include_router(facet.router, prefix="/facets", tags=["facets"])
+api_router.include_router(quiz.router, prefix="/quiz", tags=["quiz"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(related_kanji.router, prefix="/related-kanji", tags=["related kanji"])
+api_router.include_router(coverage.router, prefix="/coverage", tags=["coverage"])
\ No newline at end of file
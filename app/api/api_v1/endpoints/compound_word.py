@@ -1,6 +1,6 @@
 from typing import Optional, List, Any
 
-from fastapi import APIRouter, Body, Depends, Path, Query, HTTPException, Response
+from fastapi import APIRouter, Body, Depends, Path, Query, HTTPException, Request, Response
 from loguru import logger
 from starlette.status import (
     HTTP_201_CREATED,
@@ -10,10 +10,12 @@ from starlette.status import (
     HTTP_422_UNPROCESSABLE_ENTITY,
 )
 from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.responses import StreamingResponse
 
 from app import models
-from app.services import compound_word_service
-from app.db.mongodb import get_database
+from app.core.config import settings
+from app.services import compound_word_service, export_service
+from app.db.mongodb import get_database, get_read_database
 
 router = APIRouter()
 
@@ -21,14 +23,17 @@ router = APIRouter()
 @router.get("/", response_model=List[models.CompoundWordInDb])
 async def get_compound_word_items(
     *,
-    db: AsyncIOMotorClient = Depends(get_database),
+    db: AsyncIOMotorClient = Depends(get_read_database("lists")),
     related_kanji: Optional[List[str]] = Query(None),
     ratings: Optional[List[int]] = Query(None),
     offset: Optional[int] = Query(0),
     limit: Optional[int] = Query(100),
+    total_count: Optional[models.TotalCountEnum] = Query(None),
+    response: Response,
 ):
     """
-    Get a list of all compound_words in the database.
+    Get a list of all compound_words in the database. With total_count set to estimated or exact, the
+    X-Total-Count header has the number of matching compound_words without offset and limit.
     """
     logger.debug(">>>>")
     filters = models.CompoundWordFilterParams()
@@ -41,10 +46,46 @@ async def get_compound_word_items(
     filters.limit = limit
 
     compound_words = await compound_word_service.get_compound_words(db, filters)
+    if total_count:
+        count = await compound_word_service.count_compound_words(db, filters, total_count)
+        response.headers["X-Total-Count"] = str(count)
 
     return compound_words
 
 
+@router.get("/export/", response_class=StreamingResponse)
+async def export_compound_words(
+    *,
+    request: Request,
+    db: AsyncIOMotorClient = Depends(get_read_database("lists")),
+    export_format: models.ExportFormatEnum = Query(models.ExportFormatEnum.ndjson, alias="format"),
+    related_kanji: Optional[List[str]] = Query(None),
+    ratings: Optional[List[int]] = Query(None),
+    offset: Optional[int] = Query(0),
+    limit: Optional[int] = Query(0),
+):
+    """
+    Export compound words as NDJSON, CSV or Anki TSV with the filters of the list endpoint. All matching
+    documents are exported by default. The output is streamed, gzip compressed when the client accepts it.
+    """
+    logger.debug(">>>>")
+    filters = models.CompoundWordFilterParams(
+        related_kanji=related_kanji or [], ratings=ratings or [], offset=offset, limit=limit
+    )
+    compress = export_service.accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {
+        "Content-Disposition": f'attachment; filename="compound_words.{export_format.value}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    content = export_service.export_items(
+        db, settings.MONGO_COMPOUND_WORD_COLLECTION, "compound_word", filters, export_format, compress
+    )
+    return StreamingResponse(content, media_type=export_service.MEDIA_TYPES[export_format], headers=headers)
+
+
 @router.get("/{doc_id}", response_model=models.CompoundWordInDb)
 async def get_compound_word_by_id(*, db: AsyncIOMotorClient = Depends(get_database), doc_id: str) -> Any:
     """
@@ -115,3 +156,20 @@ async def update_compound_word(
     )
 
     return updated_compound_word
+
+
+@router.put("/{doc_id}/rating", response_model=models.ItemRating)
+async def update_compound_word_rating(
+    *, db: AsyncIOMotorClient = Depends(get_database), doc_id: str, ratingUpdate: models.RatingUpdate
+):
+    """
+    Update the rating of a single compound_word document. The rating is buffered and written to the database
+    within RATING_FLUSH_INTERVAL_SECONDS, reads see it right away.
+    Returns the doc_id and the new rating.
+    """
+    item_rating = await compound_word_service.update_compound_word_rating(db, doc_id, ratingUpdate.rating)
+
+    if not item_rating:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=f"Compound word '{doc_id}' not found.")
+
+    return item_rating
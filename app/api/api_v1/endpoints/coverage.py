@@ -0,0 +1,49 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from loguru import logger
+
+from app import models
+from app.services import coverage_service
+
+router = APIRouter()
+
+
+def get_coverage_filters(
+    jlpt_levels: Optional[List[str]] = Query(None),
+    min_compound_words: Optional[int] = Query(None, ge=0),
+    max_compound_words: Optional[int] = Query(None, ge=0),
+    min_example_sentences: Optional[int] = Query(None, ge=0),
+    max_example_sentences: Optional[int] = Query(None, ge=0),
+    sort: models.CoverageSortEnum = Query(models.CoverageSortEnum.jouyou_number),
+    descending: bool = Query(False),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0),
+) -> models.CoverageFilterParams:
+    filters = models.CoverageFilterParams(
+        min_compound_words=min_compound_words,
+        max_compound_words=max_compound_words,
+        min_example_sentences=min_example_sentences,
+        max_example_sentences=max_example_sentences,
+        sort=sort,
+        descending=descending,
+        offset=offset,
+        limit=limit,
+    )
+    if jlpt_levels:
+        filters.jlpt_levels = jlpt_levels
+
+    return filters
+
+
+@router.get("/", response_model=models.CoverageStats)
+async def get_coverage_stats(*, filters: models.CoverageFilterParams = Depends(get_coverage_filters)):
+    """
+    Get the number of compound words and example sentences related to every kanji, in total and per rating,
+    with the coverage per JLPT level. For example max_example_sentences=2 lists the kanji with fewer than
+    three example sentences. Served from in-memory counters.
+    """
+    logger.debug(">>>>")
+    stats = await coverage_service.get_coverage_stats(filters)
+
+    return stats
@@ -0,0 +1,33 @@
+from typing import Optional, List
+
+from fastapi import APIRouter, Depends, Query
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import models
+from app.services import facet_service
+from app.db.mongodb import get_read_database
+
+router = APIRouter()
+
+
+@router.get("/", response_model=models.Facets)
+async def get_facets(
+    *,
+    db: AsyncIOMotorClient = Depends(get_read_database("lists")),
+    related_kanji: Optional[List[str]] = Query(None),
+    ratings: Optional[List[int]] = Query(None),
+):
+    """
+    Get counts per kanji attribute, rating and related kanji for the filter sidebar.
+    """
+    logger.debug(">>>>")
+    filters = models.FacetFilterParams()
+    if related_kanji:
+        filters.related_kanji = related_kanji
+    if ratings:
+        filters.ratings = ratings
+
+    facets = await facet_service.get_facets(db, filters)
+
+    return facets
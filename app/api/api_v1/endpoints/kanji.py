@@ -14,7 +14,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 from app import models
 from app.services import kanji_service
-from app.db.mongodb import get_database
+from app.db.mongodb import get_database, get_read_database
 
 router = APIRouter()
 
@@ -22,7 +22,7 @@ router = APIRouter()
 @router.get("/", response_model=List[models.KanjiInDb])
 async def get_kanji_items(
     *,
-    db: AsyncIOMotorClient = Depends(get_database),
+    db: AsyncIOMotorClient = Depends(get_read_database("lists")),
     offset: Optional[int] = Query(0),
     limit: Optional[int] = Query(100),
 ):
@@ -14,13 +14,13 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 from app import models
 from app.services import kanji_dict_service
-from app.db.mongodb import get_database
+from app.db.mongodb import get_database, get_read_database
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[models.KanjiDict])
-async def get_kanji_dict_items(db: AsyncIOMotorClient = Depends(get_database)):
+async def get_kanji_dict_items(db: AsyncIOMotorClient = Depends(get_read_database("dictionary"))):
     """
     Get a list of all kanji dicts in the database.
     """
@@ -0,0 +1,56 @@
+from typing import Optional, List
+
+from fastapi import APIRouter, Depends, Query
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import models
+from app.services import quiz_sampling_service
+from app.db.mongodb import get_read_database
+
+router = APIRouter()
+
+
+def get_sample_filters(
+    related_kanji: Optional[List[str]] = Query(None),
+    ratings: Optional[List[int]] = Query(None),
+    size: int = Query(10, ge=0, le=1000),
+    seed: Optional[int] = Query(None),
+) -> models.SampleFilterParams:
+    filters = models.SampleFilterParams(size=size, seed=seed)
+    if related_kanji:
+        filters.related_kanji = related_kanji
+    if ratings:
+        filters.ratings = ratings
+
+    return filters
+
+
+@router.get("/compound-words/sample", response_model=List[models.CompoundWordInDb])
+async def sample_compound_words(
+    *,
+    db: AsyncIOMotorClient = Depends(get_read_database("lists")),
+    filters: models.SampleFilterParams = Depends(get_sample_filters),
+):
+    """
+    Draw compound_words without replacement, weighted by rating and the frequency of their related kanji.
+    """
+    logger.debug(">>>>")
+    compound_words = await quiz_sampling_service.sample_compound_words(db, filters)
+
+    return compound_words
+
+
+@router.get("/example-sentences/sample", response_model=List[models.ExampleSentenceInDb])
+async def sample_example_sentences(
+    *,
+    db: AsyncIOMotorClient = Depends(get_read_database("lists")),
+    filters: models.SampleFilterParams = Depends(get_sample_filters),
+):
+    """
+    Draw example_sentences without replacement, weighted by rating and the frequency of their related kanji.
+    """
+    logger.debug(">>>>")
+    example_sentences = await quiz_sampling_service.sample_example_sentences(db, filters)
+
+    return example_sentences
@@ -0,0 +1,46 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.status import HTTP_202_ACCEPTED, HTTP_409_CONFLICT
+
+from app import models
+from app.services import cooccurrence_service, relink_service
+from app.db.mongodb import get_database
+
+router = APIRouter()
+
+
+@router.post("/relink/", response_model=models.RelinkJobStatus, status_code=HTTP_202_ACCEPTED)
+async def start_relink(*, db: AsyncIOMotorClient = Depends(get_database)):
+    """
+    Start a background job that adds the jouyou kanji in the text of all compound words and example
+    sentences to their related_kanji.
+    """
+    logger.debug(">>>>")
+    if not relink_service.start_relink(db):
+        raise HTTPException(status_code=HTTP_409_CONFLICT, detail="The relink job is already running.")
+
+    return relink_service.status
+
+
+@router.get("/relink/", response_model=models.RelinkJobStatus)
+async def get_relink_status():
+    """
+    Get the status of the last relink job of this worker.
+    """
+    logger.debug(">>>>")
+    return relink_service.status
+
+
+@router.get("/{kanji}", response_model=List[models.RelatedKanji])
+async def get_related_kanji(*, kanji: str, limit: int = Query(10, ge=1, le=1000)):
+    """
+    Get the kanji most often used together with a kanji: the kanji sharing the most compound words and
+    example sentences with it through related_kanji. Served from the in-memory co-occurrence graph.
+    """
+    logger.debug(">>>>")
+    related_kanji = cooccurrence_service.get_related_kanji(kanji, limit)
+
+    return related_kanji
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import models
+from app.services import sync_service
+from app.db.mongodb import get_database
+
+router = APIRouter()
+
+
+# Reads from the primary, a lagging secondary could miss writes from before the returned watermark.
+@router.get("/", response_model=models.SyncChanges)
+async def get_changes(*, db: AsyncIOMotorClient = Depends(get_database), since: Optional[datetime] = None):
+    """
+    Get the kanji, compound words and example sentences created, updated or deleted after since, the
+    watermark of the previous sync. Without since, or when reset is true, the response contains all
+    documents and replaces the local copy.
+    """
+    logger.debug(">>>>")
+    changes = await sync_service.get_changes(db, since)
+
+    return changes
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from loguru import logger
+
+from app import models
+from app.services import text_annotation_service
+
+router = APIRouter()
+
+
+@router.post("/", response_model=models.TextAnnotationResult)
+async def annotate_text(*, textAnnotationRequest: models.TextAnnotationRequest):
+    """
+    Find every known compound word and jouyou kanji in a text, with their character offsets.
+    """
+    logger.debug(">>>>")
+    result = await text_annotation_service.annotate_text(textAnnotationRequest.text)
+
+    return result
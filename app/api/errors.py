@@ -0,0 +1,12 @@
+from fastapi import status
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from app.db.repository import ReadOnlyStorageError
+
+
+async def read_only_storage_error_handler(request: Request, exc: ReadOnlyStorageError) -> JSONResponse:
+    """
+    Writes to a read-only snapshot deployment are not allowed.
+    """
+    return JSONResponse({"detail": str(exc)}, status_code=status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter
+from loguru import logger
+from starlette.responses import JSONResponse, Response
+from starlette.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
+
+from app.db import mongodb_utils
+from app.db.pool_monitoring import pool_monitor
+from app.services import dataset_service, index_loader
+from app.utils import metrics
+
+router = APIRouter()
+
+# Seconds to wait for the mongo ping of the readiness check, configure the probe timeout above it.
+HEALTH_CHECK_TIMEOUT = 2.0
+
+# Result of the last mongo ping and when it was taken, reported by the liveness check.
+_last_mongo_status: Optional[dict] = None
+_last_mongo_check: Optional[float] = None
+
+RESIDENT_MEMORY = metrics.Gauge("process_resident_memory_bytes", "Resident memory of this worker in bytes.")
+
+
+def _resident_memory_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Serve the metrics of this worker in the Prometheus text format.
+    """
+    resident_memory = _resident_memory_bytes()
+    if resident_memory is not None:
+        RESIDENT_MEMORY.set(resident_memory)
+    dataset_service.dataset.update_metrics()
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def _ping_mongo() -> dict:
+    global _last_mongo_status, _last_mongo_check
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(mongodb_utils.ping(), HEALTH_CHECK_TIMEOUT)
+        status = {"reachable": True, "ping_ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        logger.warning(f"Mongo ping failed: {e!r}")
+        status = {"reachable": False, "error": type(e).__name__}
+
+    _last_mongo_status, _last_mongo_check = status, time.monotonic()
+    return {**status, "pool": pool_monitor.usage()}
+
+
+def _last_mongo_ping() -> dict:
+    if _last_mongo_status is None:
+        return {"reachable": None, "pool": pool_monitor.usage()}
+
+    checked_seconds_ago = round(time.monotonic() - _last_mongo_check, 1)
+    return {**_last_mongo_status, "checked_seconds_ago": checked_seconds_ago, "pool": pool_monitor.usage()}
+
+
+@router.get("/health/live")
+async def get_liveness():
+    """
+    Liveness check. Answers as long as the worker serves requests, without waiting for the database: the
+    mongo status is the result of the last readiness ping, informational only, so an unreachable or hanging
+    database doesn't get the worker restarted.
+    """
+    memory = {"resident_bytes": _resident_memory_bytes(), "dataset": dataset_service.dataset.memory_usage()}
+    return {"status": "ok", "mongo": _last_mongo_ping(), "memory": memory}
+
+
+@router.get("/health/ready")
+async def get_readiness():
+    """
+    Readiness check. Ready when mongo answers a ping and the in-memory indexes are loaded.
+    """
+    mongo = await _ping_mongo()
+    ready = mongo["reachable"] and index_loader.loaded
+    return JSONResponse(
+        {"status": "ready" if ready else "not ready", "indexes_loaded": index_loader.loaded, "mongo": mongo},
+        status_code=HTTP_200_OK if ready else HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,44 @@
+import hmac
+from typing import List
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from starlette.responses import PlainTextResponse
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
+
+from app.core.config import settings
+from app.utils.profiling import list_profiles, read_profile
+
+router = APIRouter()
+
+
+async def check_profiling_token(authorization: str = Header(None)) -> None:
+    """
+    Allows requests with the PROFILING_TOKEN as bearer token. Without a PROFILING_TOKEN the profiles are
+    not served at all.
+    """
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND)
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/admin/profiles", include_in_schema=False, dependencies=[Depends(check_profiling_token)])
+async def get_profiles() -> List[dict]:
+    """
+    List the request profiles of this worker, newest first.
+    """
+    return list_profiles(settings.PROFILING_DIRECTORY)
+
+
+@router.get("/admin/profiles/{name}", include_in_schema=False, dependencies=[Depends(check_profiling_token)])
+async def get_profile(name: str):
+    """
+    Get a request profile in the folded stack format, e.g. for flamegraph.pl or speedscope.
+    """
+    profile = read_profile(settings.PROFILING_DIRECTORY, name)
+    if profile is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=f"Profile {name} not found")
+
+    return PlainTextResponse(profile)
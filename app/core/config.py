@@ -20,18 +20,145 @@ class Settings(BaseSettings):
         raise ValueError(v)
 
     PROJECT_NAME: str
+    # "mongo", or "memory" to keep all data in the process, for tests and benchmark baselines. The memory
+    # backend starts empty and loses its data on restart. "snapshot" serves the read API from the read-only
+    # SQLite file at SNAPSHOT_PATH, written by python -m app.db.snapshot.
+    STORAGE_BACKEND: str = "mongo"
+    SNAPSHOT_PATH: str = "kanji_snapshot.sqlite"
+    # Bytes of the snapshot file that SQLite memory maps, shared between workers through the page cache.
+    SNAPSHOT_MMAP_SIZE: int = 256 * 1024 * 1024
+    # Load the in-memory indexes of the annotation, readable sentence, facet, related kanji, coverage and quiz
+    # endpoints at startup. Workers that don't serve those endpoints can turn this off to start faster and use
+    # less memory.
+    LOAD_IN_MEMORY_INDEXES: bool = True
+    # Keep a compact copy of all kanji, compound words and example sentences in every worker and serve the
+    # list and kanji dictionary endpoints from it. The copy follows the writes made through the worker.
+    IN_MEMORY_DATASET: bool = False
+    # Seconds between the publishing of this worker's writes to the change log and the polling for writes of
+    # other workers, which keep the in-memory indexes and dataset of all workers coherent. None disables it.
+    CACHE_COHERENCE_INTERVAL_SECONDS: Optional[float] = 1.0
+    # Seconds that the change log keeps writes, workers lagging further behind reload their indexes.
+    CACHE_COHERENCE_RETENTION_SECONDS: int = 24 * 60 * 60
     MONGO_HOST: Optional[str] = "localhost"
     MONGO_PORT: Optional[int] = 27017
     MONGO_USER: Optional[str] = None
     MONGO_PASSOWRD: Optional[str] = None
     MONGO_DB: Optional[str] = "common_kanji"
+    MONGO_REPLICA_SET: Optional[str] = None
     MONGO_KANJI_COLLECTION = "kanji"
     MONGO_COMPOUND_WORD_COLLECTION = "kanji_compound_word"
     MONGO_EXAMPLE_SENTENCE_COLLECTION = "kanji_example_sentence"
+    MONGO_CHANGE_LOG_COLLECTION = "kanji_change_log"
+    MONGO_TOMBSTONE_COLLECTION = "kanji_tombstone"
+    # Connection pool, timeouts and wire compression of the mongo client. Compressors are tried in order,
+    # zlib needs no extra packages, add zstd and snappy after installing zstandard and python-snappy.
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 10
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = 300_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5_000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5_000
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = 30_000
+    MONGO_COMPRESSORS: str = "zlib"
+    # Read preference, max staleness and read concern level of the read-only endpoints per route group
+    # ("dictionary" or "lists"), as JSON objects, e.g.
+    # MONGO_READ_PREFERENCE='{"lists": "secondaryPreferred"}' MONGO_MAX_STALENESS_SECONDS='{"lists": 90}'.
+    # Groups that aren't configured read from the primary with the default read concern.
+    MONGO_READ_PREFERENCE: Dict[str, str] = {}
+    MONGO_MAX_STALENESS_SECONDS: Dict[str, int] = {}
+    MONGO_READ_CONCERN: Dict[str, str] = {}
+
+    @validator("STORAGE_BACKEND")
+    def check_storage_backend(cls, v: str) -> str:
+        if v not in ("mongo", "memory", "snapshot"):
+            raise ValueError(f"Unknown storage backend {v}, use mongo, memory or snapshot")
+        return v
+
+    @validator("MONGO_READ_PREFERENCE")
+    def check_read_preferences(cls, v: Dict[str, str]) -> Dict[str, str]:
+        modes = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+        for route_group, mode in v.items():
+            if mode not in modes:
+                raise ValueError(f"Unknown read preference {mode} for {route_group}, use one of {modes}")
+        return v
+
+    # Concurrent requests and waiting requests per route group ("imports", "dictionary", "reads" or
+    # "writes"), as JSON objects. Groups without a concurrency aren't limited, a missing queue depth is 0.
+    ADMISSION_CONCURRENCY: Dict[str, int] = {"imports": 1, "dictionary": 4, "writes": 32}
+    ADMISSION_QUEUE_DEPTH: Dict[str, int] = {"imports": 2, "dictionary": 16, "writes": 128}
+    # Seconds a request waits for a slot before it gets a 503, None waits as long as it takes.
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: Optional[float] = 10.0
+    # Retry-After of the 503 responses of a full queue.
+    ADMISSION_RETRY_AFTER_SECONDS: int = 5
+
+    @validator("ADMISSION_CONCURRENCY", "ADMISSION_QUEUE_DEPTH")
+    def check_admission_groups(cls, v: Dict[str, int]) -> Dict[str, int]:
+        groups = ("imports", "dictionary", "reads", "writes")
+        for route_group, value in v.items():
+            if route_group not in groups:
+                raise ValueError(f"Unknown route group {route_group}, use one of {groups}")
+            if value < 0:
+                raise ValueError(f"{route_group} must not be negative")
+        return v
+
+    # Let concurrent identical calls of the kanji dictionary and list reads share one database read.
+    SINGLE_FLIGHT: bool = True
+
+    # Seconds that tombstones of deleted documents are kept. Clients that last synced longer ago get all
+    # documents again.
+    SYNC_TOMBSTONE_RETENTION_SECONDS: int = 30 * 24 * 60 * 60
+    # Seconds that the sync watermark lags behind, longer than a write takes from stamping updated_at to
+    # reaching the database.
+    SYNC_WATERMARK_LAG_SECONDS: int = 5
+
+    # Add the jouyou kanji in the text of compound words and example sentences to their related_kanji when
+    # they are created or updated.
+    AUTO_RELATED_KANJI: bool = True
+    # Documents per batch of the relink job, and batches per collection that it links and writes at a time.
+    RELINK_BATCH_SIZE: int = 500
+    RELINK_CONCURRENCY: int = 4
+
+    # Seconds that rating updates are buffered before they are written with one bulk write. None writes every
+    # rating update right away.
+    RATING_FLUSH_INTERVAL_SECONDS: Optional[float] = 1.0
+    # Number of buffered documents at which the buffer is written without waiting for the interval.
+    RATING_FLUSH_SIZE: int = 500
+
+    # Number of filters of the list endpoints whose estimated X-Total-Count is cached.
+    TOTAL_COUNT_CACHE_SIZE: int = 1_024
+
+    # Documents per round trip of the export cursors.
+    EXPORT_BATCH_SIZE: int = 2_000
+
+    # Log mongo commands that take at least this many milliseconds, None disables the slow query log.
+    MONGO_SLOW_QUERY_MS: Optional[int] = 100
+    # Log requests that make more database round trips than this.
+    MONGO_SLOW_REQUEST_ROUND_TRIPS: Optional[int] = 25
+    # Add a Server-Timing header with the database round trips and time to every response. For debugging.
+    DB_SERVER_TIMING: bool = False
+
+    # Requests with this token in the X-Profile header or profile query parameter are profiled, and the
+    # profiles are served on /admin/profiles to requests with the token as bearer token.
+    PROFILING_TOKEN: Optional[str] = None
+    # Fraction of all requests that is profiled.
+    PROFILING_SAMPLE_RATE: float = 0.0
+    # Seconds between the stack samples of a profiled request.
+    PROFILING_INTERVAL_SECONDS: float = 0.001
+    # Directory of the profiles in the folded stack format, keeping the newest PROFILING_MAX_FILES.
+    PROFILING_DIRECTORY: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
 
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
 
+    # "development" logs everything as text to stdout, "production" logs INFO and up as JSON through a queue.
+    # The other LOG_ settings override the defaults of the profile when set.
+    LOG_PROFILE: str = "development"
+    LOG_LEVEL: Optional[str] = None
+    LOG_JSON: Optional[bool] = None
+    LOG_ENQUEUE: Optional[bool] = None
+    # Fraction of the DEBUG records (per request chatter) that is written.
+    LOG_DEBUG_SAMPLE_RATE: Optional[float] = None
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,98 @@
+"""
+Mongo command monitoring: per-request round trip accounting, command metrics and a slow query log.
+
+The listener is attached to the client in connect_to_mongo. Motor runs pymongo operations on a thread pool
+with a copy of the caller's context, so the listener can find the stats of the request that issued a
+command through a context variable.
+"""
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.utils.metrics import Counter, Histogram
+
+# Parts of a command that describe the shape of a query.
+SHAPE_KEYS = ("filter", "query", "pipeline", "updates", "deletes", "sort", "projection")
+
+COMMANDS = Counter("mongo_commands_total", "Number of Mongo commands.", ("command", "outcome"))
+COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "Duration of Mongo commands in seconds.", ("command",)
+)
+
+
+class RequestDbStats:
+    """
+    Number of database round trips and total database time of a single request.
+    """
+
+    def __init__(self):
+        self.round_trips = 0
+        self.db_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, duration: float) -> None:
+        with self._lock:
+            self.round_trips += 1
+            self.db_time += duration
+
+
+current_request_stats: ContextVar[Optional[RequestDbStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def query_shape(value: Any) -> Any:
+    """
+    Replace the values in a query by their type names, keeping field names and operators.
+    Lists are reduced to the shape of their first item.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(value[0])] if value else []
+    return type(value).__name__
+
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self):
+        self._slow_query_seconds = (
+            settings.MONGO_SLOW_QUERY_MS / 1000 if settings.MONGO_SLOW_QUERY_MS is not None else None
+        )
+        # Commands by (request_id, connection_id), kept until they finish to log their shape when slow.
+        self._pending: Dict[Tuple[int, Any], dict] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if self._slow_query_seconds is not None:
+            self._pending[(event.request_id, event.connection_id)] = event.command
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, "succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, "failed")
+
+    def _finished(self, event, outcome: str) -> None:
+        duration = event.duration_micros / 1_000_000
+        command = self._pending.pop((event.request_id, event.connection_id), None)
+
+        COMMANDS.labels(event.command_name, outcome).inc()
+        COMMAND_DURATION.labels(event.command_name).observe(duration)
+
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.add(duration)
+
+        if command is not None and duration >= self._slow_query_seconds:
+            collection = command.get(event.command_name)
+            shape = {key: query_shape(command[key]) for key in SHAPE_KEYS if key in command}
+            logger.warning(
+                f"Slow mongo command {event.command_name} on {event.database_name}.{collection} "
+                f"took {duration * 1000:.1f} ms ({outcome}), shape: {shape}"
+            )
+
+
+command_monitor = CommandMonitor()
@@ -0,0 +1,203 @@
+"""
+In-memory storage engine, for tests, benchmark baselines and deployments without mongo.
+
+Documents are kept in insertion order per collection, with hash indexes on the natural keys, related_kanji
+and rating. Documents are copied on the way in and out, so callers can't change the stored data.
+"""
+import copy
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set
+
+from bson import ObjectId
+
+from app.db.repository import DocId, Repository, Storage, Where, indexed_fields
+
+
+def _index_keys(value: Any) -> List[Any]:
+    values = value if isinstance(value, (list, tuple)) else [value]
+    keys = []
+    for item in values:
+        try:
+            hash(item)
+        except TypeError:
+            continue
+        keys.append(item)
+    return keys
+
+
+def _matches(document: dict, field: str, values: Set[Any]) -> bool:
+    return any(key in values for key in _index_keys(document.get(field)))
+
+
+class InMemoryRepository(Repository):
+    def __init__(self, indexed_fields: Sequence[str] = ()):
+        self._documents: Dict[ObjectId, dict] = {}
+        self._positions: Dict[ObjectId, int] = {}
+        self._next_position = 0
+        self._indexes: Dict[str, Dict[Any, Set[ObjectId]]] = {field: {} for field in indexed_fields}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _index(self, doc_id: ObjectId, document: dict) -> None:
+        for field, index in self._indexes.items():
+            for key in _index_keys(document.get(field)):
+                index.setdefault(key, set()).add(doc_id)
+
+    def _unindex(self, doc_id: ObjectId, document: dict) -> None:
+        for field, index in self._indexes.items():
+            for key in _index_keys(document.get(field)):
+                doc_ids = index.get(key)
+                if doc_ids is not None:
+                    doc_ids.discard(doc_id)
+                    if not doc_ids:
+                        del index[key]
+
+    def _matching_ids(self, where: Optional[Where]) -> Iterable[ObjectId]:
+        conditions = {field: set(values) for field, values in (where or {}).items()}
+        if not conditions:
+            return list(self._documents)
+
+        candidates = None
+        for field in [field for field in conditions if field in self._indexes]:
+            index = self._indexes[field]
+            field_ids = set()
+            for value in conditions.pop(field):
+                field_ids.update(index.get(value, ()))
+            candidates = field_ids if candidates is None else candidates & field_ids
+
+        if candidates is None:
+            candidates = self._documents
+        doc_ids = [
+            doc_id
+            for doc_id in candidates
+            if all(_matches(self._documents[doc_id], field, values) for field, values in conditions.items())
+        ]
+        if candidates is not self._documents:
+            doc_ids.sort(key=self._positions.__getitem__)
+        return doc_ids
+
+    @staticmethod
+    def _copy(document: dict, fields: Optional[Sequence[str]] = None) -> dict:
+        # Documents hold scalars and lists of scalars, copying the lists is enough to keep the store apart.
+        if fields is None:
+            return {
+                field: list(value) if isinstance(value, list) else value for field, value in document.items()
+            }
+
+        result = {"_id": document["_id"]}
+        for field in fields:
+            if field in document:
+                value = document[field]
+                result[field] = list(value) if isinstance(value, list) else value
+        return result
+
+    async def insert_one(self, document: dict) -> ObjectId:
+        document = copy.deepcopy(document)
+        doc_id = document.setdefault("_id", ObjectId())
+        self._positions[doc_id] = self._next_position
+        self._next_position += 1
+        self._documents[doc_id] = document
+        self._index(doc_id, document)
+        return doc_id
+
+    async def find_one_by_id(self, doc_id: DocId) -> Optional[dict]:
+        document = self._documents.get(ObjectId(doc_id))
+        return self._copy(document) if document is not None else None
+
+    async def exists(self, doc_id: DocId) -> bool:
+        return ObjectId(doc_id) in self._documents
+
+    async def find_one_by(self, field: str, value: Any) -> Optional[dict]:
+        for doc_id in self._matching_ids({field: [value]}):
+            return self._copy(self._documents[doc_id])
+        return None
+
+    async def find(
+        self,
+        where: Optional[Where] = None,
+        offset: int = 0,
+        limit: int = 0,
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict]:
+        doc_ids = list(self._matching_ids(where))
+        end = offset + limit if limit else None
+        for doc_id in doc_ids[offset:end]:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                yield self._copy(document, fields)
+
+    async def find_after(self, field: str, value: Any) -> AsyncIterator[dict]:
+        documents = [
+            document
+            for document in self._documents.values()
+            if document.get(field) is not None and document[field] > value
+        ]
+        for document in sorted(documents, key=lambda document: document[field]):
+            yield self._copy(document)
+
+    async def find_by_ids(self, doc_ids: Iterable[DocId]) -> List[dict]:
+        documents = (self._documents.get(ObjectId(doc_id)) for doc_id in doc_ids)
+        return [self._copy(document) for document in documents if document is not None]
+
+    async def find_ids_by(self, field: str, value: Any) -> List[ObjectId]:
+        return list(self._matching_ids({field: [value]}))
+
+    async def count_by(self, field: str, where: Optional[Where] = None) -> Dict[Any, int]:
+        return dict(Counter(self._documents[doc_id].get(field) for doc_id in self._matching_ids(where)))
+
+    async def count(self, where: Optional[Where] = None) -> int:
+        if not where:
+            return len(self._documents)
+        return len(list(self._matching_ids(where)))
+
+    async def replace_one(self, doc_id: DocId, document: dict) -> None:
+        doc_id = ObjectId(doc_id)
+        old = self._documents.get(doc_id)
+        if old is None:
+            return
+
+        document = copy.deepcopy(document)
+        document["_id"] = doc_id
+        self._unindex(doc_id, old)
+        # Assigning to an existing key keeps the insertion order, like a replace in mongo.
+        self._documents[doc_id] = document
+        self._index(doc_id, document)
+
+    async def update_fields(self, updates: Dict[DocId, dict]) -> None:
+        for doc_id, fields in updates.items():
+            document = self._documents.get(ObjectId(doc_id))
+            if document is None:
+                continue
+
+            self._unindex(document["_id"], document)
+            document.update(copy.deepcopy(fields))
+            self._index(document["_id"], document)
+
+    async def delete_by_ids(self, doc_ids: Iterable[DocId]) -> None:
+        for doc_id in doc_ids:
+            document = self._documents.pop(ObjectId(doc_id), None)
+            if document is not None:
+                self._unindex(document["_id"], document)
+                del self._positions[document["_id"]]
+
+    async def drop(self) -> None:
+        self.__init__(list(self._indexes))
+
+
+class InMemoryStorage(Storage):
+    """
+    Storage with an InMemoryRepository per collection. Data lives as long as the process.
+    """
+
+    def __init__(self):
+        self.indexed_fields = indexed_fields()
+        self._repositories: Dict[str, InMemoryRepository] = {}
+
+    def repository(self, collection: str) -> InMemoryRepository:
+        repository = self._repositories.get(collection)
+        if repository is None:
+            repository = InMemoryRepository(self.indexed_fields.get(collection, ()))
+            self._repositories[collection] = repository
+        return repository
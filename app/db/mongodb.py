@@ -1,16 +1,88 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from app.core.config import settings
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
 
 
 class Database:
     client: AsyncIOMotorClient = None
+    read_clients: Dict[str, "ReadRoutedClient"] = {}
 
 
 db = Database()
 
 
+def make_read_preference(mode: str, max_staleness_seconds: Optional[int] = None):
+    """
+    Create a pymongo read preference from its mode name, e.g. "secondaryPreferred".
+    """
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness_seconds or -1)
+
+
+class ReadRoutedClient:
+    """
+    Wraps the client so databases looked up with client[name] read with the read preference and read
+    concern of a route group. Anything else is delegated to the wrapped client.
+    """
+
+    def __init__(self, client: AsyncIOMotorClient, read_preference, read_concern: ReadConcern):
+        self.client = client
+        self.read_preference = read_preference
+        self.read_concern = read_concern
+        self._databases: Dict[str, AsyncIOMotorDatabase] = {}
+
+    def __getitem__(self, name: str) -> AsyncIOMotorDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = self.client.get_database(
+                name, read_preference=self.read_preference, read_concern=self.read_concern
+            )
+        return database
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+
 async def get_database() -> AsyncIOMotorClient:
     """
     Returns current instance of the AsycIOMotorClient for the app.
     This function is used for depedency injections on the API endpoints.
     """
-    return db.client
\ No newline at end of file
+    return db.client
+
+
+def get_read_database(route_group: str):
+    """
+    Returns a dependency that gives the client for the read-only endpoints of a route group, reading with
+    the read preference and read concern configured for the group. Groups without configuration read from
+    the primary. Endpoints that write, or read to write, use get_database.
+    """
+
+    async def get_read_routed_database() -> AsyncIOMotorClient:
+        if not isinstance(db.client, AsyncIOMotorClient):
+            return db.client
+
+        client = db.read_clients.get(route_group)
+        if client is None or client.client is not db.client:
+            read_preference = make_read_preference(
+                settings.MONGO_READ_PREFERENCE.get(route_group, "primary"),
+                settings.MONGO_MAX_STALENESS_SECONDS.get(route_group),
+            )
+            read_concern = ReadConcern(settings.MONGO_READ_CONCERN.get(route_group))
+            client = db.read_clients[route_group] = ReadRoutedClient(db.client, read_preference, read_concern)
+        return client
+
+    return get_read_routed_database
@@ -1,15 +1,32 @@
+import asyncio
+
 from loguru import logger
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
+from app.db.command_monitoring import command_monitor
+from app.db.memory_repository import InMemoryStorage
 from app.db.mongodb import db
+from app.db.pool_monitoring import pool_monitor
+from app.db.repository import Storage
+from app.db.snapshot import SnapshotStorage
+from app.services import rating_buffer_service
 
 
 async def connect_to_mongo():
     """
-    Establish mongodb connection.
+    Establish mongodb connection and warm up the connection pool.
     """
     logger.debug(">>>>")
+    if settings.STORAGE_BACKEND == "memory":
+        db.client = InMemoryStorage()
+        logger.info("Using the in-memory storage backend.")
+        return
+    if settings.STORAGE_BACKEND == "snapshot":
+        db.client = SnapshotStorage(settings.SNAPSHOT_PATH, settings.SNAPSHOT_MMAP_SIZE)
+        logger.info(f"Serving the read-only snapshot {settings.SNAPSHOT_PATH}.")
+        return
+
     logger.info("Connecting to mongodb...")
     credentials = ""
     if settings.MONGO_USER:
@@ -19,16 +36,52 @@ async def connect_to_mongo():
         f"mongodb://{credentials}{settings.MONGO_HOST}:{settings.MONGO_PORT}/{settings.MONGO_DB}"
     )
     logger.debug(f"Connection string: {connection_string}")
-    db.client = AsyncIOMotorClient(connection_string)
+    db.client = AsyncIOMotorClient(
+        connection_string,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        compressors=settings.MONGO_COMPRESSORS or None,
+        replicaSet=settings.MONGO_REPLICA_SET,
+        event_listeners=[command_monitor, pool_monitor],
+    )
 
+    await warm_up_pool()
     logger.info("Mongodb connection established.")
 
 
+async def warm_up_pool():
+    """
+    Open MONGO_MIN_POOL_SIZE connections with concurrent pings, so the first requests don't pay for the
+    connection handshakes. Fails when the server can't be reached within the server selection timeout.
+    """
+    logger.debug(">>>>")
+    await asyncio.gather(*(ping() for _ in range(max(settings.MONGO_MIN_POOL_SIZE, 1))))
+    logger.info(f"Warmed up mongo connection pool: {pool_monitor.usage()}")
+
+
+async def ping():
+    """
+    Ping the mongodb server.
+    """
+    if isinstance(db.client, Storage):
+        return
+
+    await db.client.admin.command("ping")
+
+
 async def close_mongo_connection():
     """
-    Close mongodb connection.
+    Write the buffered ratings and close mongodb connection.
     """
     logger.debug(">>>>")
+    try:
+        await rating_buffer_service.stop(db.client)
+    except Exception:
+        logger.exception("Writing the buffered ratings failed, they are lost.")
     logger.info("Closing mongo connection...")
     db.client.close()
-    logger.info("Closed mongo connection.")
\ No newline at end of file
+    logger.info("Closed mongo connection.")
@@ -0,0 +1,69 @@
+"""
+Connection pool monitoring, for the pool usage reported by the health endpoints and the metrics.
+"""
+from typing import Dict
+
+from pymongo import monitoring
+
+from app.utils.metrics import Gauge
+
+POOL_CONNECTIONS = Gauge("mongo_pool_connections", "Open connections in the Mongo pool.", ("address",))
+POOL_CHECKED_OUT = Gauge("mongo_pool_checked_out", "Connections in use from the Mongo pool.", ("address",))
+POOL_WAITING = Gauge(
+    "mongo_pool_waiting", "Operations waiting for a connection from the Mongo pool.", ("address",)
+)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        Pool usage per server address.
+        """
+        return {
+            address: {
+                "connections": int(POOL_CONNECTIONS.labels(address).value),
+                "checked_out": int(POOL_CHECKED_OUT.labels(address).value),
+                "waiting": int(POOL_WAITING.labels(address).value),
+            }
+            for (address,) in list(POOL_CONNECTIONS._children)
+        }
+
+    def pool_created(self, event) -> None:
+        POOL_CONNECTIONS.labels(_address(event)).set(0)
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        POOL_CONNECTIONS.labels(_address(event)).inc()
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        POOL_CONNECTIONS.labels(_address(event)).dec()
+
+    def connection_check_out_started(self, event) -> None:
+        POOL_WAITING.labels(_address(event)).inc()
+
+    def connection_check_out_failed(self, event) -> None:
+        POOL_WAITING.labels(_address(event)).dec()
+
+    def connection_checked_out(self, event) -> None:
+        address = _address(event)
+        POOL_WAITING.labels(address).dec()
+        POOL_CHECKED_OUT.labels(address).inc()
+
+    def connection_checked_in(self, event) -> None:
+        POOL_CHECKED_OUT.labels(_address(event)).dec()
+
+
+pool_monitor = PoolMonitor()
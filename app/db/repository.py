@@ -0,0 +1,252 @@
+"""
+Storage interface of the services.
+
+A Repository stores the documents of one collection. Documents are plain dicts with their ObjectId in
+"_id", as they are stored in mongo. The services get a repository with get_repository(connection,
+collection), where connection is the client handed out by get_database: a Motor client, a read routed
+client, or a Storage such as the in-memory engine.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+from app.core.config import settings
+
+DocId = Union[str, ObjectId]
+# Field name to accepted values. A document matches when the field value, or for a list field any of its
+# items, is one of the values. Conditions on several fields must all match.
+Where = Dict[str, Sequence[Any]]
+
+
+class ReadOnlyStorageError(Exception):
+    """
+    Raised on writes to a read-only storage such as a snapshot.
+    """
+
+
+def indexed_fields() -> Dict[str, Tuple[str, ...]]:
+    """
+    Fields per collection that the in-process engines index: the natural keys, related_kanji and rating, and
+    the collection of the sync tombstones.
+    """
+    return {
+        settings.MONGO_KANJI_COLLECTION: ("kanji",),
+        settings.MONGO_COMPOUND_WORD_COLLECTION: ("compound_word", "related_kanji", "rating"),
+        settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: ("example_sentence", "related_kanji", "rating"),
+        settings.MONGO_TOMBSTONE_COLLECTION: ("collection",),
+    }
+
+
+class Repository(ABC):
+    # Whether writes raise ReadOnlyStorageError, for callers that defer their writes.
+    read_only = False
+
+    @abstractmethod
+    async def insert_one(self, document: dict) -> ObjectId:
+        """
+        Insert a document and return its new id. The document is not modified.
+        """
+
+    @abstractmethod
+    async def find_one_by_id(self, doc_id: DocId) -> Optional[dict]:
+        pass
+
+    async def exists(self, doc_id: DocId) -> bool:
+        """
+        Whether there is a document with the id, without reading the document where the engine can.
+        """
+        return await self.find_one_by_id(doc_id) is not None
+
+    @abstractmethod
+    async def find_one_by(self, field: str, value: Any) -> Optional[dict]:
+        """
+        Find the first document with a field equal to value, used for lookups by natural key.
+        """
+
+    @abstractmethod
+    def find(
+        self,
+        where: Optional[Where] = None,
+        offset: int = 0,
+        limit: int = 0,
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict]:
+        """
+        Iterate over the matching documents in insertion order.
+
+        :param where: Conditions on field values, all documents if empty.
+        :param offset: Number of matching documents to skip.
+        :param limit: Maximum number of documents, 0 for no limit.
+        :param fields: Only return these fields and "_id", all fields if None.
+        :param batch_size: Documents per round trip for engines that fetch in batches, 0 for the default.
+        """
+
+    @abstractmethod
+    def find_after(self, field: str, value: Any) -> AsyncIterator[dict]:
+        """
+        Iterate over the documents with a field greater than value, in order of the field. Documents without
+        the field are skipped.
+        """
+
+    @abstractmethod
+    async def find_by_ids(self, doc_ids: Iterable[DocId]) -> List[dict]:
+        """
+        Find documents by id in any order, unknown ids are skipped.
+        """
+
+    @abstractmethod
+    async def find_ids_by(self, field: str, value: Any) -> List[ObjectId]:
+        pass
+
+    @abstractmethod
+    async def count_by(self, field: str, where: Optional[Where] = None) -> Dict[Any, int]:
+        """
+        Count the matching documents per value of a field.
+        """
+
+    @abstractmethod
+    async def count(self, where: Optional[Where] = None) -> int:
+        """
+        Count the matching documents exactly.
+        """
+
+    async def estimated_count(self) -> int:
+        """
+        Count all documents from collection metadata where the engine has it, which may be off after an
+        unclean shutdown of mongo.
+        """
+        return await self.count()
+
+    @abstractmethod
+    async def replace_one(self, doc_id: DocId, document: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def update_fields(self, updates: Dict[DocId, dict]) -> None:
+        """
+        Set fields of several documents in one round trip, unknown ids are skipped.
+
+        :param updates: Field values to set per document id.
+        """
+
+    @abstractmethod
+    async def delete_by_ids(self, doc_ids: Iterable[DocId]) -> None:
+        pass
+
+    @abstractmethod
+    async def drop(self) -> None:
+        pass
+
+    async def create_index(self, field: str, expire_after_seconds: Optional[int] = None) -> None:
+        """
+        Create an index on a field, expiring documents expire_after_seconds after the datetime in the field.
+        Engines that index their documents themselves ignore this.
+        """
+
+
+class Storage(ABC):
+    """
+    A set of repositories that replaces the mongo client as connection of the services.
+    """
+
+    @abstractmethod
+    def repository(self, collection: str) -> Repository:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MotorRepository(Repository):
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    @staticmethod
+    def _query(where: Optional[Where]) -> dict:
+        return {field: {"$in": list(values)} for field, values in (where or {}).items()}
+
+    async def insert_one(self, document: dict) -> ObjectId:
+        # insert_one sets "_id" on the document it is given.
+        result = await self.collection.insert_one(dict(document))
+        return result.inserted_id
+
+    async def find_one_by_id(self, doc_id: DocId) -> Optional[dict]:
+        return await self.collection.find_one({"_id": ObjectId(doc_id)})
+
+    async def exists(self, doc_id: DocId) -> bool:
+        return await self.collection.count_documents({"_id": ObjectId(doc_id)}, limit=1) > 0
+
+    async def find_one_by(self, field: str, value: Any) -> Optional[dict]:
+        return await self.collection.find_one({field: value})
+
+    def find(
+        self,
+        where: Optional[Where] = None,
+        offset: int = 0,
+        limit: int = 0,
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict]:
+        projection = {field: 1 for field in fields} if fields is not None else None
+        return self.collection.find(
+            self._query(where), projection, skip=offset, limit=limit, batch_size=batch_size
+        )
+
+    def find_after(self, field: str, value: Any) -> AsyncIterator[dict]:
+        return self.collection.find({field: {"$gt": value}}).sort(field, 1)
+
+    async def find_by_ids(self, doc_ids: Iterable[DocId]) -> List[dict]:
+        results = self.collection.find({"_id": {"$in": [ObjectId(doc_id) for doc_id in doc_ids]}})
+        return [result async for result in results]
+
+    async def find_ids_by(self, field: str, value: Any) -> List[ObjectId]:
+        return [result["_id"] async for result in self.collection.find({field: value}, {"_id": 1})]
+
+    async def count_by(self, field: str, where: Optional[Where] = None) -> Dict[Any, int]:
+        pipeline = [{"$match": self._query(where)}, {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+        return {result["_id"]: result["count"] async for result in self.collection.aggregate(pipeline)}
+
+    async def count(self, where: Optional[Where] = None) -> int:
+        return await self.collection.count_documents(self._query(where))
+
+    async def estimated_count(self) -> int:
+        return await self.collection.estimated_document_count()
+
+    async def replace_one(self, doc_id: DocId, document: dict) -> None:
+        await self.collection.replace_one({"_id": ObjectId(doc_id)}, document)
+
+    async def update_fields(self, updates: Dict[DocId, dict]) -> None:
+        if updates:
+            requests = [
+                UpdateOne({"_id": ObjectId(doc_id)}, {"$set": fields}) for doc_id, fields in updates.items()
+            ]
+            await self.collection.bulk_write(requests, ordered=False)
+
+    async def delete_by_ids(self, doc_ids: Iterable[DocId]) -> None:
+        await self.collection.delete_many({"_id": {"$in": [ObjectId(doc_id) for doc_id in doc_ids]}})
+
+    async def drop(self) -> None:
+        await self.collection.drop()
+
+    async def create_index(self, field: str, expire_after_seconds: Optional[int] = None) -> None:
+        if expire_after_seconds is None:
+            await self.collection.create_index(field)
+        else:
+            await self.collection.create_index(field, expireAfterSeconds=expire_after_seconds)
+
+
+def get_repository(connection: Any, collection: str) -> Repository:
+    """
+    Get the repository of a collection.
+
+    :param connection: The connection given to the services, a Motor client or a Storage.
+    :param collection: Name of the collection.
+    """
+    if isinstance(connection, Storage):
+        return connection.repository(collection)
+
+    return MotorRepository(connection[settings.MONGO_DB][collection])
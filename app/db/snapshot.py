@@ -0,0 +1,315 @@
+"""
+Read-only snapshot storage: the collections exported to a single SQLite file, for edge and offline
+deployments of the read API without mongo.
+
+Export the configured database with
+
+    python -m app.db.snapshot kanji_snapshot.sqlite
+
+and serve it with STORAGE_BACKEND=snapshot SNAPSHOT_PATH=kanji_snapshot.sqlite. Documents are stored as BSON
+in insertion order, with a B-tree index on the natural keys, related_kanji and rating. Opening the file
+reads nothing up front, and the file is memory mapped read-only, so workers on the same host share its
+pages through the OS page cache.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import quote
+
+import bson
+from bson import ObjectId
+from loguru import logger
+
+from app.db.repository import (
+    DocId,
+    ReadOnlyStorageError,
+    Repository,
+    Storage,
+    Where,
+    get_repository,
+    indexed_fields,
+)
+
+FORMAT_VERSION = "1"
+# Stays below the SQLite limit on the number of query parameters.
+QUERY_CHUNK_SIZE = 500
+
+
+def _index_keys(value: Any) -> List[Any]:
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [item for item in values if isinstance(item, (str, int, float))]
+
+
+def _matches(document: dict, field: str, values: Sequence[Any]) -> bool:
+    value = document.get(field)
+    return any(item in values for item in (value if isinstance(value, list) else [value]))
+
+
+def _project(document: dict, fields: Optional[Sequence[str]]) -> dict:
+    if fields is None:
+        return document
+
+    return {key: document[key] for key in ("_id", *fields) if key in document}
+
+
+class SnapshotRepository(Repository):
+    read_only = True
+
+    def __init__(self, connection: sqlite3.Connection, collection: str, indexed_fields: Sequence[str]):
+        self._connection = connection
+        self._collection = collection
+        self._table = f'"{collection}"'
+        self._index_table = f'"{collection}__index"'
+        self._indexed_fields = set(indexed_fields)
+
+    def _documents(self, where: Optional[Where], offset: int, limit: int) -> Iterable[dict]:
+        conditions = {field: list(values) for field, values in (where or {}).items()}
+        clauses = []
+        parameters: List[Any] = []
+        for field in [field for field in conditions if field in self._indexed_fields]:
+            values = conditions.pop(field)
+            clauses.append(
+                f"position IN (SELECT position FROM {self._index_table} "
+                f"WHERE field = ? AND value IN ({', '.join('?' * len(values))}))"
+            )
+            parameters += [field, *values]
+
+        query = f"SELECT document FROM {self._table}"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY position"
+        if not conditions:
+            query += " LIMIT ? OFFSET ?"
+            parameters += [limit or -1, offset]
+
+        documents = (bson.decode(row[0]) for row in self._connection.execute(query, parameters))
+        if not conditions:
+            return documents
+
+        # Conditions on fields without an index are checked on the decoded documents.
+        documents = (
+            document
+            for document in documents
+            if all(_matches(document, field, values) for field, values in conditions.items())
+        )
+        return itertools.islice(documents, offset, offset + limit if limit else None)
+
+    def _read_only(self):
+        return ReadOnlyStorageError(f"Can't write to {self._collection}, the snapshot is read-only.")
+
+    async def insert_one(self, document: dict) -> ObjectId:
+        raise self._read_only()
+
+    async def find_one_by_id(self, doc_id: DocId) -> Optional[dict]:
+        row = self._connection.execute(
+            f"SELECT document FROM {self._table} WHERE doc_id = ?", (ObjectId(doc_id).binary,)
+        ).fetchone()
+        return bson.decode(row[0]) if row is not None else None
+
+    async def exists(self, doc_id: DocId) -> bool:
+        row = self._connection.execute(
+            f"SELECT 1 FROM {self._table} WHERE doc_id = ?", (ObjectId(doc_id).binary,)
+        ).fetchone()
+        return row is not None
+
+    async def find_one_by(self, field: str, value: Any) -> Optional[dict]:
+        for document in self._documents({field: [value]}, 0, 1):
+            return document
+        return None
+
+    async def find(
+        self,
+        where: Optional[Where] = None,
+        offset: int = 0,
+        limit: int = 0,
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict]:
+        for document in self._documents(where, offset, limit):
+            yield _project(document, fields)
+
+    async def find_after(self, field: str, value: Any) -> AsyncIterator[dict]:
+        documents = [
+            document
+            for document in self._documents(None, 0, 0)
+            if document.get(field) is not None and document[field] > value
+        ]
+        for document in sorted(documents, key=lambda document: document[field]):
+            yield document
+
+    async def find_by_ids(self, doc_ids: Iterable[DocId]) -> List[dict]:
+        doc_ids = [ObjectId(doc_id).binary for doc_id in doc_ids]
+        documents = []
+        for start in range(0, len(doc_ids), QUERY_CHUNK_SIZE):
+            chunk = doc_ids[start : start + QUERY_CHUNK_SIZE]
+            rows = self._connection.execute(
+                f"SELECT document FROM {self._table} WHERE doc_id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            documents.extend(bson.decode(row[0]) for row in rows)
+        return documents
+
+    async def find_ids_by(self, field: str, value: Any) -> List[ObjectId]:
+        return [document["_id"] for document in self._documents({field: [value]}, 0, 0)]
+
+    async def count_by(self, field: str, where: Optional[Where] = None) -> Dict[Any, int]:
+        counts: Dict[Any, int] = {}
+        for document in self._documents(where, 0, 0):
+            value = document.get(field)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    async def count(self, where: Optional[Where] = None) -> int:
+        if not where:
+            return self._connection.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+        return sum(1 for _ in self._documents(where, 0, 0))
+
+    async def replace_one(self, doc_id: DocId, document: dict) -> None:
+        raise self._read_only()
+
+    async def update_fields(self, updates: Dict[DocId, dict]) -> None:
+        raise self._read_only()
+
+    async def delete_by_ids(self, doc_ids: Iterable[DocId]) -> None:
+        raise self._read_only()
+
+    async def drop(self) -> None:
+        raise self._read_only()
+
+
+class SnapshotStorage(Storage):
+    """
+    Read-only storage on a snapshot file written by export_snapshot.
+    """
+
+    def __init__(self, path: str, mmap_size: int = 256 * 1024 * 1024):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(
+                f"Snapshot {path} doesn't exist, export one with python -m app.db.snapshot"
+            )
+
+        # immutable skips the file locking: the snapshot is never changed in place, export_snapshot replaces
+        # the file and workers that have it open keep reading the old one.
+        self._connection = sqlite3.connect(
+            f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        self._connection.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self._connection.execute("PRAGMA query_only = 1")
+        self.meta = dict(self._connection.execute("SELECT key, value FROM snapshot_meta"))
+        format_version = self.meta.get("format_version")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Snapshot {path} has format {format_version}, not {FORMAT_VERSION}")
+
+        collections = self._connection.execute("SELECT name, indexed_fields FROM snapshot_collections")
+        self._repositories = {
+            name: SnapshotRepository(self._connection, name, fields.split(",") if fields else ())
+            for name, fields in collections
+        }
+
+    def repository(self, collection: str) -> SnapshotRepository:
+        repository = self._repositories.get(collection)
+        if repository is None:
+            raise ValueError(f"Collection {collection} is not in the snapshot.")
+        return repository
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+async def export_snapshot(connection, path: str) -> Dict[str, int]:
+    """
+    Write the kanji, compound word, example sentence and tombstone collections to a snapshot file. The file
+    is written next to path and moved into place when complete, so a running server never sees a partial
+    snapshot.
+
+    :param connection: Async database client.
+    :param path: Path of the snapshot file.
+    :return: Number of exported documents per collection.
+    """
+    logger.debug(">>>>")
+    temporary_path = f"{path}.tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    counts = {}
+    snapshot = sqlite3.connect(temporary_path)
+    try:
+        snapshot.execute("PRAGMA journal_mode = OFF")
+        snapshot.execute("PRAGMA synchronous = OFF")
+        snapshot.execute("CREATE TABLE snapshot_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        snapshot.execute(
+            "CREATE TABLE snapshot_collections "
+            "(name TEXT PRIMARY KEY, indexed_fields TEXT NOT NULL, count INTEGER NOT NULL)"
+        )
+
+        for collection, fields in indexed_fields().items():
+            table, index_table = f'"{collection}"', f'"{collection}__index"'
+            snapshot.execute(
+                f"CREATE TABLE {table} "
+                "(position INTEGER PRIMARY KEY, doc_id BLOB NOT NULL, document BLOB NOT NULL)"
+            )
+            snapshot.execute(
+                f"CREATE TABLE {index_table} "
+                "(field TEXT NOT NULL, value NOT NULL, position INTEGER NOT NULL, "
+                "PRIMARY KEY (field, value, position)) WITHOUT ROWID"
+            )
+
+            count = 0
+            async for document in get_repository(connection, collection).find():
+                snapshot.execute(
+                    f"INSERT INTO {table} VALUES (?, ?, ?)",
+                    (count, document["_id"].binary, bson.encode(document)),
+                )
+                snapshot.executemany(
+                    f"INSERT OR IGNORE INTO {index_table} VALUES (?, ?, ?)",
+                    [(field, key, count) for field in fields for key in _index_keys(document.get(field))],
+                )
+                count += 1
+
+            snapshot.execute(f'CREATE UNIQUE INDEX "{collection}__doc_id" ON {table} (doc_id)')
+            snapshot.execute(
+                "INSERT INTO snapshot_collections VALUES (?, ?, ?)", (collection, ",".join(fields), count)
+            )
+            counts[collection] = count
+            logger.info(f"Exported {count} documents of {collection}.")
+
+        snapshot.executemany(
+            "INSERT INTO snapshot_meta VALUES (?, ?)",
+            [("format_version", FORMAT_VERSION), ("created_at", datetime.utcnow().isoformat() + "Z")],
+        )
+        snapshot.commit()
+        snapshot.execute("ANALYZE")
+        snapshot.execute("VACUUM")
+    finally:
+        snapshot.close()
+
+    os.replace(temporary_path, path)
+    return counts
+
+
+async def _export(path: str) -> Dict[str, int]:
+    # Imported here, the connection module imports this one for the snapshot backend.
+    from app.db.mongodb import db
+    from app.db.mongodb_utils import close_mongo_connection, connect_to_mongo
+
+    await connect_to_mongo()
+    try:
+        return await export_snapshot(db.client, path)
+    finally:
+        await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the configured database to a read-only snapshot.")
+    parser.add_argument("path", help="Path of the snapshot file, replaced when it exists.")
+    args = parser.parse_args()
+
+    counts = asyncio.run(_export(args.path))
+    print(f"Wrote {args.path} ({os.path.getsize(args.path) / 1024 / 1024:.1f} MB): {counts}")
+
+
+if __name__ == "__main__":
+    main()
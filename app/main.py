@@ -3,9 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.api.api_v1.api import api_router
+from app.api import monitoring, profiling
+from app.api.errors import read_only_storage_error_handler
 from app.core.config import settings
 from app.db.mongodb_utils import connect_to_mongo, close_mongo_connection
-from app.utils.log_config import init_logging
+from app.db.repository import ReadOnlyStorageError
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.db_timing import DbTimingMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.services.index_loader import create_database_indexes, load_in_memory_indexes, stop_cache_coherence
+from app.utils.log_config import init_logging, close_logging
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
 
@@ -23,12 +31,27 @@ def setup():
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Total-Count"],
         )
 
+    if settings.PROFILING_TOKEN or settings.PROFILING_SAMPLE_RATE:
+        app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(DbTimingMiddleware)
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
     app.add_event_handler("startup", connect_to_mongo)
+    app.add_event_handler("startup", create_database_indexes)
+    app.add_event_handler("startup", load_in_memory_indexes)
+    app.add_event_handler("shutdown", stop_cache_coherence)
     app.add_event_handler("shutdown", close_mongo_connection)
+    app.add_event_handler("shutdown", close_logging)
+
+    app.add_exception_handler(ReadOnlyStorageError, read_only_storage_error_handler)
 
     app.include_router(api_router, prefix=settings.API_V1_STR)
+    app.include_router(monitoring.router, tags=["monitoring"])
+    app.include_router(profiling.router, tags=["monitoring"])
 
 
 setup()
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from loguru import logger
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.utils.metrics import Counter, Gauge, Histogram
+
+IMPORTS, DICTIONARY, READS, WRITES = "imports", "dictionary", "reads", "writes"
+ROUTE_GROUPS = (IMPORTS, DICTIONARY, READS, WRITES)
+# POST endpoints that only read.
+READ_ONLY_POSTS = ("/text-annotations/", "/example-sentences/readable/")
+
+QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds", "Time requests waited for a slot in seconds.", ("group",)
+)
+REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests rejected because the queue was full or the wait too long.",
+    ("group",),
+)
+ACTIVE = Gauge("admission_active_requests", "Requests holding a slot.", ("group",))
+QUEUED = Gauge("admission_queued_requests", "Requests waiting for a slot.", ("group",))
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    """
+    Route group of a request, None for requests outside the API such as the monitoring endpoints.
+    """
+    if not path.startswith(settings.API_V1_STR):
+        return None
+
+    path = path[len(settings.API_V1_STR) :]
+    if path.startswith("/kanji-dictionaries/"):
+        return DICTIONARY if method in ("GET", "HEAD") else IMPORTS
+    if path.endswith("/export/") or path.startswith("/sync/"):
+        return DICTIONARY
+    if method in ("GET", "HEAD", "OPTIONS") or (method == "POST" and path in READ_ONLY_POSTS):
+        return READS
+    return WRITES
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class AdmissionGate:
+    """
+    At most concurrency requests at a time, with up to queue_depth more waiting for a slot in arrival order.
+    A released slot is handed directly to the first waiter, so new arrivals can't overtake the queue.
+    """
+
+    def __init__(self, group: str, concurrency: int, queue_depth: int):
+        self.group = group
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _update_metrics(self) -> None:
+        ACTIVE.labels(self.group).set(self.active)
+        QUEUED.labels(self.group).set(len(self._waiters))
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a slot.
+
+        :param timeout: Seconds to wait at most, None waits until a slot is free.
+        :return: Returns the seconds waited.
+        :raise QueueFullError: When the queue is full or the timeout passed.
+        """
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._update_metrics()
+            QUEUE_WAIT.labels(self.group).observe(0)
+            return 0.0
+
+        if len(self._waiters) >= self.queue_depth:
+            REJECTED.labels(self.group).inc()
+            raise QueueFullError(f"The {self.group} queue is full.")
+
+        start = time.perf_counter()
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_metrics()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            REJECTED.labels(self.group).inc()
+            raise QueueFullError(f"Waited more than {timeout} seconds for a {self.group} slot.")
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the client went away.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._update_metrics()
+
+        wait = time.perf_counter() - start
+        QUEUE_WAIT.labels(self.group).observe(wait)
+        return wait
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the waiter, active stays the same.
+                waiter.set_result(None)
+                self._update_metrics()
+                return
+
+        self.active -= 1
+        self._update_metrics()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware limiting the concurrent requests per route group: kanji dictionary imports, full reads
+    (the kanji dictionary dump, exports and syncs), other reads, and writes.
+
+    Requests beyond ADMISSION_CONCURRENCY wait in a queue of ADMISSION_QUEUE_DEPTH, requests that don't fit
+    in the queue or wait longer than ADMISSION_QUEUE_TIMEOUT_SECONDS get a 503 with Retry-After. Groups that
+    aren't configured are not limited, so heavy imports and dumps can be throttled while point reads pass.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._gates: Dict[str, AdmissionGate] = {
+            group: AdmissionGate(group, concurrency, settings.ADMISSION_QUEUE_DEPTH.get(group, 0))
+            for group, concurrency in settings.ADMISSION_CONCURRENCY.items()
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gate = self._gates.get(route_group(scope["method"], scope["path"]))
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            wait = await gate.acquire(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+        except QueueFullError as e:
+            logger.warning(f"Rejected {scope['method']} {scope['path']}: {e}")
+            response = JSONResponse(
+                {"detail": "Too many concurrent requests, retry later."},
+                status_code=503,
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        if wait >= 1:
+            logger.info(f"{scope['method']} {scope['path']} waited {wait:.2f} s for a {gate.group} slot.")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
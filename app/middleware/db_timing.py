@@ -0,0 +1,47 @@
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.command_monitoring import RequestDbStats, current_request_stats
+
+
+class DbTimingMiddleware:
+    """
+    ASGI middleware that collects the database round trips and time of every request.
+
+    Requests that make more round trips than MONGO_SLOW_REQUEST_ROUND_TRIPS are logged. With DB_SERVER_TIMING
+    the numbers are also returned in a Server-Timing header, which browsers show in their network panel.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats()
+        token = current_request_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.DB_SERVER_TIMING:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.round_trips} round trips"',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+
+            max_round_trips = settings.MONGO_SLOW_REQUEST_ROUND_TRIPS
+            if max_round_trips is not None and stats.round_trips > max_round_trips:
+                logger.warning(
+                    f"{scope['method']} {scope['path']} made {stats.round_trips} database round trips "
+                    f"taking {stats.db_time * 1000:.1f} ms."
+                )
@@ -0,0 +1,86 @@
+import time
+from typing import Callable, Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import Counter, Gauge, Histogram, SIZE_BUCKETS
+
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter("http_requests_total", "Number of HTTP requests.", ("method", "route", "status"))
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests in seconds.", ("method", "route")
+)
+REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "Size of HTTP request bodies in bytes.", ("method", "route"), SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of HTTP response bodies in bytes.", ("method", "route"), SIZE_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Number of HTTP requests being handled.", ("method",))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, sizes, status codes and in-flight counts per route.
+
+    Requests are labeled with the path template of the route (e.g. /api/v1/kanjis/{doc_id}) rather than the
+    path, to keep the number of label values bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _route_label(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+
+        route_path = self._route_paths.get(endpoint)
+        if route_path is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is not None:
+                    self._route_paths[route.endpoint] = route.path
+            route_path = self._route_paths.setdefault(endpoint, UNMATCHED_ROUTE)
+
+        return route_path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        request_size = 0
+        response_size = 0
+        status = 500
+
+        async def receive_wrapper() -> Message:
+            nonlocal request_size
+            message = await receive()
+            request_size += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_size, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_flight.dec()
+
+            route = self._route_label(scope)
+            REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_DURATION.labels(method, route).observe(duration)
+            REQUEST_SIZE.labels(method, route).observe(request_size)
+            RESPONSE_SIZE.labels(method, route).observe(response_size)
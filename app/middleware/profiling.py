@@ -0,0 +1,68 @@
+import hmac
+import random
+import re
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from loguru import logger
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.utils.profiling import SamplingProfiler, save_profile
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+
+def _authorized(token: str) -> bool:
+    return bool(settings.PROFILING_TOKEN) and hmac.compare_digest(token, settings.PROFILING_TOKEN)
+
+
+def profile_requested(scope: Scope) -> bool:
+    """
+    Whether the request asks to be profiled with the PROFILING_TOKEN in the X-Profile header or the profile
+    query parameter.
+    """
+    token = Headers(scope=scope).get(PROFILE_HEADER)
+    if token is None and scope.get("query_string"):
+        token = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM, [None])[0]
+    return token is not None and _authorized(token)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware writing a CPU profile of requests that ask for it with the PROFILING_TOKEN, and of a
+    PROFILING_SAMPLE_RATE fraction of all requests, to PROFILING_DIRECTORY.
+
+    The middleware is only installed when profiling is configured, so it costs nothing when it's off.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not (
+            random.random() < settings.PROFILING_SAMPLE_RATE or profile_requested(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(settings.PROFILING_INTERVAL_SECONDS)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            duration_ms = (time.perf_counter() - start) * 1000
+            path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+            name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{path}-{duration_ms:.0f}ms"
+            file_name = save_profile(
+                settings.PROFILING_DIRECTORY, name, profiler.folded(), settings.PROFILING_MAX_FILES
+            )
+            logger.info(
+                f"Profiled {scope['method']} {scope['path']} in {duration_ms:.1f} ms, "
+                f"{sum(profiler.samples.values())} samples: {file_name}"
+            )
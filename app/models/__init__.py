@@ -11,6 +11,28 @@ from app.models.example_sentence import (
     ExampleSentenceFilterParams,
     ExampleSentenceInDb,
     ExampleSentenceUpdate,
+    ReadableExampleSentenceFilterParams,
 )
 
-from app.models.kanji_dict import KanjiDict
\ No newline at end of file
+from app.models.kanji_dict import KanjiDict
+from app.models.text_annotation import (
+    AnnotationKindEnum,
+    TextAnnotation,
+    TextAnnotationRequest,
+    TextAnnotationResult,
+)
+from app.models.facet import Facets, FacetFilterParams, ItemFacets, KanjiFacets
+from app.models.quiz import SampleFilterParams
+from app.models.export import ExportFormatEnum
+from app.models.total_count import TotalCountEnum
+from app.models.sync import SyncChanges
+from app.models.rating import ItemRating, RatingUpdate
+from app.models.cooccurrence import RelatedKanji
+from app.models.relink import RelinkJobStatus
+from app.models.coverage import (
+    CoverageFilterParams,
+    CoverageSortEnum,
+    CoverageStats,
+    JlptCoverage,
+    KanjiCoverage,
+)
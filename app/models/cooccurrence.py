@@ -0,0 +1,7 @@
+from app.models.rwmodel import RWModel
+
+
+class RelatedKanji(RWModel):
+    kanji: str
+    # Number of compound words and example sentences related to both kanji.
+    count: int
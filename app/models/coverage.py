@@ -0,0 +1,53 @@
+from enum import Enum
+from typing import Dict, List, Optional
+
+from app.models.rwmodel import RWModel
+
+
+class CoverageSortEnum(str, Enum):
+    kanji = "kanji"
+    jouyou_number = "jouyou_number"
+    compound_words = "compound_words"
+    example_sentences = "example_sentences"
+
+
+class CoverageFilterParams(RWModel):
+    jlpt_levels: List[str] = []
+    # Only kanji with at least min and at most max related compound words and example sentences.
+    min_compound_words: Optional[int] = None
+    max_compound_words: Optional[int] = None
+    min_example_sentences: Optional[int] = None
+    max_example_sentences: Optional[int] = None
+    sort: CoverageSortEnum = CoverageSortEnum.jouyou_number
+    descending: bool = False
+    offset: int = 0
+    limit: int = 100
+
+
+class KanjiCoverage(RWModel):
+    kanji: str
+    jouyou_number: Optional[int] = None
+    jlpt_level: Optional[str] = None
+    compound_words: int = 0
+    example_sentences: int = 0
+    # Number of related compound words and example sentences per rating.
+    compound_word_ratings: Dict[int, int] = {}
+    example_sentence_ratings: Dict[int, int] = {}
+
+
+class JlptCoverage(RWModel):
+    kanji: int = 0
+    # Kanji with at least one related compound word or example sentence.
+    with_compound_words: int = 0
+    with_example_sentences: int = 0
+
+
+class CoverageStats(RWModel):
+    # Number of kanji matching the filters, before offset and limit.
+    total: int = 0
+    kanji: List[KanjiCoverage] = []
+    # Coverage of all kanji per JLPT level, regardless of the filters.
+    jlpt_levels: Dict[str, JlptCoverage] = {}
+    # Number of compound words and example sentences per rating.
+    compound_word_ratings: Dict[int, int] = {}
+    example_sentence_ratings: Dict[int, int] = {}
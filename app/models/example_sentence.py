@@ -10,6 +10,14 @@ class ExampleSentenceFilterParams(RWModel):
     limit: int = 0
 
 
+class ReadableExampleSentenceFilterParams(RWModel):
+    # Kanji the reader knows, every kanji of a returned sentence is in this set.
+    known_kanji: List[str] = []
+    ratings: List[int] = []
+    offset: int = 0
+    limit: int = 100
+
+
 class ExampleSentenceBase(RWModel):
     example_sentence: Optional[str] = None
     hiragana: Optional[str] = None
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class ExportFormatEnum(str, Enum):
+    # One JSON document per line.
+    ndjson = "ndjson"
+    # Comma separated with a header row, related kanji separated by spaces.
+    csv = "csv"
+    # Tab separated notes for Anki: the word or sentence, reading, translation and the related kanji as tags.
+    tsv = "tsv"
@@ -0,0 +1,28 @@
+from typing import Dict, List
+
+from app.models.rwmodel import RWModel
+
+
+class FacetFilterParams(RWModel):
+    related_kanji: List[str] = []
+    ratings: List[int] = []
+
+
+class KanjiFacets(RWModel):
+    jlpt_level: Dict[str, int] = {}
+    kanji_section: Dict[str, int] = {}
+    radical: Dict[str, int] = {}
+    # Stroke counts bucketed per 5 strokes, e.g. "6-10".
+    strokes: Dict[str, int] = {}
+
+
+class ItemFacets(RWModel):
+    rating: Dict[int, int] = {}
+    # Number of items per related kanji. Limited to the filtered kanji when related_kanji is filtered on.
+    per_kanji: Dict[str, int] = {}
+
+
+class Facets(RWModel):
+    kanji: KanjiFacets = KanjiFacets()
+    compound_words: ItemFacets = ItemFacets()
+    example_sentences: ItemFacets = ItemFacets()
@@ -0,0 +1,11 @@
+from typing import List, Optional
+
+from app.models.rwmodel import RWModel
+
+
+class SampleFilterParams(RWModel):
+    related_kanji: List[str] = []
+    ratings: List[int] = []
+    size: int = 10
+    # Optional seed to draw a reproducible sample.
+    seed: Optional[int] = None
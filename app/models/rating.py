@@ -0,0 +1,10 @@
+from app.models.rwmodel import RWModel, ObjectIdStr
+
+
+class RatingUpdate(RWModel):
+    rating: int
+
+
+class ItemRating(RWModel):
+    doc_id: ObjectIdStr
+    rating: int
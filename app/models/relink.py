@@ -0,0 +1,14 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.models.rwmodel import RWModel
+
+
+class RelinkJobStatus(RWModel):
+    running: bool = False
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Documents read and documents that got related kanji added, per collection.
+    scanned: Dict[str, int] = {}
+    changed: Dict[str, int] = {}
+    error: Optional[str] = None
@@ -1,6 +1,6 @@
 from bson import ObjectId
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Mapping, Optional, Type, TypeVar
 
 from pydantic import BaseConfig, BaseModel
 
@@ -17,9 +17,24 @@ class ObjectIdStr(str):
         return str(v)
 
 
+Model = TypeVar("Model", bound="RWModel")
+
+
 class RWModel(BaseModel):
     class Config(BaseConfig):
         allow_population_by_alias = True
         json_encoders = {
             datetime: lambda dt: dt.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
         }
+
+    @classmethod
+    def from_document(cls: Type[Model], document: Mapping[str, Any]) -> Model:
+        """
+        Build a model from a document read from our own database, without validation. Fields the model
+        doesn't have, such as updated_at, are left out and "_id" becomes the doc_id, kept as an ObjectId like
+        the services always assigned it.
+        """
+        values = {name: document[name] for name in cls.__fields__ if name in document}
+        if "doc_id" in cls.__fields__:
+            values["doc_id"] = document.get("_id")
+        return cls.construct(**values)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import List
+
+from app.models.rwmodel import RWModel
+from app.models.compound_word import CompoundWordInDb
+from app.models.example_sentence import ExampleSentenceInDb
+from app.models.kanji import KanjiInDb
+
+
+class SyncChanges(RWModel):
+    # Pass as since to the next sync.
+    watermark: datetime
+    # Replace the local copy by the documents of this response instead of applying them as changes: the first
+    # sync, a sync older than the tombstone retention, or a sync across a full kanji dictionary import.
+    reset: bool = False
+    # Documents created or updated since the watermark.
+    kanji: List[KanjiInDb] = []
+    compound_words: List[CompoundWordInDb] = []
+    example_sentences: List[ExampleSentenceInDb] = []
+    # Doc_ids of the documents deleted since the watermark.
+    deleted_kanji: List[str] = []
+    deleted_compound_words: List[str] = []
+    deleted_example_sentences: List[str] = []
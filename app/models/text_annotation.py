@@ -0,0 +1,26 @@
+from enum import Enum
+from typing import List
+
+from app.models.rwmodel import RWModel
+
+
+class AnnotationKindEnum(str, Enum):
+    compound_word = "compound_word"
+    kanji = "kanji"
+
+
+class TextAnnotationRequest(RWModel):
+    text: str
+
+
+class TextAnnotation(RWModel):
+    # Offsets are character (code point) positions in the posted text, end is exclusive.
+    start: int
+    end: int
+    surface: str
+    kind: AnnotationKindEnum
+    doc_id: str
+
+
+class TextAnnotationResult(RWModel):
+    annotations: List[TextAnnotation] = []
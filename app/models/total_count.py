@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class TotalCountEnum(str, Enum):
+    # From collection metadata without filters, otherwise counted and cached until the next write.
+    estimated = "estimated"
+    # Counted on every request.
+    exact = "exact"
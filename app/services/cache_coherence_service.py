@@ -0,0 +1,379 @@
+"""
+Coherence of the in-memory indexes and dataset between workers.
+
+Every worker applies its own writes to its indexes through the change listeners. To learn about the writes
+of other workers, each worker also publishes its writes to a change log collection: entries numbered by a
+sequence counter in a version document, which the publisher bumps by the number of entries it writes. Every
+worker polls the log for entries after the last one it applied, reads the affected documents and notifies
+its listeners, so only the affected entries of the indexes are patched.
+
+Rating updates are published once the rating buffer has written them, as rating entries that other workers
+apply through their rating listeners only.
+
+A write is visible in other workers within about two CACHE_COHERENCE_INTERVAL_SECONDS. A worker that falls
+further behind than RELOAD_THRESHOLD entries, or finds entries missing, reloads its indexes instead. Writes
+stay pending until their entries are inserted; entries whose sequence numbers were taken but failed to be
+inserted are inserted again on the next round, and readers reload when they stay missing.
+Change streams would avoid the polling but need a replica set, the change log works on a single server.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.services import (
+    change_listeners,
+    compound_word_service,
+    example_sentence_service,
+    kanji_service,
+    rating_buffer_service,
+)
+from app.utils.metrics import Counter
+
+VERSION_ID = "version"
+# Entries behind after which reloading the indexes is cheaper than reading the changed documents.
+RELOAD_THRESHOLD = 10_000
+# Seconds to wait for a missing entry, the sequence number is taken before the entry is inserted.
+GAP_GRACE_SECONDS = 10.0
+DUPLICATE_KEY = 11000
+WRITE, DELETE, DROP, RATING = "write", "delete", "drop", "rating"
+
+# Identifies the entries of this worker, which it already applied when it made the write.
+WORKER_ID = str(ObjectId())
+
+APPLIED_CHANGES = Counter(
+    "cache_coherence_changes_total",
+    "Writes of other workers applied to the in-memory indexes.",
+    ("collection", "op"),
+)
+RELOADS = Counter("cache_coherence_reloads_total", "Reloads of the in-memory indexes by the coherence task.")
+
+GETTERS = {
+    settings.MONGO_KANJI_COLLECTION: kanji_service.get_kanji_by_ids,
+    settings.MONGO_COMPOUND_WORD_COLLECTION: compound_word_service.get_compound_words_by_ids,
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: example_sentence_service.get_example_sentences_by_ids,
+}
+
+_pending: List[Tuple[str, str, str]] = []
+# Entries with a sequence number that failed to be inserted.
+_unwritten: List[dict] = []
+_applying_remote_changes = False
+_task: Optional[asyncio.Task] = None
+
+
+def _write_listener(collection: str):
+    def on_write(doc_id: str, document) -> None:
+        if _task is not None and not _applying_remote_changes:
+            _pending.append((collection, doc_id, WRITE if document is not None else DELETE))
+
+    return on_write
+
+
+def _drop_listener(collection: str):
+    def on_drop() -> None:
+        if _task is not None and not _applying_remote_changes:
+            _pending.append((collection, "", DROP))
+
+    return on_drop
+
+
+def _rating_written_listener(collection: str):
+    def on_rating_written(doc_ids: List[str]) -> None:
+        if _task is not None and not _applying_remote_changes:
+            _pending.extend((collection, doc_id, RATING) for doc_id in doc_ids)
+
+    return on_rating_written
+
+
+for _collection in GETTERS:
+    change_listeners.on_write(_collection, _write_listener(_collection))
+    change_listeners.on_drop(_collection, _drop_listener(_collection))
+    change_listeners.on_rating_written(_collection, _rating_written_listener(_collection))
+
+
+class ChangeFollower:
+    """
+    Position of a worker in the change log. Accepts entries in sequence order and waits a grace period for
+    entries that are missing, since a publisher takes its sequence numbers before it inserts the entries.
+    """
+
+    def __init__(self, last_seen: int, gap_grace: float = GAP_GRACE_SECONDS):
+        self.last_seen = last_seen
+        self._gap_grace = gap_grace
+        self._gap_since: Optional[float] = None
+
+    def accept(
+        self, entries: List[dict], now: float, version: Optional[int] = None
+    ) -> Tuple[List[dict], bool]:
+        """
+        Take the entries that follow the last seen entry without gaps.
+
+        :param entries: Entries after last_seen in sequence order.
+        :param now: Current monotonic time in seconds.
+        :param version: The last sequence number taken, to wait for missing entries after the given ones.
+        :return: The accepted entries, and whether entries were given up on after the grace period.
+        """
+        accepted = []
+        lost = False
+        for entry in entries:
+            if entry["_id"] != self.last_seen + 1:
+                if not self._gap_expired(now):
+                    return accepted, lost
+                lost = True
+            self._gap_since = None
+            self.last_seen = entry["_id"]
+            accepted.append(entry)
+
+        if version is not None and self.last_seen < version and self._gap_expired(now):
+            lost = True
+            self._gap_since = None
+            self.last_seen = version
+        return accepted, lost
+
+    def _gap_expired(self, now: float) -> bool:
+        if self._gap_since is None:
+            self._gap_since = now
+        return now - self._gap_since >= self._gap_grace
+
+
+def latest_changes(entries: List[dict]) -> List[Tuple[str, Optional[List[str]]]]:
+    """
+    Reduce entries to the changed doc_ids per collection, in order. A drop is returned as (collection, None)
+    and discards the earlier changes of the collection.
+    """
+    changes: List[Tuple[str, Optional[List[str]]]] = []
+    doc_ids: Dict[str, "OrderedDict[str, None]"] = {}
+    for entry in entries:
+        collection = entry["collection"]
+        if entry["op"] == DROP:
+            changes = [change for change in changes if change[0] != collection]
+            changes.append((collection, None))
+            doc_ids.pop(collection, None)
+            continue
+
+        if collection not in doc_ids:
+            doc_ids[collection] = OrderedDict()
+            changes.append((collection, []))
+        doc_ids[collection][entry["doc_id"]] = None
+
+    return [
+        (collection, list(doc_ids[collection]) if ids is not None else None) for collection, ids in changes
+    ]
+
+
+def _change_log(connection: AsyncIOMotorClient):
+    return connection[settings.MONGO_DB][settings.MONGO_CHANGE_LOG_COLLECTION]
+
+
+async def current_version(connection: AsyncIOMotorClient) -> int:
+    """
+    Get the sequence number of the last entry in the change log.
+
+    :param connection: Async database client.
+    """
+    version = await _change_log(connection).find_one({"_id": VERSION_ID})
+    return version["seq"] if version else 0
+
+
+async def publish_pending(connection: AsyncIOMotorClient) -> None:
+    """
+    Write the writes of this worker since the last call to the change log.
+
+    :param connection: Async database client.
+    """
+    change_log = _change_log(connection)
+    if _unwritten:
+        await _insert_entries(change_log, _unwritten)
+        del _unwritten[:]
+    if not _pending:
+        return
+
+    changes = list(_pending)
+    version = await change_log.find_one_and_update(
+        {"_id": VERSION_ID},
+        {"$inc": {"seq": len(changes)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    # The sequence numbers are taken, from here on the entries are retried until they are inserted.
+    del _pending[: len(changes)]
+    first = version["seq"] - len(changes) + 1
+    created_at = datetime.utcnow()
+    _unwritten.extend(
+        {
+            "_id": first + index,
+            "collection": collection,
+            "doc_id": doc_id,
+            "op": op,
+            "worker": WORKER_ID,
+            "created_at": created_at,
+        }
+        for index, (collection, doc_id, op) in enumerate(changes)
+    )
+    await _insert_entries(change_log, _unwritten)
+    del _unwritten[:]
+
+
+async def _insert_entries(change_log, entries: List[dict]) -> None:
+    try:
+        await change_log.insert_many(entries, ordered=False)
+    except BulkWriteError as e:
+        # Entries inserted by an earlier attempt are already there.
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+
+
+def rating_changes(entries: List[dict]) -> Dict[str, List[str]]:
+    """
+    Reduce rating entries to the doc_ids with a new rating per collection.
+    """
+    doc_ids: Dict[str, "OrderedDict[str, None]"] = {}
+    for entry in entries:
+        if entry["op"] == RATING:
+            doc_ids.setdefault(entry["collection"], OrderedDict())[entry["doc_id"]] = None
+    return {collection: list(ids) for collection, ids in doc_ids.items()}
+
+
+async def _apply_ratings(connection: AsyncIOMotorClient, entries: List[dict]) -> None:
+    global _applying_remote_changes
+    for collection, doc_ids in rating_changes(entries).items():
+        documents = await GETTERS[collection](connection, doc_ids)
+
+        _applying_remote_changes = True
+        try:
+            for document in documents:
+                change_listeners.notify_rating(collection, str(document.doc_id), document.rating)
+            written = [str(document.doc_id) for document in documents]
+            change_listeners.notify_rating_written(collection, written)
+            APPLIED_CHANGES.labels(collection, RATING).inc(len(documents))
+        finally:
+            _applying_remote_changes = False
+
+
+async def _apply(connection: AsyncIOMotorClient, entries: List[dict]) -> None:
+    global _applying_remote_changes
+    remote_entries = [entry for entry in entries if entry.get("worker") != WORKER_ID]
+    # Both read the documents as they are now, so ratings can be applied before the other writes.
+    await _apply_ratings(connection, remote_entries)
+    remote_entries = [entry for entry in remote_entries if entry["op"] != RATING]
+    for collection, doc_ids in latest_changes(remote_entries):
+        if doc_ids is None:
+            documents = {}
+        else:
+            results = await GETTERS[collection](connection, doc_ids)
+            documents = {str(document.doc_id): document for document in results}
+
+        _applying_remote_changes = True
+        try:
+            if doc_ids is None:
+                change_listeners.notify_drop(collection)
+                APPLIED_CHANGES.labels(collection, DROP).inc()
+                continue
+
+            for doc_id in doc_ids:
+                document = documents.get(doc_id)
+                change_listeners.notify_write(collection, doc_id, document)
+                APPLIED_CHANGES.labels(collection, WRITE if document is not None else DELETE).inc()
+        finally:
+            _applying_remote_changes = False
+
+
+async def poll(
+    connection: AsyncIOMotorClient, follower: ChangeFollower, reload: Callable[[], Awaitable[None]]
+) -> None:
+    """
+    Apply the writes of other workers since the last poll.
+
+    :param connection: Async database client.
+    :param follower: Position of this worker in the change log.
+    :param reload: Reloads all in-memory indexes, used when this worker is too far behind.
+    """
+    version = await current_version(connection)
+    if version - follower.last_seen > RELOAD_THRESHOLD:
+        logger.warning(f"{version - follower.last_seen} writes behind, reloading the in-memory indexes.")
+        await _reload(follower, version, reload)
+        return
+
+    query = {"_id": {"$gt": follower.last_seen, "$lte": version}}
+    cursor = _change_log(connection).find(query).sort("_id", 1)
+    entries, lost = follower.accept([entry async for entry in cursor], time.monotonic(), version)
+    if lost:
+        logger.warning("Writes are missing from the change log, reloading the in-memory indexes.")
+        await _reload(follower, follower.last_seen, reload)
+        return
+
+    await _apply(connection, entries)
+
+
+async def _reload(follower: ChangeFollower, version: int, reload: Callable[[], Awaitable[None]]) -> None:
+    RELOADS.inc()
+    follower.last_seen = version
+    await reload()
+
+
+async def _run(
+    connection: AsyncIOMotorClient, follower: ChangeFollower, reload: Callable[[], Awaitable[None]]
+) -> None:
+    while True:
+        await asyncio.sleep(settings.CACHE_COHERENCE_INTERVAL_SECONDS)
+        try:
+            await publish_pending(connection)
+            await poll(connection, follower, reload)
+        except Exception:
+            logger.exception("Cache coherence round failed.")
+
+
+async def prepare(connection: AsyncIOMotorClient) -> int:
+    """
+    Create the change log indexes and get the current version. Call before loading the indexes, so the
+    writes made while loading are applied again afterwards; applying a write twice is harmless.
+
+    :param connection: Async database client.
+    :return: Returns the version to pass to start.
+    """
+    logger.debug(">>>>")
+    await _change_log(connection).create_index(
+        "created_at", expireAfterSeconds=settings.CACHE_COHERENCE_RETENTION_SECONDS
+    )
+    return await current_version(connection)
+
+
+def start(connection: AsyncIOMotorClient, version: int, reload: Callable[[], Awaitable[None]]) -> None:
+    """
+    Start publishing and polling writes in the background.
+
+    :param connection: Async database client.
+    :param version: The version returned by prepare.
+    :param reload: Reloads all in-memory indexes.
+    """
+    global _task
+    logger.info(f"Following the change log from version {version}.")
+    _task = asyncio.get_event_loop().create_task(_run(connection, ChangeFollower(version), reload))
+
+
+async def stop(connection: AsyncIOMotorClient) -> None:
+    """
+    Stop the background task, write the buffered ratings and publish the remaining writes of this worker.
+
+    :param connection: Async database client.
+    """
+    global _task
+    logger.debug(">>>>")
+    if _task is None:
+        return
+
+    try:
+        await rating_buffer_service.flush(connection)
+    except Exception:
+        logger.exception("Writing the buffered ratings failed, they aren't published.")
+    _task.cancel()
+    _task = None
+    await publish_pending(connection)
@@ -0,0 +1,123 @@
+"""
+Registry of in-process listeners that are notified when the services write to a collection.
+
+In-memory indexes register a listener per collection and keep themselves up to date from the
+notifications, instead of re-reading the collection after every write. Listeners are called
+with upsert-by-id semantics, so applying the same notification twice is harmless.
+
+Rating updates are frequent and change a single field, they notify the rating listeners instead of the write
+listeners: once when the rating is set and once more when it is written to the database. Indexes that depend
+on the rating listen to both writes and ratings.
+"""
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+WriteListener = Callable[[str, Optional[Any]], None]
+DropListener = Callable[[], None]
+RatingListener = Callable[[str, int], None]
+RatingWrittenListener = Callable[[List[str]], None]
+
+_write_listeners: Dict[str, List[WriteListener]] = defaultdict(list)
+_drop_listeners: Dict[str, List[DropListener]] = defaultdict(list)
+_rating_listeners: Dict[str, List[RatingListener]] = defaultdict(list)
+_rating_written_listeners: Dict[str, List[RatingWrittenListener]] = defaultdict(list)
+
+
+def on_write(collection: str, listener: WriteListener) -> None:
+    """
+    Register a listener for writes to a collection.
+
+    :param collection: Name of the collection to listen to.
+    :param listener: Callable taking the doc_id and the document as it is in the database after the
+    write, or None if the document was deleted.
+    """
+    _write_listeners[collection].append(listener)
+
+
+def on_drop(collection: str, listener: DropListener) -> None:
+    """
+    Register a listener that is called when all documents of a collection are removed.
+
+    :param collection: Name of the collection to listen to.
+    :param listener: Callable without arguments.
+    """
+    _drop_listeners[collection].append(listener)
+
+
+def on_rating(collection: str, listener: RatingListener) -> None:
+    """
+    Register a listener for rating updates of a collection, called when the rating is set in this worker.
+
+    :param collection: Name of the collection to listen to.
+    :param listener: Callable taking the doc_id and the new rating.
+    """
+    _rating_listeners[collection].append(listener)
+
+
+def on_rating_written(collection: str, listener: RatingWrittenListener) -> None:
+    """
+    Register a listener that is called when rating updates of a collection are written to the database.
+
+    :param collection: Name of the collection to listen to.
+    :param listener: Callable taking the doc_ids of the written ratings.
+    """
+    _rating_written_listeners[collection].append(listener)
+
+
+def notify_write(collection: str, doc_id: str, document: Optional[Any]) -> None:
+    """
+    Notify the listeners of a collection that a document was created, updated or deleted.
+
+    :param collection: Name of the collection that was written to.
+    :param doc_id: The doc_id of the document that was written.
+    :param document: The document as it is in the database, or None if it was deleted.
+    """
+    for listener in _write_listeners.get(collection, ()):
+        try:
+            listener(str(doc_id), document)
+        except Exception:
+            logger.exception(f"Write listener {listener} failed for {collection} {doc_id}.")
+
+
+def notify_drop(collection: str) -> None:
+    """
+    Notify the listeners of a collection that all its documents were removed.
+
+    :param collection: Name of the collection that was dropped.
+    """
+    for listener in _drop_listeners.get(collection, ()):
+        try:
+            listener()
+        except Exception:
+            logger.exception(f"Drop listener {listener} failed for {collection}.")
+
+
+def notify_rating(collection: str, doc_id: str, rating: int) -> None:
+    """
+    Notify the rating listeners of a collection that the rating of a document was updated.
+
+    :param collection: Name of the collection of the document.
+    :param doc_id: The doc_id of the document.
+    :param rating: The new rating.
+    """
+    for listener in _rating_listeners.get(collection, ()):
+        try:
+            listener(str(doc_id), rating)
+        except Exception:
+            logger.exception(f"Rating listener {listener} failed for {collection} {doc_id}.")
+
+
+def notify_rating_written(collection: str, doc_ids: List[str]) -> None:
+    """
+    Notify the listeners of a collection that rating updates were written to the database.
+
+    :param collection: Name of the collection that was written to.
+    :param doc_ids: The doc_ids of the documents with a written rating.
+    """
+    for listener in _rating_written_listeners.get(collection, ()):
+        try:
+            listener([str(doc_id) for doc_id in doc_ids])
+        except Exception:
+            logger.exception(f"Rating written listener {listener} failed for {collection}.")
@@ -1,15 +1,24 @@
-import json
-from typing import List
-from bson import ObjectId
+from typing import List, Optional
 from datetime import datetime
 
 
+from bson import ObjectId
 from loguru import logger
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic.utils import Obj
 
 from app.core.config import settings
 from app import models
+from app.db.repository import Where, get_repository
+from app.services import (
+    change_listeners,
+    dataset_service,
+    rating_buffer_service,
+    related_kanji_service,
+    sync_service,
+    total_count_service,
+)
+from app.utils.single_flight import single_flight
 
 
 async def create_compound_word(
@@ -23,15 +32,19 @@ async def create_compound_word(
     :return: Returns compound_word document as it is in the database.
     """
     logger.debug(">>>>")
+    compound_word.related_kanji = await related_kanji_service.link_related_kanji(
+        connection, compound_word.compound_word, compound_word.related_kanji
+    )
     compound_word_doc = compound_word.dict()
-    logger.info(f"Creating compound_word doc: {json.dumps(compound_word_doc, indent=2, ensure_ascii=False)}")
+    logger.info(f"Creating compound_word doc for '{compound_word.compound_word}'.")
+    logger.bind(payload=compound_word_doc).debug("Compound_word doc to create.")
     compound_word_doc["updated_at"] = datetime.utcnow()
 
-    result = await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].insert_one(
-        compound_word_doc
-    )
+    repository = get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION)
+    inserted_id = await repository.insert_one(compound_word_doc)
     compound_word_in_db = models.CompoundWordInDb(**compound_word_doc)
-    compound_word_in_db.doc_id = result.inserted_id
+    compound_word_in_db.doc_id = inserted_id
+    change_listeners.notify_write(settings.MONGO_COMPOUND_WORD_COLLECTION, inserted_id, compound_word_in_db)
 
     return compound_word_in_db
 
@@ -47,14 +60,14 @@ async def get_compound_word_doc_by_compound_word(
     :return: Returns compound_word document as it is in the database.
     """
     logger.debug(">>>>")
-    logger.info(f"Retrieving compound_word data for {compound_word}...")
+    logger.debug(f"Retrieving compound_word data for {compound_word}...")
 
-    compound_word_doc = await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].find_one(
-        {"compound_word": compound_word}
-    )
+    repository = get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION)
+    compound_word_doc = await repository.find_one_by("compound_word", compound_word)
     if compound_word_doc:
-        compound_word_in_db = models.CompoundWordInDb(**compound_word_doc)
-        compound_word_in_db.doc_id = compound_word_doc.get("_id")
+        compound_word_in_db = models.CompoundWordInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_COMPOUND_WORD_COLLECTION, compound_word_doc)
+        )
 
         return compound_word_in_db
 
@@ -68,20 +81,28 @@ async def get_compound_word_doc_by_id(connection: AsyncIOMotorClient, doc_id: st
     :return: Returns compound_word document as it is in the database.
     """
     logger.debug(">>>>")
-    logger.info(f"Retrieving compound_word data for {doc_id}...")
+    logger.debug(f"Retrieving compound_word data for {doc_id}...")
 
-    compound_word_doc = await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].find_one(
-        {"_id": ObjectId(doc_id)}
-    )
+    repository = get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION)
+    compound_word_doc = await repository.find_one_by_id(doc_id)
     if compound_word_doc:
-        if "doc_id" in compound_word_doc:
-            del compound_word_doc["doc_id"]
-        compound_word_in_db = models.CompoundWordInDb(**compound_word_doc)
-        compound_word_in_db.doc_id = compound_word_doc.get("_id")
+        compound_word_in_db = models.CompoundWordInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_COMPOUND_WORD_COLLECTION, compound_word_doc)
+        )
 
         return compound_word_in_db
 
 
+def _where(filters: models.CompoundWordFilterParams) -> Where:
+    where = {}
+    if filters.related_kanji:
+        where["related_kanji"] = filters.related_kanji
+    if filters.ratings:
+        where["rating"] = filters.ratings
+    return where
+
+
+@single_flight("compound_words")
 async def get_compound_words(
     connection: AsyncIOMotorClient,
     filters: models.CompoundWordFilterParams = models.CompoundWordFilterParams(),
@@ -95,33 +116,69 @@ async def get_compound_words(
     :return: Returns all compound_word documents as a list.
     """
     logger.debug(">>>>")
-    query = {}
-    if filters.related_kanji:
-        query["related_kanji"] = {"$in": filters.related_kanji}
-    if filters.ratings:
-        query["rating"] = {"$in": filters.ratings}
-
-    if query:
-        results = connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].find(
-            query, skip=filters.offset, limit=filters.limit
-        )
-    else:
-        results = connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].find(
-            skip=filters.offset, limit=filters.limit
+    if dataset_service.dataset.loaded:
+        return dataset_service.dataset.compound_words.find(
+            filters.related_kanji, filters.ratings, filters.offset, filters.limit
         )
 
+    results = get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION).find(
+        _where(filters), offset=filters.offset, limit=filters.limit
+    )
+
     compound_word_results = []
     async for result in results:
-        if "doc_id" in result:
-            del result["doc_id"]
-        compound_word_in_db = models.CompoundWordInDb(**result)
-        compound_word_in_db.doc_id = result.get("_id")
+        compound_word_in_db = models.CompoundWordInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_COMPOUND_WORD_COLLECTION, result)
+        )
         compound_word_results.append(compound_word_in_db)
 
-    logger.info(f"Retrieved {len(compound_word_results)} compound_word.")
+    logger.debug(f"Retrieved {len(compound_word_results)} compound_word.")
     return compound_word_results
 
 
+async def count_compound_words(
+    connection: AsyncIOMotorClient, filters: models.CompoundWordFilterParams, mode: models.TotalCountEnum
+) -> int:
+    """
+    Count the compound_word documents matching the filters, ignoring offset and limit.
+
+    :param connection: Async database client.
+    :param filters: CompoundWordFilterParams instance with the filters of the list request.
+    :param mode: Estimated counts may be cached, exact counts are always counted.
+    :return: Returns the number of matching documents.
+    """
+    logger.debug(">>>>")
+    return await total_count_service.get_total_count(
+        connection, settings.MONGO_COMPOUND_WORD_COLLECTION, _where(filters), mode
+    )
+
+
+async def get_compound_words_by_ids(
+    connection: AsyncIOMotorClient, doc_ids: List[str]
+) -> List[models.CompoundWordInDb]:
+    """
+    Get compound_word documents by doc_id in a single query.
+
+    :param connection: Async database client.
+    :param doc_ids: The doc_ids of the documents to retrieve.
+    :return: Returns the compound_word documents in the order of doc_ids. Unknown doc_ids are skipped.
+    """
+    logger.debug(">>>>")
+    if not doc_ids:
+        return []
+
+    results = await get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION).find_by_ids(doc_ids)
+
+    compound_words_by_id = {}
+    for result in results:
+        compound_word_in_db = models.CompoundWordInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_COMPOUND_WORD_COLLECTION, result)
+        )
+        compound_words_by_id[str(result["_id"])] = compound_word_in_db
+
+    return [compound_words_by_id[doc_id] for doc_id in doc_ids if doc_id in compound_words_by_id]
+
+
 async def delete_compound_word_doc_by_compound_word(
     connection: AsyncIOMotorClient, compound_word: str
 ) -> None:
@@ -133,9 +190,12 @@ async def delete_compound_word_doc_by_compound_word(
     """
 
     logger.info(f"Deleting compound_word '{compound_word}'...")
-    await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].delete_many(
-        {"compound_word": compound_word}
-    )
+    repository = get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION)
+    doc_ids = await repository.find_ids_by("compound_word", compound_word)
+    await repository.delete_by_ids(doc_ids)
+    await sync_service.record_deletes(connection, settings.MONGO_COMPOUND_WORD_COLLECTION, doc_ids)
+    for doc_id in doc_ids:
+        change_listeners.notify_write(settings.MONGO_COMPOUND_WORD_COLLECTION, doc_id, None)
     logger.info(f"Deleted compound_word '{compound_word}'.")
 
 
@@ -148,9 +208,9 @@ async def delete_compound_word_doc_by_id(connection: AsyncIOMotorClient, doc_id:
     """
 
     logger.info(f"Deleting compound_word '{doc_id}'...")
-    await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].delete_many(
-        {"_id": ObjectId(doc_id)}
-    )
+    await get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION).delete_by_ids([doc_id])
+    await sync_service.record_deletes(connection, settings.MONGO_COMPOUND_WORD_COLLECTION, [doc_id])
+    change_listeners.notify_write(settings.MONGO_COMPOUND_WORD_COLLECTION, doc_id, None)
     logger.info(f"Deleted compound_word '{doc_id}'.")
 
 
@@ -167,31 +227,70 @@ async def update_compound_word_doc_by_id(
     :return: Returns compound_word document as it is in the database.
     """
     logger.debug(">>>>")
-    db_compound_word = await get_compound_word_doc_by_id(connection, doc_id)
+    # Read inside the context, so the replaced document has the latest buffered rating, unless the update
+    # changes it.
+    async with rating_buffer_service.replacing(
+        settings.MONGO_COMPOUND_WORD_COLLECTION, doc_id
+    ) as buffered_rating:
+        db_compound_word = await get_compound_word_doc_by_id(connection, doc_id)
+        if buffered_rating is not None:
+            db_compound_word.rating = buffered_rating
 
-    if compoundWordUpdate.compound_word:
-        db_compound_word.compound_word = compoundWordUpdate.compound_word
+        if compoundWordUpdate.compound_word:
+            db_compound_word.compound_word = compoundWordUpdate.compound_word
 
-    if compoundWordUpdate.hiragana:
-        db_compound_word.hiragana = compoundWordUpdate.hiragana
+        if compoundWordUpdate.hiragana:
+            db_compound_word.hiragana = compoundWordUpdate.hiragana
 
-    if compoundWordUpdate.translation:
-        db_compound_word.translation = compoundWordUpdate.translation
+        if compoundWordUpdate.translation:
+            db_compound_word.translation = compoundWordUpdate.translation
 
-    if compoundWordUpdate.related_kanji:
-        db_compound_word.related_kanji = compoundWordUpdate.related_kanji
+        if compoundWordUpdate.related_kanji:
+            db_compound_word.related_kanji = compoundWordUpdate.related_kanji
 
-    if compoundWordUpdate.rating:
-        db_compound_word.rating = compoundWordUpdate.rating
+        if compoundWordUpdate.rating:
+            db_compound_word.rating = compoundWordUpdate.rating
 
-    updated_doc = db_compound_word.dict()
-    updated_doc["doc_id"] = str(updated_doc["doc_id"])
-    logger.info(
-        f"Updating compound_word {doc_id} with: {json.dumps(updated_doc, indent=2, ensure_ascii=False)}"
-    )
+        db_compound_word.related_kanji = await related_kanji_service.link_related_kanji(
+            connection, db_compound_word.compound_word, db_compound_word.related_kanji
+        )
 
-    await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].replace_one(
-        {"_id": ObjectId(doc_id)}, updated_doc
-    )
+        updated_doc = db_compound_word.dict()
+        updated_doc["doc_id"] = str(updated_doc["doc_id"])
+        updated_doc["updated_at"] = datetime.utcnow()
+        logger.info(f"Updating compound_word {doc_id}.")
+        logger.bind(payload=updated_doc).debug("Updated compound_word doc.")
+
+        await get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION).replace_one(
+            doc_id, updated_doc
+        )
+    change_listeners.notify_write(settings.MONGO_COMPOUND_WORD_COLLECTION, doc_id, db_compound_word)
 
     return db_compound_word
+
+
+async def update_compound_word_rating(
+    connection: AsyncIOMotorClient, doc_id: str, rating: int
+) -> Optional[models.ItemRating]:
+    """
+    Update the rating of a single compound_word. The rating is written behind, see rating_buffer_service.
+
+    :param connection: Async database client.
+    :param doc_id: The unique doc_id to update a document by.
+    :param rating: The new rating.
+    :return: Returns the doc_id and the new rating, None if there is no document with the doc_id.
+    """
+    logger.debug(">>>>")
+    if not await get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION).exists(doc_id):
+        return None
+
+    await rating_buffer_service.add(connection, settings.MONGO_COMPOUND_WORD_COLLECTION, doc_id, rating)
+
+    return models.ItemRating.construct(doc_id=ObjectId(doc_id), rating=rating)
+
+
+# Calls in flight when a document is written may not see the write.
+change_listeners.on_write(
+    settings.MONGO_COMPOUND_WORD_COLLECTION, lambda doc_id, document: get_compound_words.flight.forget()
+)
+change_listeners.on_drop(settings.MONGO_COMPOUND_WORD_COLLECTION, get_compound_words.flight.forget)
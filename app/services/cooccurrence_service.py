@@ -0,0 +1,126 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners
+
+COLLECTIONS = (settings.MONGO_COMPOUND_WORD_COLLECTION, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+
+
+class CooccurrenceGraph:
+    """
+    Weighted graph of the kanji that are related to the same compound words and example sentences: for
+    every kanji the number of items shared with each other kanji. Maintained incrementally from writes.
+    """
+
+    def __init__(self):
+        self._items: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._neighbors: Dict[str, Counter] = {}
+        # Neighbors sorted by count, computed on the first read after a change of the kanji.
+        self._ranked: Dict[str, List[Tuple[str, int]]] = {}
+
+    def __len__(self):
+        return len(self._neighbors)
+
+    def upsert(self, collection: str, doc_id: str, related_kanji: Optional[Iterable[str]]) -> None:
+        """
+        Add, replace or remove (when related_kanji is None) the related kanji of an item.
+        """
+        key = (collection, doc_id)
+        old = self._items.pop(key, None)
+        if old:
+            self._link(old, -1)
+
+        if related_kanji is None:
+            return
+
+        kanji = tuple(dict.fromkeys(related_kanji))
+        if len(kanji) > 1:
+            self._items[key] = kanji
+            self._link(kanji, 1)
+
+    def clear(self, collection: str) -> None:
+        """
+        Remove all items of a collection.
+        """
+        for key in [key for key in self._items if key[0] == collection]:
+            self.upsert(*key, None)
+
+    def _link(self, kanji: Tuple[str, ...], amount: int) -> None:
+        for first in kanji:
+            neighbors = self._neighbors.setdefault(first, Counter())
+            for second in kanji:
+                if second != first:
+                    neighbors[second] += amount
+                    if neighbors[second] <= 0:
+                        del neighbors[second]
+            if not neighbors:
+                del self._neighbors[first]
+            self._ranked.pop(first, None)
+
+    def neighbors(self, kanji: str, limit: int) -> List[Tuple[str, int]]:
+        """
+        The kanji most often related to the same items as kanji, with the number of shared items.
+        """
+        ranked = self._ranked.get(kanji)
+        if ranked is None:
+            counts = self._neighbors.get(kanji, {})
+            ranked = sorted(counts.items(), key=lambda neighbor: (-neighbor[1], neighbor[0]))
+            self._ranked[kanji] = ranked
+        return ranked[:limit]
+
+
+graph = CooccurrenceGraph()
+
+
+def _item_listener(collection: str):
+    def on_item_write(doc_id: str, item) -> None:
+        graph.upsert(collection, doc_id, (item.related_kanji or ()) if item else None)
+
+    return on_item_write
+
+
+def _drop_listener(collection: str):
+    def on_drop() -> None:
+        graph.clear(collection)
+
+    return on_drop
+
+
+for _collection in COLLECTIONS:
+    change_listeners.on_write(_collection, _item_listener(_collection))
+    change_listeners.on_drop(_collection, _drop_listener(_collection))
+
+
+async def load_cooccurrence_graph(connection: AsyncIOMotorClient) -> None:
+    """
+    Load the co-occurrence graph from the related kanji of all compound words and example sentences.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    for collection in COLLECTIONS:
+        graph.clear(collection)
+        results = get_repository(connection, collection).find(fields=["related_kanji"])
+        async for result in results:
+            graph.upsert(collection, str(result["_id"]), result.get("related_kanji") or ())
+
+    logger.info(f"Loaded the co-occurrence graph of {len(graph)} kanji.")
+
+
+def get_related_kanji(kanji: str, limit: int) -> List[models.RelatedKanji]:
+    """
+    Get the kanji most often related to the same compound words and example sentences as a kanji.
+
+    :param kanji: The kanji to get the related kanji of.
+    :param limit: Maximum number of related kanji.
+    :return: Returns the related kanji with the number of shared items, most shared first.
+    """
+    return [
+        models.RelatedKanji(kanji=neighbor, count=count) for neighbor, count in graph.neighbors(kanji, limit)
+    ]
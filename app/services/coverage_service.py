@@ -0,0 +1,164 @@
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners, facet_service
+from app.services.facet_service import ItemFacetCounters
+
+COMPOUND_WORDS = settings.MONGO_COMPOUND_WORD_COLLECTION
+EXAMPLE_SENTENCES = settings.MONGO_EXAMPLE_SENTENCE_COLLECTION
+
+KanjiEntry = Tuple[str, Optional[int], Optional[str]]
+
+
+class CoverageIndex:
+    """
+    The kanji with their jouyou number and JLPT level, maintained incrementally from kanji writes, combined
+    with the per kanji counts of compound words and example sentences of the facet counters.
+    """
+
+    def __init__(self, item_counters: Dict[str, ItemFacetCounters]):
+        self._item_counters = item_counters
+        # Kanji, jouyou number and JLPT level per kanji doc_id, and the doc_id per kanji.
+        self._kanji_by_id: Dict[str, KanjiEntry] = {}
+        self._ids_by_kanji: Dict[str, str] = {}
+
+    def upsert_kanji(
+        self, doc_id: str, kanji: Optional[str], jouyou_number: Optional[int], jlpt_level: Optional[str]
+    ) -> None:
+        """
+        Add, replace or remove (when kanji is None) a kanji.
+        """
+        old = self._kanji_by_id.pop(doc_id, None)
+        if old and self._ids_by_kanji.get(old[0]) == doc_id:
+            del self._ids_by_kanji[old[0]]
+
+        if kanji:
+            self._kanji_by_id[doc_id] = (kanji, jouyou_number, jlpt_level)
+            self._ids_by_kanji[kanji] = doc_id
+
+    def clear_kanji(self) -> None:
+        self._kanji_by_id.clear()
+        self._ids_by_kanji.clear()
+
+    def stats(self, filters: models.CoverageFilterParams) -> models.CoverageStats:
+        compound_words = self._item_counters[COMPOUND_WORDS]
+        example_sentences = self._item_counters[EXAMPLE_SENTENCES]
+        jlpt_levels = set(filters.jlpt_levels)
+        ranges = (
+            (compound_words, filters.min_compound_words, filters.max_compound_words),
+            (example_sentences, filters.min_example_sentences, filters.max_example_sentences),
+        )
+
+        jlpt_coverage: Dict[str, models.JlptCoverage] = {}
+        matches = []
+        for doc_id in self._ids_by_kanji.values():
+            kanji, jouyou_number, jlpt_level = self._kanji_by_id[doc_id]
+            if jlpt_level is not None:
+                level = jlpt_coverage.setdefault(jlpt_level, models.JlptCoverage())
+                level.kanji += 1
+                level.with_compound_words += compound_words.kanji_count(kanji) > 0
+                level.with_example_sentences += example_sentences.kanji_count(kanji) > 0
+
+            if jlpt_levels and jlpt_level not in jlpt_levels:
+                continue
+            if any(
+                (low is not None and counters.kanji_count(kanji) < low)
+                or (high is not None and counters.kanji_count(kanji) > high)
+                for counters, low, high in ranges
+            ):
+                continue
+            matches.append((kanji, jouyou_number, jlpt_level))
+
+        matches.sort(key=self._sort_key(filters.sort), reverse=filters.descending)
+
+        end = filters.offset + filters.limit if filters.limit else None
+        return models.CoverageStats(
+            total=len(matches),
+            kanji=[
+                models.KanjiCoverage(
+                    kanji=kanji,
+                    jouyou_number=jouyou_number,
+                    jlpt_level=jlpt_level,
+                    compound_words=compound_words.kanji_count(kanji),
+                    example_sentences=example_sentences.kanji_count(kanji),
+                    compound_word_ratings=compound_words.kanji_ratings(kanji),
+                    example_sentence_ratings=example_sentences.kanji_ratings(kanji),
+                )
+                for kanji, jouyou_number, jlpt_level in matches[filters.offset : end]
+            ],
+            jlpt_levels=jlpt_coverage,
+            compound_word_ratings=dict(sorted(compound_words.ratings([], []).items())),
+            example_sentence_ratings=dict(sorted(example_sentences.ratings([], []).items())),
+        )
+
+    def _sort_key(self, sort: models.CoverageSortEnum):
+        if sort == models.CoverageSortEnum.kanji:
+
+            def key(match: KanjiEntry):
+                return match[0]
+
+        elif sort == models.CoverageSortEnum.jouyou_number:
+
+            def key(match: KanjiEntry):
+                return match[1] is None, match[1] or 0, match[0]
+
+        else:
+            counters = self._item_counters[
+                COMPOUND_WORDS if sort == models.CoverageSortEnum.compound_words else EXAMPLE_SENTENCES
+            ]
+
+            def key(match: KanjiEntry):
+                return counters.kanji_count(match[0]), match[0]
+
+        return key
+
+
+coverage = CoverageIndex(facet_service.item_counters)
+
+
+def _on_kanji_write(doc_id: str, kanji: Optional[models.KanjiInDb]) -> None:
+    if kanji:
+        coverage.upsert_kanji(doc_id, kanji.kanji, kanji.jouyou_number, kanji.jlpt_level)
+    else:
+        coverage.upsert_kanji(doc_id, None, None, None)
+
+
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, _on_kanji_write)
+change_listeners.on_drop(settings.MONGO_KANJI_COLLECTION, coverage.clear_kanji)
+
+
+async def load_coverage_index(connection: AsyncIOMotorClient) -> None:
+    """
+    Load the jouyou number and JLPT level of all kanji. The counts of compound words and example sentences
+    are loaded with the facet counters.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    coverage.clear_kanji()
+    kanji_results = get_repository(connection, settings.MONGO_KANJI_COLLECTION).find(
+        fields=["kanji", "jouyou_number", "jlpt_level"]
+    )
+    async for result in kanji_results:
+        coverage.upsert_kanji(
+            str(result["_id"]), result.get("kanji"), result.get("jouyou_number"), result.get("jlpt_level")
+        )
+
+    logger.info("Loaded the coverage index.")
+
+
+async def get_coverage_stats(filters: models.CoverageFilterParams) -> models.CoverageStats:
+    """
+    Get the number of compound words and example sentences related to every kanji, answered from the
+    in-memory coverage index and facet counters.
+
+    :param filters: CoverageFilterParams instance with the JLPT levels, count ranges, sort order and page.
+    :return: Returns the coverage of the matching kanji, per JLPT level and per rating.
+    """
+    logger.debug(">>>>")
+    return coverage.stats(filters)
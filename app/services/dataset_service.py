@@ -0,0 +1,349 @@
+"""
+Compact in-process copy of all kanji, compound words and example sentences, for serving the list and kanji
+dictionary endpoints without database round trips.
+
+Documents are kept as __slots__ records instead of models or dicts. Strings are interned in a pool shared by
+all records, so readings and translations that occur many times are stored once, and related_kanji are
+stored as arrays of integer kanji ids. Models are only built for the records a request returns. The dataset
+is loaded at startup and kept up to date by the change listeners.
+"""
+import sys
+from array import array
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners
+from app.utils.metrics import Gauge
+
+DATASET_MEMORY = Gauge(
+    "dataset_memory_bytes", "Estimated memory of the in-process dataset in bytes.", ("collection",)
+)
+DATASET_DOCUMENTS = Gauge(
+    "dataset_documents", "Number of documents in the in-process dataset.", ("collection",)
+)
+
+KANJI_FIELDS = (
+    "jouyou_number",
+    "kanji",
+    "kanji_section",
+    "radical",
+    "strokes",
+    "jlpt_level",
+    "frequency_rank",
+    "onyomi",
+    "kunyomi",
+    "meaning",
+)
+ITEM_FIELDS = ("text", "hiragana", "translation", "rating", "related_kanji")
+
+
+class StringPool:
+    """
+    Interned strings and integer ids of kanji. Strings are never removed, the pool only grows with new
+    distinct values.
+    """
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+        self._kanji_ids: Dict[str, int] = {}
+        self._kanji: List[str] = []
+        self.memory_bytes = 0
+
+    def intern(self, value: Any) -> Any:
+        if not isinstance(value, str):
+            return value
+
+        interned = self._strings.get(value)
+        if interned is None:
+            interned = self._strings[value] = value
+            self.memory_bytes += sys.getsizeof(value)
+        return interned
+
+    def intern_all(self, values: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+        return tuple(self.intern(value) for value in values) if values is not None else None
+
+    def kanji_id(self, kanji: str) -> int:
+        kanji_id = self._kanji_ids.get(kanji)
+        if kanji_id is None:
+            kanji_id = self._kanji_ids[kanji] = len(self._kanji)
+            self._kanji.append(self.intern(kanji))
+        return kanji_id
+
+    def known_kanji_id(self, kanji: str) -> Optional[int]:
+        return self._kanji_ids.get(kanji)
+
+    def kanji(self, kanji_id: int) -> str:
+        return self._kanji[kanji_id]
+
+    def clear(self) -> None:
+        self.__init__()
+
+
+class KanjiRecord:
+    __slots__ = KANJI_FIELDS
+
+
+class ItemRecord:
+    """
+    A compound word or example sentence, with the compound word or sentence itself in text and the related
+    kanji as kanji ids.
+    """
+
+    __slots__ = ("position",) + ITEM_FIELDS
+
+
+def _record_size(record) -> int:
+    # Strings are counted once in the pool, containers per record.
+    size = sys.getsizeof(record)
+    for field in type(record).__slots__:
+        value = getattr(record, field)
+        if isinstance(value, (tuple, array)):
+            size += sys.getsizeof(value)
+    return size
+
+
+class KanjiTable:
+    def __init__(self, pool: StringPool):
+        self._pool = pool
+        self._records: Dict[ObjectId, KanjiRecord] = {}
+        self.memory_bytes = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def upsert(self, doc_id: ObjectId, kanji: Optional[Any]) -> None:
+        """
+        Add, replace or remove (when kanji is None) a kanji, from a model or a document.
+        """
+        old = self._records.pop(doc_id, None) if kanji is None else self._records.get(doc_id)
+        if old is not None:
+            self.memory_bytes -= _record_size(old)
+        if kanji is None:
+            return
+
+        get = kanji.get if isinstance(kanji, dict) else lambda field: getattr(kanji, field, None)
+        record = KanjiRecord()
+        for field in KANJI_FIELDS:
+            value = get(field)
+            # Enum members such as KanjiSectionEnum are stored by their value.
+            value = getattr(value, "value", value)
+            if isinstance(value, list):
+                setattr(record, field, self._pool.intern_all(value))
+            else:
+                setattr(record, field, self._pool.intern(value))
+        # Assigning to an existing key keeps the insertion order, like a replace in the database.
+        self._records[doc_id] = record
+        self.memory_bytes += _record_size(record)
+
+    def clear(self) -> None:
+        self.__init__(self._pool)
+
+    def find(self, offset: int = 0, limit: int = 0) -> List[models.KanjiInDb]:
+        results = []
+        for doc_id, record in islice(self._records.items(), offset, offset + limit if limit else None):
+            fields = {}
+            for field in KANJI_FIELDS:
+                value = getattr(record, field)
+                # Tuples of the pool become lists, as the validation of the model made them.
+                fields[field] = list(value) if isinstance(value, tuple) else value
+            results.append(models.KanjiInDb.construct(doc_id=doc_id, **fields))
+        return results
+
+
+class ItemTable:
+    """
+    Compound words or example sentences, with posting sets per kanji id for the related_kanji filter.
+    """
+
+    def __init__(self, pool: StringPool, text_field: str, model):
+        self._pool = pool
+        self._text_field = text_field
+        self._model = model
+        self._records: Dict[ObjectId, ItemRecord] = {}
+        self._postings: Dict[int, Set[ObjectId]] = {}
+        self._next_position = 0
+        self.memory_bytes = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def upsert(self, doc_id: ObjectId, item: Optional[Any]) -> None:
+        """
+        Add, replace or remove (when item is None) an item, from a model or a document.
+        """
+        old = self._records.pop(doc_id, None) if item is None else self._records.get(doc_id)
+        if old is not None:
+            self.memory_bytes -= _record_size(old)
+            for kanji_id in old.related_kanji or ():
+                doc_ids = self._postings.get(kanji_id)
+                if doc_ids is not None:
+                    doc_ids.discard(doc_id)
+                    if not doc_ids:
+                        del self._postings[kanji_id]
+        if item is None:
+            return
+
+        get = item.get if isinstance(item, dict) else lambda field: getattr(item, field, None)
+        record = ItemRecord()
+        record.position = old.position if old is not None else self._next_position
+        self._next_position += old is None
+        record.text = self._pool.intern(get(self._text_field))
+        record.hiragana = self._pool.intern(get("hiragana"))
+        record.translation = self._pool.intern(get("translation"))
+        record.rating = get("rating") or 0
+        related_kanji = get("related_kanji")
+        if related_kanji is not None:
+            record.related_kanji = array("I", [self._pool.kanji_id(kanji) for kanji in related_kanji])
+        else:
+            record.related_kanji = None
+        self._records[doc_id] = record
+        for kanji_id in record.related_kanji or ():
+            self._postings.setdefault(kanji_id, set()).add(doc_id)
+        self.memory_bytes += _record_size(record)
+
+    def set_rating(self, doc_id: ObjectId, rating: Optional[int]) -> None:
+        record = self._records.get(doc_id)
+        if record is not None:
+            record.rating = rating or 0
+
+    def clear(self) -> None:
+        self.__init__(self._pool, self._text_field, self._model)
+
+    def _matching(
+        self, related_kanji: List[str], ratings: List[int]
+    ) -> Iterable[Tuple[ObjectId, ItemRecord]]:
+        if related_kanji:
+            doc_ids = set()
+            for kanji in related_kanji:
+                kanji_id = self._pool.known_kanji_id(kanji)
+                if kanji_id is not None:
+                    doc_ids.update(self._postings.get(kanji_id, ()))
+            items = sorted(
+                ((doc_id, self._records[doc_id]) for doc_id in doc_ids), key=lambda item: item[1].position
+            )
+        else:
+            items = self._records.items()
+
+        if not ratings:
+            return items
+        ratings = set(ratings)
+        return ((doc_id, record) for doc_id, record in items if record.rating in ratings)
+
+    def find(
+        self, related_kanji: List[str], ratings: List[int], offset: int = 0, limit: int = 0
+    ) -> List[Any]:
+        """
+        Models of the items related to any of related_kanji with one of ratings, in insertion order.
+        """
+        results = []
+        matching = self._matching(related_kanji, ratings)
+        for doc_id, record in islice(matching, offset, offset + limit if limit else None):
+            related_kanji = record.related_kanji
+            if related_kanji is not None:
+                related_kanji = [self._pool.kanji(kanji_id) for kanji_id in related_kanji]
+            item_in_db = self._model.construct(
+                **{
+                    "doc_id": doc_id,
+                    self._text_field: record.text,
+                    "hiragana": record.hiragana,
+                    "translation": record.translation,
+                    "rating": record.rating,
+                    "related_kanji": related_kanji,
+                }
+            )
+            results.append(item_in_db)
+        return results
+
+
+class Dataset:
+    def __init__(self):
+        self.pool = StringPool()
+        self.kanji = KanjiTable(self.pool)
+        self.compound_words = ItemTable(self.pool, "compound_word", models.CompoundWordInDb)
+        self.example_sentences = ItemTable(self.pool, "example_sentence", models.ExampleSentenceInDb)
+        self.tables = {
+            settings.MONGO_KANJI_COLLECTION: self.kanji,
+            settings.MONGO_COMPOUND_WORD_COLLECTION: self.compound_words,
+            settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: self.example_sentences,
+        }
+        # Set once loaded, the services only read from the dataset after that.
+        self.loaded = False
+
+    def clear(self) -> None:
+        for table in self.tables.values():
+            table.clear()
+        self.pool.clear()
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Estimated bytes per collection and of the shared string pool. Records and their containers are
+        counted, the dicts and sets that index them are not.
+        """
+        usage = {collection: table.memory_bytes for collection, table in self.tables.items()}
+        usage["strings"] = self.pool.memory_bytes
+        return usage
+
+    def update_metrics(self) -> None:
+        for collection, memory_bytes in self.memory_usage().items():
+            DATASET_MEMORY.labels(collection).set(memory_bytes)
+        for collection, table in self.tables.items():
+            DATASET_DOCUMENTS.labels(collection).set(len(table))
+
+
+dataset = Dataset()
+
+
+def _listener(collection: str):
+    table = dataset.tables[collection]
+
+    def on_write(doc_id: str, document) -> None:
+        if dataset.loaded:
+            table.upsert(ObjectId(doc_id), document)
+
+    return on_write
+
+
+def _rating_listener(collection: str):
+    table = dataset.tables[collection]
+
+    def on_rating(doc_id: str, rating: int) -> None:
+        if dataset.loaded:
+            table.set_rating(ObjectId(doc_id), rating)
+
+    return on_rating
+
+
+for _collection, _table in dataset.tables.items():
+    change_listeners.on_write(_collection, _listener(_collection))
+    change_listeners.on_drop(_collection, _table.clear)
+    if isinstance(_table, ItemTable):
+        change_listeners.on_rating(_collection, _rating_listener(_collection))
+
+
+async def load_dataset(connection: AsyncIOMotorClient) -> None:
+    """
+    Load all kanji, compound word and example sentence documents into the dataset.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    dataset.loaded = False
+    dataset.clear()
+    for collection, table in dataset.tables.items():
+        async for result in get_repository(connection, collection).find():
+            table.upsert(result["_id"], result)
+
+    dataset.loaded = True
+    dataset.update_metrics()
+    logger.info(
+        f"Loaded dataset of {len(dataset.kanji)} kanji, {len(dataset.compound_words)} compound words and "
+        f"{len(dataset.example_sentences)} example sentences, "
+        f"{sum(dataset.memory_usage().values()) / 1024 / 1024:.1f} MB."
+    )
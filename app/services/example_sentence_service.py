@@ -1,15 +1,24 @@
-import json
-from typing import List
-from bson import ObjectId
+from typing import List, Optional
 from datetime import datetime
 
 
+from bson import ObjectId
 from loguru import logger
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic.utils import Obj
 
 from app.core.config import settings
 from app import models
+from app.db.repository import Where, get_repository
+from app.services import (
+    change_listeners,
+    dataset_service,
+    rating_buffer_service,
+    related_kanji_service,
+    sync_service,
+    total_count_service,
+)
+from app.utils.single_flight import single_flight
 
 
 async def create_example_sentence(
@@ -23,17 +32,21 @@ async def create_example_sentence(
     :return: Returns example_sentence document as it is in the database.
     """
     logger.debug(">>>>")
-    example_sentence_doc = example_sentence.dict()
-    logger.info(
-        f"Creating example_sentence doc: {json.dumps(example_sentence_doc, indent=2, ensure_ascii=False)}"
+    example_sentence.related_kanji = await related_kanji_service.link_related_kanji(
+        connection, example_sentence.example_sentence, example_sentence.related_kanji
     )
+    example_sentence_doc = example_sentence.dict()
+    logger.info(f"Creating example_sentence doc for '{example_sentence.example_sentence}'.")
+    logger.bind(payload=example_sentence_doc).debug("Example_sentence doc to create.")
     example_sentence_doc["updated_at"] = datetime.utcnow()
 
-    result = await connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].insert_one(
-        example_sentence_doc
-    )
+    repository = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+    inserted_id = await repository.insert_one(example_sentence_doc)
     example_sentence_in_db = models.ExampleSentenceInDb(**example_sentence_doc)
-    example_sentence_in_db.doc_id = result.inserted_id
+    example_sentence_in_db.doc_id = inserted_id
+    change_listeners.notify_write(
+        settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, inserted_id, example_sentence_in_db
+    )
 
     return example_sentence_in_db
 
@@ -49,14 +62,14 @@ async def get_example_sentence_doc_by_example_sentence(
     :return: Returns example_sentence document as it is in the database.
     """
     logger.debug(">>>>")
-    logger.info(f"Retrieving example_sentence data for {example_sentence}...")
+    logger.debug(f"Retrieving example_sentence data for {example_sentence}...")
 
-    example_sentence_doc = await connection[settings.MONGO_DB][
-        settings.MONGO_EXAMPLE_SENTENCE_COLLECTION
-    ].find_one({"example_sentence": example_sentence})
+    repository = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+    example_sentence_doc = await repository.find_one_by("example_sentence", example_sentence)
     if example_sentence_doc:
-        example_sentence_in_db = models.ExampleSentenceInDb(**example_sentence_doc)
-        example_sentence_in_db.doc_id = example_sentence_doc.get("_id")
+        example_sentence_in_db = models.ExampleSentenceInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, example_sentence_doc)
+        )
 
         return example_sentence_in_db
 
@@ -72,20 +85,28 @@ async def get_example_sentence_doc_by_id(
     :return: Returns example_sentence document as it is in the database.
     """
     logger.debug(">>>>")
-    logger.info(f"Retrieving example_sentence data for {doc_id}...")
+    logger.debug(f"Retrieving example_sentence data for {doc_id}...")
 
-    example_sentence_doc = await connection[settings.MONGO_DB][
-        settings.MONGO_EXAMPLE_SENTENCE_COLLECTION
-    ].find_one({"_id": ObjectId(doc_id)})
+    repository = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+    example_sentence_doc = await repository.find_one_by_id(doc_id)
     if example_sentence_doc:
-        if "doc_id" in example_sentence_doc:
-            del example_sentence_doc["doc_id"]
-        example_sentence_in_db = models.ExampleSentenceInDb(**example_sentence_doc)
-        example_sentence_in_db.doc_id = example_sentence_doc.get("_id")
+        example_sentence_in_db = models.ExampleSentenceInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, example_sentence_doc)
+        )
 
         return example_sentence_in_db
 
 
+def _where(filters: models.ExampleSentenceFilterParams) -> Where:
+    where = {}
+    if filters.related_kanji:
+        where["related_kanji"] = filters.related_kanji
+    if filters.ratings:
+        where["rating"] = filters.ratings
+    return where
+
+
+@single_flight("example_sentences")
 async def get_example_sentences(
     connection: AsyncIOMotorClient,
     filters: models.ExampleSentenceFilterParams = models.ExampleSentenceFilterParams(),
@@ -99,33 +120,70 @@ async def get_example_sentences(
     :return: Returns all example_sentence documents as a list.
     """
     logger.debug(">>>>")
-    query = {}
-    if filters.related_kanji:
-        query["related_kanji"] = {"$in": filters.related_kanji}
-    if filters.ratings:
-        query["rating"] = {"$in": filters.ratings}
-
-    if query:
-        results = connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].find(
-            query, skip=filters.offset, limit=filters.limit
-        )
-    else:
-        results = connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].find(
-            skip=filters.offset, limit=filters.limit
+    if dataset_service.dataset.loaded:
+        return dataset_service.dataset.example_sentences.find(
+            filters.related_kanji, filters.ratings, filters.offset, filters.limit
         )
 
+    results = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION).find(
+        _where(filters), offset=filters.offset, limit=filters.limit
+    )
+
     example_sentence_results = []
     async for result in results:
-        if "doc_id" in result:
-            del result["doc_id"]
-        example_sentence_in_db = models.ExampleSentenceInDb(**result)
-        example_sentence_in_db.doc_id = result.get("_id")
+        example_sentence_in_db = models.ExampleSentenceInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, result)
+        )
         example_sentence_results.append(example_sentence_in_db)
 
-    logger.info(f"Retrieved {len(example_sentence_results)} example_sentence.")
+    logger.debug(f"Retrieved {len(example_sentence_results)} example_sentence.")
     return example_sentence_results
 
 
+async def count_example_sentences(
+    connection: AsyncIOMotorClient, filters: models.ExampleSentenceFilterParams, mode: models.TotalCountEnum
+) -> int:
+    """
+    Count the example_sentence documents matching the filters, ignoring offset and limit.
+
+    :param connection: Async database client.
+    :param filters: ExampleSentenceFilterParams instance with the filters of the list request.
+    :param mode: Estimated counts may be cached, exact counts are always counted.
+    :return: Returns the number of matching documents.
+    """
+    logger.debug(">>>>")
+    return await total_count_service.get_total_count(
+        connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, _where(filters), mode
+    )
+
+
+async def get_example_sentences_by_ids(
+    connection: AsyncIOMotorClient, doc_ids: List[str]
+) -> List[models.ExampleSentenceInDb]:
+    """
+    Get example_sentence documents by doc_id in a single query.
+
+    :param connection: Async database client.
+    :param doc_ids: The doc_ids of the documents to retrieve.
+    :return: Returns the example_sentence documents in the order of doc_ids. Unknown doc_ids are skipped.
+    """
+    logger.debug(">>>>")
+    if not doc_ids:
+        return []
+
+    repository = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+    results = await repository.find_by_ids(doc_ids)
+
+    example_sentences_by_id = {}
+    for result in results:
+        example_sentence_in_db = models.ExampleSentenceInDb.from_document(
+            rating_buffer_service.overlay(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, result)
+        )
+        example_sentences_by_id[str(result["_id"])] = example_sentence_in_db
+
+    return [example_sentences_by_id[doc_id] for doc_id in doc_ids if doc_id in example_sentences_by_id]
+
+
 async def delete_example_sentence_doc_by_example_sentence(
     connection: AsyncIOMotorClient, example_sentence: str
 ) -> None:
@@ -137,9 +195,12 @@ async def delete_example_sentence_doc_by_example_sentence(
     """
 
     logger.info(f"Deleting example_sentence '{example_sentence}'...")
-    await connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].delete_many(
-        {"example_sentence": example_sentence}
-    )
+    repository = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+    doc_ids = await repository.find_ids_by("example_sentence", example_sentence)
+    await repository.delete_by_ids(doc_ids)
+    await sync_service.record_deletes(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, doc_ids)
+    for doc_id in doc_ids:
+        change_listeners.notify_write(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, doc_id, None)
     logger.info(f"Deleted example_sentence '{example_sentence}'.")
 
 
@@ -152,9 +213,9 @@ async def delete_example_sentence_doc_by_id(connection: AsyncIOMotorClient, doc_
     """
 
     logger.info(f"Deleting example_sentence '{doc_id}'...")
-    await connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].delete_many(
-        {"_id": ObjectId(doc_id)}
-    )
+    await get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION).delete_by_ids([doc_id])
+    await sync_service.record_deletes(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, [doc_id])
+    change_listeners.notify_write(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, doc_id, None)
     logger.info(f"Deleted example_sentence '{doc_id}'.")
 
 
@@ -171,31 +232,70 @@ async def update_example_sentence_doc_by_id(
     :return: Returns example_sentence document as it is in the database.
     """
     logger.debug(">>>>")
-    db_example_sentence = await get_example_sentence_doc_by_id(connection, doc_id)
+    # Read inside the context, so the replaced document has the latest buffered rating, unless the update
+    # changes it.
+    async with rating_buffer_service.replacing(
+        settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, doc_id
+    ) as buffered_rating:
+        db_example_sentence = await get_example_sentence_doc_by_id(connection, doc_id)
+        if buffered_rating is not None:
+            db_example_sentence.rating = buffered_rating
 
-    if exampleSentenceUpdate.example_sentence:
-        db_example_sentence.example_sentence = exampleSentenceUpdate.example_sentence
+        if exampleSentenceUpdate.example_sentence:
+            db_example_sentence.example_sentence = exampleSentenceUpdate.example_sentence
 
-    if exampleSentenceUpdate.hiragana:
-        db_example_sentence.hiragana = exampleSentenceUpdate.hiragana
+        if exampleSentenceUpdate.hiragana:
+            db_example_sentence.hiragana = exampleSentenceUpdate.hiragana
 
-    if exampleSentenceUpdate.translation:
-        db_example_sentence.translation = exampleSentenceUpdate.translation
+        if exampleSentenceUpdate.translation:
+            db_example_sentence.translation = exampleSentenceUpdate.translation
 
-    if exampleSentenceUpdate.related_kanji:
-        db_example_sentence.related_kanji = exampleSentenceUpdate.related_kanji
+        if exampleSentenceUpdate.related_kanji:
+            db_example_sentence.related_kanji = exampleSentenceUpdate.related_kanji
 
-    if exampleSentenceUpdate.rating:
-        db_example_sentence.rating = exampleSentenceUpdate.rating
+        if exampleSentenceUpdate.rating:
+            db_example_sentence.rating = exampleSentenceUpdate.rating
 
-    updated_doc = db_example_sentence.dict()
-    updated_doc["doc_id"] = str(updated_doc["doc_id"])
-    logger.info(
-        f"Updating example_sentence {doc_id} with: {json.dumps(updated_doc, indent=2, ensure_ascii=False)}"
-    )
+        db_example_sentence.related_kanji = await related_kanji_service.link_related_kanji(
+            connection, db_example_sentence.example_sentence, db_example_sentence.related_kanji
+        )
 
-    await connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].replace_one(
-        {"_id": ObjectId(doc_id)}, updated_doc
-    )
+        updated_doc = db_example_sentence.dict()
+        updated_doc["doc_id"] = str(updated_doc["doc_id"])
+        updated_doc["updated_at"] = datetime.utcnow()
+        logger.info(f"Updating example_sentence {doc_id}.")
+        logger.bind(payload=updated_doc).debug("Updated example_sentence doc.")
+
+        await get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION).replace_one(
+            doc_id, updated_doc
+        )
+    change_listeners.notify_write(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, doc_id, db_example_sentence)
 
     return db_example_sentence
+
+
+async def update_example_sentence_rating(
+    connection: AsyncIOMotorClient, doc_id: str, rating: int
+) -> Optional[models.ItemRating]:
+    """
+    Update the rating of a single example_sentence. The rating is written behind, see rating_buffer_service.
+
+    :param connection: Async database client.
+    :param doc_id: The unique doc_id to update a document by.
+    :param rating: The new rating.
+    :return: Returns the doc_id and the new rating, None if there is no document with the doc_id.
+    """
+    logger.debug(">>>>")
+    if not await get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION).exists(doc_id):
+        return None
+
+    await rating_buffer_service.add(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, doc_id, rating)
+
+    return models.ItemRating.construct(doc_id=ObjectId(doc_id), rating=rating)
+
+
+# Calls in flight when a document is written may not see the write.
+change_listeners.on_write(
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, lambda doc_id, document: get_example_sentences.flight.forget()
+)
+change_listeners.on_drop(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, get_example_sentences.flight.forget)
@@ -0,0 +1,161 @@
+"""
+Streaming export of compound words and example sentences as NDJSON, CSV or Anki TSV.
+
+Documents are read from the database cursor in batches of EXPORT_BATCH_SIZE and written out in chunks of
+about CHUNK_SIZE characters, optionally gzip compressed, so the memory of an export doesn't grow with its
+size.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Union
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import rating_buffer_service
+
+CHUNK_SIZE = 64 * 1024
+GZIP_LEVEL = 6
+
+MEDIA_TYPES = {
+    models.ExportFormatEnum.ndjson: "application/x-ndjson",
+    models.ExportFormatEnum.csv: "text/csv",
+    models.ExportFormatEnum.tsv: "text/tab-separated-values",
+}
+# Anki 2.1.54+ reads these headers, older versions skip lines starting with #.
+ANKI_HEADER = "#separator:tab\n#html:false\n#tags column:4\n"
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip: listed, or covered by "*", with a quality above zero.
+    """
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, _, parameters = coding.partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _one_line(value) -> str:
+    return " ".join(str(value or "").split())
+
+
+class _RowWriter:
+    def __init__(self, buffer: io.StringIO, text_field: str, export_format: models.ExportFormatEnum):
+        self._buffer = buffer
+        self._text_field = text_field
+        self._format = export_format
+        self._csv = csv.writer(buffer, lineterminator="\n")
+
+    def header(self) -> None:
+        if self._format == models.ExportFormatEnum.csv:
+            columns = ["doc_id", self._text_field, "hiragana", "translation", "rating", "related_kanji"]
+            self._csv.writerow(columns)
+        elif self._format == models.ExportFormatEnum.tsv:
+            self._buffer.write(ANKI_HEADER)
+
+    def row(self, document: dict) -> None:
+        related_kanji = document.get("related_kanji") or []
+        if self._format == models.ExportFormatEnum.ndjson:
+            item = {
+                "doc_id": str(document["_id"]),
+                self._text_field: document.get(self._text_field),
+                "hiragana": document.get("hiragana"),
+                "translation": document.get("translation"),
+                "rating": document.get("rating") or 0,
+                "related_kanji": related_kanji,
+            }
+            self._buffer.write(json.dumps(item, ensure_ascii=False) + "\n")
+        elif self._format == models.ExportFormatEnum.csv:
+            self._csv.writerow(
+                [
+                    str(document["_id"]),
+                    document.get(self._text_field),
+                    document.get("hiragana"),
+                    document.get("translation"),
+                    document.get("rating") or 0,
+                    " ".join(related_kanji),
+                ]
+            )
+        else:
+            fields = [document.get(self._text_field), document.get("hiragana"), document.get("translation")]
+            tags = " ".join(_one_line(kanji) for kanji in related_kanji)
+            self._buffer.write("\t".join([*(_one_line(field) for field in fields), tags]) + "\n")
+
+
+async def export_items(
+    connection: AsyncIOMotorClient,
+    collection: str,
+    text_field: str,
+    filters: Union[models.CompoundWordFilterParams, models.ExampleSentenceFilterParams],
+    export_format: models.ExportFormatEnum,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Stream the compound word or example sentence documents matching the filters of the list endpoints.
+
+    :param connection: Async database client.
+    :param collection: Name of the collection to export.
+    :param text_field: Name of the compound word or example sentence field.
+    :param filters: Filter params as used by the list endpoints.
+    :param export_format: Output format.
+    :param compress: Compress the output with gzip.
+    :return: Yields the encoded output in chunks.
+    """
+    logger.debug(">>>>")
+    where = {}
+    if filters.related_kanji:
+        where["related_kanji"] = filters.related_kanji
+    if filters.ratings:
+        where["rating"] = filters.ratings
+
+    results = get_repository(connection, collection).find(
+        where,
+        offset=filters.offset,
+        limit=filters.limit,
+        fields=[text_field, "hiragana", "translation", "rating", "related_kanji"],
+        batch_size=settings.EXPORT_BATCH_SIZE,
+    )
+
+    # wbits 31 writes a gzip header and trailer.
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = _RowWriter(buffer, text_field, export_format)
+
+    def take_chunk() -> bytes:
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(chunk) if compressor else chunk
+
+    writer.header()
+    count = 0
+    async for document in results:
+        writer.row(rating_buffer_service.overlay(collection, document))
+        count += 1
+        if buffer.tell() >= CHUNK_SIZE:
+            chunk = take_chunk()
+            if chunk:
+                yield chunk
+
+    chunk = take_chunk()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+    logger.info(f"Exported {count} documents of {collection} as {export_format.value}.")
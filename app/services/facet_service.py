@@ -0,0 +1,278 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners
+
+STROKES_BUCKET_SIZE = 5
+KANJI_FACETS = ("jlpt_level", "kanji_section", "radical", "strokes")
+
+
+def strokes_bucket(strokes: Optional[int]) -> Optional[str]:
+    if not strokes:
+        return None
+
+    low = (strokes - 1) // STROKES_BUCKET_SIZE * STROKES_BUCKET_SIZE + 1
+    return f"{low}-{low + STROKES_BUCKET_SIZE - 1}"
+
+
+def _add(counter: Counter, key, amount: int) -> None:
+    counter[key] += amount
+    if counter[key] <= 0:
+        del counter[key]
+
+
+class KanjiFacetCounters:
+    """
+    Counts of kanji per value of the kanji facets, maintained incrementally from kanji writes.
+    """
+
+    def __init__(self):
+        self._values_by_id: Dict[str, Tuple[str, Tuple[Optional[str], ...]]] = {}
+        self._values_by_kanji: Dict[str, Tuple[Optional[str], ...]] = {}
+        self._counts: Dict[str, Counter] = {facet: Counter() for facet in KANJI_FACETS}
+
+    def upsert(
+        self,
+        doc_id: str,
+        kanji: Optional[str],
+        jlpt_level: Optional[str] = None,
+        kanji_section: Optional[str] = None,
+        radical: Optional[str] = None,
+        strokes: Optional[int] = None,
+    ) -> None:
+        """
+        Add, replace or remove (when kanji is None) the facet values of a kanji.
+        """
+        old = self._values_by_id.pop(doc_id, None)
+        if old:
+            self._count(old[1], -1)
+            self._values_by_kanji.pop(old[0], None)
+
+        if not kanji:
+            return
+
+        # Enum members such as KanjiSectionEnum are counted by their value.
+        kanji_section = getattr(kanji_section, "value", kanji_section)
+        values = (jlpt_level, kanji_section, radical, strokes_bucket(strokes))
+        self._values_by_id[doc_id] = (kanji, values)
+        self._values_by_kanji[kanji] = values
+        self._count(values, 1)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def _count(self, values: Tuple[Optional[str], ...], amount: int) -> None:
+        for facet, value in zip(KANJI_FACETS, values):
+            if value is not None:
+                _add(self._counts[facet], value, amount)
+
+    def facets(self, related_kanji: List[str]) -> models.KanjiFacets:
+        if not related_kanji:
+            return models.KanjiFacets(**{facet: dict(counts) for facet, counts in self._counts.items()})
+
+        counts = {facet: Counter() for facet in KANJI_FACETS}
+        for kanji in set(related_kanji):
+            for facet, value in zip(KANJI_FACETS, self._values_by_kanji.get(kanji, ())):
+                if value is not None:
+                    counts[facet][value] += 1
+        return models.KanjiFacets(**{facet: dict(counts) for facet, counts in counts.items()})
+
+
+class ItemFacetCounters:
+    """
+    Counts of compound words or example sentences per rating, per related kanji and per rating of every
+    related kanji, maintained incrementally from writes.
+    """
+
+    def __init__(self):
+        self._items: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._ratings = Counter()
+        self._per_kanji = Counter()
+        self._per_kanji_rating: Dict[str, Counter] = {}
+
+    def upsert(self, doc_id: str, exists: bool, rating: Optional[int], related_kanji: Iterable[str]) -> None:
+        """
+        Add, replace or remove (when exists is False) the facet values of an item.
+        """
+        old = self._items.pop(doc_id, None)
+        if old:
+            self._count(old, -1)
+
+        if not exists:
+            return
+
+        item = (rating or 0, tuple(dict.fromkeys(related_kanji or ())))
+        self._items[doc_id] = item
+        self._count(item, 1)
+
+    def set_rating(self, doc_id: str, rating: Optional[int]) -> None:
+        item = self._items.get(doc_id)
+        if item:
+            self.upsert(doc_id, True, rating, item[1])
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def _count(self, item: Tuple[int, Tuple[str, ...]], amount: int) -> None:
+        rating, related_kanji = item
+        _add(self._ratings, rating, amount)
+        for kanji in related_kanji:
+            _add(self._per_kanji, kanji, amount)
+            kanji_ratings = self._per_kanji_rating.setdefault(kanji, Counter())
+            _add(kanji_ratings, rating, amount)
+            if not kanji_ratings:
+                del self._per_kanji_rating[kanji]
+
+    def kanji_count(self, kanji: str) -> int:
+        return self._per_kanji[kanji]
+
+    def kanji_ratings(self, kanji: str) -> Dict[int, int]:
+        return dict(sorted(self._per_kanji_rating.get(kanji, {}).items()))
+
+    def per_kanji(self, related_kanji: List[str], ratings: List[int]) -> Dict[str, int]:
+        if not ratings:
+            if not related_kanji:
+                return dict(self._per_kanji)
+            return {kanji: self._per_kanji[kanji] for kanji in set(related_kanji) if kanji in self._per_kanji}
+
+        rating_set = set(ratings)
+        per_rating = self._per_kanji_rating
+        kanji_set = set(related_kanji) if related_kanji else per_rating
+        per_kanji = {
+            kanji: sum(per_rating[kanji].get(rating, 0) for rating in rating_set)
+            for kanji in kanji_set
+            if kanji in per_rating
+        }
+        return {kanji: count for kanji, count in per_kanji.items() if count}
+
+    def ratings(self, related_kanji: List[str], ratings: List[int]) -> Optional[Dict[int, int]]:
+        """
+        Counts per rating, or None if the filter can't be answered from the counters. That is the case
+        when filtering on several related kanji, since an item can be related to more than one of them.
+        """
+        related_kanji = set(related_kanji)
+        if len(related_kanji) > 1:
+            return None
+
+        if related_kanji:
+            counts = dict(self._per_kanji_rating.get(related_kanji.pop(), {}))
+        else:
+            counts = dict(self._ratings)
+
+        if ratings:
+            counts = {rating: count for rating, count in counts.items() if rating in ratings}
+        return counts
+
+
+kanji_counters = KanjiFacetCounters()
+item_counters = {
+    settings.MONGO_COMPOUND_WORD_COLLECTION: ItemFacetCounters(),
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: ItemFacetCounters(),
+}
+
+
+def _on_kanji_write(doc_id: str, kanji: Optional[models.KanjiInDb]) -> None:
+    if kanji:
+        kanji_counters.upsert(
+            doc_id, kanji.kanji, kanji.jlpt_level, kanji.kanji_section, kanji.radical, kanji.strokes
+        )
+    else:
+        kanji_counters.upsert(doc_id, None)
+
+
+def _item_listener(collection: str):
+    counters = item_counters[collection]
+
+    def on_item_write(doc_id: str, item) -> None:
+        if item:
+            counters.upsert(doc_id, True, item.rating, item.related_kanji)
+        else:
+            counters.upsert(doc_id, False, None, ())
+
+    return on_item_write
+
+
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, _on_kanji_write)
+change_listeners.on_drop(settings.MONGO_KANJI_COLLECTION, kanji_counters.clear)
+for _collection, _counters in item_counters.items():
+    change_listeners.on_write(_collection, _item_listener(_collection))
+    change_listeners.on_rating(_collection, _counters.set_rating)
+    change_listeners.on_drop(_collection, _counters.clear)
+
+
+async def load_facet_counters(connection: AsyncIOMotorClient) -> None:
+    """
+    Load the facet counters from all kanji, compound word and example sentence documents.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    kanji_counters.clear()
+    kanji_results = get_repository(connection, settings.MONGO_KANJI_COLLECTION).find(
+        fields=["kanji", *KANJI_FACETS]
+    )
+    async for result in kanji_results:
+        kanji_counters.upsert(
+            str(result["_id"]),
+            result.get("kanji"),
+            result.get("jlpt_level"),
+            result.get("kanji_section"),
+            result.get("radical"),
+            result.get("strokes"),
+        )
+
+    for collection, counters in item_counters.items():
+        counters.clear()
+        results = get_repository(connection, collection).find(fields=["rating", "related_kanji"])
+        async for result in results:
+            counters.upsert(str(result["_id"]), True, result.get("rating"), result.get("related_kanji"))
+
+    logger.info("Loaded facet counters.")
+
+
+async def _aggregate_ratings(
+    connection: AsyncIOMotorClient, collection: str, filters: models.FacetFilterParams
+) -> Dict[int, int]:
+    where = {"related_kanji": filters.related_kanji}
+    if filters.ratings:
+        where["rating"] = filters.ratings
+
+    counts = Counter()
+    for rating, count in (await get_repository(connection, collection).count_by("rating", where)).items():
+        counts[rating or 0] += count
+    return dict(counts)
+
+
+async def get_facets(connection: AsyncIOMotorClient, filters: models.FacetFilterParams) -> models.Facets:
+    """
+    Get the facet counts of kanji, compound words and example sentences.
+
+    Answers from the in-memory counters, except for the rating counts when filtering on more than one
+    related kanji, which are aggregated in the database.
+
+    :param connection: Async database client.
+    :param filters: FacetFilterParams instance with the same filters as the list endpoints.
+    :return: Returns the counts per facet value.
+    """
+    logger.debug(">>>>")
+    item_facets = {}
+    for collection, counters in item_counters.items():
+        ratings = counters.ratings(filters.related_kanji, filters.ratings)
+        if ratings is None:
+            ratings = await _aggregate_ratings(connection, collection, filters)
+
+        item_facets[collection] = models.ItemFacets(
+            rating=ratings, per_kanji=counters.per_kanji(filters.related_kanji, filters.ratings)
+        )
+
+    return models.Facets(
+        kanji=kanji_counters.facets(filters.related_kanji),
+        compound_words=item_facets[settings.MONGO_COMPOUND_WORD_COLLECTION],
+        example_sentences=item_facets[settings.MONGO_EXAMPLE_SENTENCE_COLLECTION],
+    )
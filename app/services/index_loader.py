@@ -0,0 +1,79 @@
+from loguru import logger
+
+from app.core.config import settings
+from app.db.mongodb import db
+from app.db.repository import Storage
+from app.services import (
+    cache_coherence_service,
+    cooccurrence_service,
+    coverage_service,
+    dataset_service,
+    facet_service,
+    quiz_sampling_service,
+    readable_sentence_service,
+    sync_service,
+    text_annotation_service,
+)
+
+# Set once the indexes are loaded, the readiness check reports not ready before that.
+loaded = False
+
+
+def _follows_change_log() -> bool:
+    return settings.CACHE_COHERENCE_INTERVAL_SECONDS is not None and not isinstance(db.client, Storage)
+
+
+async def load_in_memory_indexes():
+    """
+    Load the in-memory indexes from the database. Must run after the mongodb connection is established.
+    Afterwards the indexes are kept up to date by the change listeners of the services, which also get the
+    writes of other workers through the cache coherence service.
+    """
+    logger.debug(">>>>")
+    if not _follows_change_log():
+        await _load()
+        return
+
+    version = await cache_coherence_service.prepare(db.client)
+    await _load()
+    cache_coherence_service.start(db.client, version, _load)
+
+
+async def create_database_indexes():
+    """
+    Create the database indexes of the sync endpoint. Must run after the mongodb connection is established.
+    """
+    logger.debug(">>>>")
+    if isinstance(db.client, Storage):
+        return
+
+    await sync_service.create_indexes(db.client)
+
+
+async def stop_cache_coherence():
+    """
+    Stop following the change log and publish the last writes of this worker. Must run before the mongodb
+    connection is closed.
+    """
+    logger.debug(">>>>")
+    if _follows_change_log():
+        await cache_coherence_service.stop(db.client)
+
+
+async def _load():
+    global loaded
+    if settings.IN_MEMORY_DATASET:
+        await dataset_service.load_dataset(db.client)
+
+    if not settings.LOAD_IN_MEMORY_INDEXES:
+        logger.info("Loading of the in-memory indexes is disabled.")
+        loaded = True
+        return
+
+    await text_annotation_service.load_text_annotation_index(db.client)
+    await readable_sentence_service.load_readable_sentence_index(db.client)
+    await facet_service.load_facet_counters(db.client)
+    await cooccurrence_service.load_cooccurrence_graph(db.client)
+    await coverage_service.load_coverage_index(db.client)
+    await quiz_sampling_service.load_quiz_samplers(db.client)
+    loaded = True
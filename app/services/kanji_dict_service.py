@@ -1,10 +1,10 @@
 import shutil
+import time
 from fastapi.datastructures import UploadFile
 from app.models import example_sentence, kanji
 import json
 from typing import List
 from datetime import datetime
-from bson import ObjectId
 from pathlib import Path
 
 
@@ -13,7 +13,28 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
 from app import models
-from app.services import kanji_service, compound_word_service, example_sentence_service
+from app.db.repository import get_repository
+from app.services import (
+    change_listeners,
+    kanji_service,
+    compound_word_service,
+    example_sentence_service,
+    sync_service,
+)
+from app.utils.metrics import Counter, Histogram
+from app.utils.single_flight import single_flight
+
+IMPORTS = Counter("kanji_dict_imports_total", "Number of kanji dictionary list imports.")
+IMPORT_DURATION = Histogram(
+    "kanji_dict_import_duration_seconds",
+    "Duration of kanji dictionary list imports in seconds.",
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+IMPORTED_DOCUMENTS = Counter(
+    "kanji_dict_imported_documents_total",
+    "Number of documents created or updated by kanji dictionary imports.",
+    ("collection", "operation"),
+)
 
 
 async def import_kanji_dict(connection: AsyncIOMotorClient, kanjiDict: models.KanjiDict) -> models.KanjiDict:
@@ -34,10 +55,12 @@ async def import_kanji_dict(connection: AsyncIOMotorClient, kanjiDict: models.Ka
         logger.info(f"Kanji {kanji} already exists, updating.")
         kanji_update = models.KanjiUpdate(**kanji_dict_doc)
         await kanji_service.update_kanji_doc_by_id(connection, str(existing_kanji.doc_id), kanji_update)
+        IMPORTED_DOCUMENTS.labels(settings.MONGO_KANJI_COLLECTION, "updated").inc()
     else:
         logger.info(f"Kanji {kanji} does not exist, creating.")
         kanji_create = models.KanjiCreate(**kanji_dict_doc)
         await kanji_service.create_kanji(connection, kanji_create)
+        IMPORTED_DOCUMENTS.labels(settings.MONGO_KANJI_COLLECTION, "created").inc()
 
     compound_words_data = kanji_dict_doc.get("compound_words")
     if compound_words_data:
@@ -56,16 +79,18 @@ async def import_kanji_dict(connection: AsyncIOMotorClient, kanjiDict: models.Ka
                     await compound_word_service.update_compound_word_doc_by_id(
                         connection, existing_compound_word.doc_id, compound_word_update
                     )
+                    IMPORTED_DOCUMENTS.labels(settings.MONGO_COMPOUND_WORD_COLLECTION, "updated").inc()
 
             else:
                 compound_word_create = models.CompoundWordCreate(**compound_word_item)
                 compound_word_create.related_kanji = [kanji]
                 await compound_word_service.create_compound_word(connection, compound_word_create)
+                IMPORTED_DOCUMENTS.labels(settings.MONGO_COMPOUND_WORD_COLLECTION, "created").inc()
 
     example_sentences_data = kanji_dict_doc.get("example_sentences")
     if example_sentences_data:
         for example_sentence_item in example_sentences_data:
-            example_sentence = example_sentence_item.get("compound_word")
+            example_sentence = example_sentence_item.get("example_sentence")
 
             existing_example_sentence = (
                 await example_sentence_service.get_example_sentence_doc_by_example_sentence(
@@ -84,11 +109,13 @@ async def import_kanji_dict(connection: AsyncIOMotorClient, kanjiDict: models.Ka
                     await example_sentence_service.update_example_sentence_doc_by_id(
                         connection, existing_example_sentence.doc_id, example_sentence_update
                     )
+                    IMPORTED_DOCUMENTS.labels(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, "updated").inc()
 
             else:
                 example_sentence_create = models.ExampleSentenceCreate(**example_sentence_item)
                 example_sentence_create.related_kanji = [kanji]
                 await example_sentence_service.create_example_sentence(connection, example_sentence_create)
+                IMPORTED_DOCUMENTS.labels(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, "created").inc()
 
 
 async def import_kanji_dict_list(
@@ -102,11 +129,18 @@ async def import_kanji_dict_list(
     :param kanjiDictList: A list of KanjiDict instances to import.
     :param replace_all: Flag that determines if all documents in all collections should be deleted first.
     """
+    IMPORTS.inc()
+    start = time.perf_counter()
 
     if replace_all:
-        await connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].drop()
-        await connection[settings.MONGO_DB][settings.MONGO_COMPOUND_WORD_COLLECTION].drop()
-        await connection[settings.MONGO_DB][settings.MONGO_EXAMPLE_SENTENCE_COLLECTION].drop()
+        for collection in (
+            settings.MONGO_KANJI_COLLECTION,
+            settings.MONGO_COMPOUND_WORD_COLLECTION,
+            settings.MONGO_EXAMPLE_SENTENCE_COLLECTION,
+        ):
+            await get_repository(connection, collection).drop()
+            await sync_service.record_drop(connection, collection)
+            change_listeners.notify_drop(collection)
 
     imported_kanji_dicts = []
     for kanjiDict in kanjiDictList:
@@ -114,6 +148,8 @@ async def import_kanji_dict_list(
         if result:
             imported_kanji_dicts.append(result)
 
+    IMPORT_DURATION.observe(time.perf_counter() - start)
+
 
 def populate_lookup(lookup, data_items, items_key):
     for data_item in data_items:
@@ -127,6 +163,7 @@ def populate_lookup(lookup, data_items, items_key):
             lookup_item[items_key].append(data_item)
 
 
+@single_flight("kanji_dicts")
 async def get_kanji_dicts(connection: AsyncIOMotorClient) -> List[models.KanjiDict]:
     """
     Retrieve list of KanjiDict matching query. Combines kanji, related compound words, and related example sentences into one dicitonary object.
@@ -135,7 +172,7 @@ async def get_kanji_dicts(connection: AsyncIOMotorClient) -> List[models.KanjiDi
     :param connection: Async database client.
     """
 
-    kanjis = await kanji_service.get_all_kanji(connection)
+    kanjis = await kanji_service.get_kanji(connection, offset=0, limit=0)
     compound_words = await compound_word_service.get_compound_words(connection)
     example_sentences = await example_sentence_service.get_example_sentences(connection)
 
@@ -146,13 +183,11 @@ async def get_kanji_dicts(connection: AsyncIOMotorClient) -> List[models.KanjiDi
     kanji_dicts = []
     for kanji_item in kanjis:
         looked_up_item = lookup.get(kanji_item.kanji)
-
-        kanji_dict = models.KanjiDict(**kanji_item.dict())
-        kanji_dict.doc_id = ObjectId(kanji_dict.doc_id)
-
         if not looked_up_item:
             continue
 
+        # The kanji were read from the database, copying their fields needs no validation.
+        kanji_dict = models.KanjiDict.construct(**dict(kanji_item))
         kanji_dict.compound_words = looked_up_item["compound_words"]
         kanji_dict.example_sentences = looked_up_item["example_sentences"]
 
@@ -161,6 +196,16 @@ async def get_kanji_dicts(connection: AsyncIOMotorClient) -> List[models.KanjiDi
     return kanji_dicts
 
 
+for _collection in (
+    settings.MONGO_KANJI_COLLECTION,
+    settings.MONGO_COMPOUND_WORD_COLLECTION,
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION,
+):
+    # Calls in flight when a document is written may not see the write.
+    change_listeners.on_write(_collection, lambda doc_id, document: get_kanji_dicts.flight.forget())
+    change_listeners.on_drop(_collection, get_kanji_dicts.flight.forget)
+
+
 async def process_file_upload(connection, upload_file: UploadFile) -> None:
     logger.debug(">>>>")
     try:
@@ -1,7 +1,5 @@
-import json
 from typing import List
 from datetime import datetime
-from bson import ObjectId
 
 
 from loguru import logger
@@ -9,6 +7,9 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
 from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners, dataset_service, sync_service
+from app.utils.single_flight import single_flight
 
 
 async def create_kanji(connection: AsyncIOMotorClient, kanji: models.KanjiCreate) -> models.KanjiInDb:
@@ -21,14 +22,16 @@ async def create_kanji(connection: AsyncIOMotorClient, kanji: models.KanjiCreate
     """
     logger.debug(">>>>")
     kanji_doc = kanji.dict()
-    logger.info(f"Creating kanji doc: {json.dumps(kanji_doc, indent=2, ensure_ascii=False)}")
+    logger.info(f"Creating kanji doc for '{kanji.kanji}'.")
+    logger.bind(payload=kanji_doc).debug("Kanji doc to create.")
     kanji_doc["updated_at"] = datetime.utcnow()
 
-    result = await connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].insert_one(kanji_doc)
-    logger.debug(f"Inserted Id: {result.inserted_id}")
+    inserted_id = await get_repository(connection, settings.MONGO_KANJI_COLLECTION).insert_one(kanji_doc)
+    logger.debug(f"Inserted Id: {inserted_id}")
 
     kanji_in_db = models.KanjiInDb(**kanji_doc)
-    kanji_in_db.doc_id = result.inserted_id
+    kanji_in_db.doc_id = inserted_id
+    change_listeners.notify_write(settings.MONGO_KANJI_COLLECTION, inserted_id, kanji_in_db)
 
     return kanji_in_db
 
@@ -42,16 +45,11 @@ async def get_kanji_doc_by_id(connection: AsyncIOMotorClient, doc_id: str) -> mo
     :return: Returns kanji document as it is in the database.
     """
     logger.debug(">>>>")
-    logger.info(f"Retrieving kanji data for {doc_id}...")
+    logger.debug(f"Retrieving kanji data for {doc_id}...")
 
-    kanji_doc = await connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].find_one(
-        {"_id": ObjectId(doc_id)}
-    )
+    kanji_doc = await get_repository(connection, settings.MONGO_KANJI_COLLECTION).find_one_by_id(doc_id)
     if kanji_doc:
-        if "doc_id" in kanji_doc:
-            del kanji_doc["doc_id"]
-        kanji_in_db = models.KanjiInDb(**kanji_doc)
-        kanji_in_db.doc_id = kanji_doc.get("_id")
+        kanji_in_db = models.KanjiInDb.from_document(kanji_doc)
         return kanji_in_db
 
 
@@ -64,19 +62,15 @@ async def get_kanji_doc_by_kanji(connection: AsyncIOMotorClient, kanji: str) ->
     :return: Returns kanji document as it is in the database.
     """
     logger.debug(">>>>")
-    logger.info(f"Retrieving kanji data for {kanji}...")
+    logger.debug(f"Retrieving kanji data for {kanji}...")
 
-    kanji_doc = await connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].find_one(
-        {"kanji": kanji}
-    )
+    kanji_doc = await get_repository(connection, settings.MONGO_KANJI_COLLECTION).find_one_by("kanji", kanji)
     if kanji_doc:
-        if "doc_id" in kanji_doc:
-            del kanji_doc["doc_id"]
-        kanji_in_db = models.KanjiInDb(**kanji_doc)
-        kanji_in_db.doc_id = kanji_doc.get("_id")
+        kanji_in_db = models.KanjiInDb.from_document(kanji_doc)
         return kanji_in_db
 
 
+@single_flight("kanji")
 async def get_kanji(connection: AsyncIOMotorClient, offset, limit) -> List[models.KanjiInDb]:
     """
     Get all kanji documents in the database.
@@ -89,26 +83,44 @@ async def get_kanji(connection: AsyncIOMotorClient, offset, limit) -> List[model
         limit = 0
     if offset is None:
         offset = 0
+    if dataset_service.dataset.loaded:
+        kanji_results = dataset_service.dataset.kanji.find(offset, limit)
+        logger.debug(f"Retrieved {len(kanji_results)} kanji from the dataset.")
+        return kanji_results
 
-    if offset or limit:
-        results = connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].find(
-            limit=limit, skip=offset
-        )
-    else:
-        results = connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].find()
+    results = get_repository(connection, settings.MONGO_KANJI_COLLECTION).find(offset=offset, limit=limit)
 
     kanji_results = []
     async for result in results:
-        if "doc_id" in result:
-            del result["doc_id"]
-        kanji_in_db = models.KanjiInDb(**result)
-        kanji_in_db.doc_id = result.get("_id")
+        kanji_in_db = models.KanjiInDb.from_document(result)
         kanji_results.append(kanji_in_db)
 
-    logger.info(f"Retrieved {len(kanji_results)} kanji.")
+    logger.debug(f"Retrieved {len(kanji_results)} kanji.")
     return kanji_results
 
 
+async def get_kanji_by_ids(connection: AsyncIOMotorClient, doc_ids: List[str]) -> List[models.KanjiInDb]:
+    """
+    Get kanji documents by doc_id in a single query.
+
+    :param connection: Async database client.
+    :param doc_ids: The doc_ids of the documents to retrieve.
+    :return: Returns the kanji documents in the order of doc_ids. Unknown doc_ids are skipped.
+    """
+    logger.debug(">>>>")
+    if not doc_ids:
+        return []
+
+    results = await get_repository(connection, settings.MONGO_KANJI_COLLECTION).find_by_ids(doc_ids)
+
+    kanji_by_id = {}
+    for result in results:
+        kanji_in_db = models.KanjiInDb.from_document(result)
+        kanji_by_id[str(result["_id"])] = kanji_in_db
+
+    return [kanji_by_id[doc_id] for doc_id in doc_ids if doc_id in kanji_by_id]
+
+
 async def delete_kanji_doc_by_id(connection: AsyncIOMotorClient, doc_id: str) -> None:
     """
     Delete kanji documents by doc_id. The matching document will be deleted.
@@ -118,7 +130,9 @@ async def delete_kanji_doc_by_id(connection: AsyncIOMotorClient, doc_id: str) ->
     """
 
     logger.info(f"Deleting kanji '{doc_id}'...")
-    await connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].delete_one({"_id": ObjectId(doc_id)})
+    await get_repository(connection, settings.MONGO_KANJI_COLLECTION).delete_by_ids([doc_id])
+    await sync_service.record_deletes(connection, settings.MONGO_KANJI_COLLECTION, [doc_id])
+    change_listeners.notify_write(settings.MONGO_KANJI_COLLECTION, doc_id, None)
     logger.info(f"Deleted kanji '{doc_id}'.")
 
 
@@ -166,10 +180,16 @@ async def update_kanji_doc_by_id(
 
     updated_doc = db_kanji.dict()
     updated_doc["doc_id"] = str(updated_doc["doc_id"])
-    logger.info(f"Updating kanji {doc_id} with: {json.dumps(updated_doc, indent=2, ensure_ascii=False)}")
+    updated_doc["updated_at"] = datetime.utcnow()
+    logger.info(f"Updating kanji {doc_id}.")
+    logger.bind(payload=updated_doc).debug("Updated kanji doc.")
 
-    await connection[settings.MONGO_DB][settings.MONGO_KANJI_COLLECTION].replace_one(
-        {"_id": ObjectId(doc_id)}, updated_doc
-    )
+    await get_repository(connection, settings.MONGO_KANJI_COLLECTION).replace_one(doc_id, updated_doc)
+    change_listeners.notify_write(settings.MONGO_KANJI_COLLECTION, doc_id, db_kanji)
 
     return db_kanji
+
+
+# Calls in flight when a document is written may not see the write.
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, lambda doc_id, document: get_kanji.flight.forget())
+change_listeners.on_drop(settings.MONGO_KANJI_COLLECTION, get_kanji.flight.forget)
@@ -0,0 +1,264 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from random import Random
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners, compound_word_service, example_sentence_service
+from app.utils.weighted_sampling import WeightTable
+
+# Kanji are ranked by newspaper frequency out of 2500.
+MAX_FREQUENCY_RANK = 2500
+MAX_WEIGHT_TABLES = 128
+
+_kanji_by_id: Dict[str, Tuple[str, Optional[int]]] = {}
+_kanji_weights: Dict[str, float] = {}
+_rng = Random()
+
+
+def frequency_weight(frequency_rank: Optional[int]) -> float:
+    """
+    Weight of a kanji by frequency, from 2.0 for the most frequent kanji down to 1.0 for unranked kanji.
+    """
+    if not frequency_rank:
+        return 1.0
+
+    return 2.0 - min(frequency_rank, MAX_FREQUENCY_RANK) / MAX_FREQUENCY_RANK
+
+
+def _matches(key: Tuple[FrozenSet[str], FrozenSet[int]], item: Tuple[int, Tuple[str, ...]]) -> bool:
+    related_kanji, ratings = key
+    rating, item_kanji = item
+    if related_kanji and related_kanji.isdisjoint(item_kanji):
+        return False
+    return not ratings or rating in ratings
+
+
+class QuizSampler:
+    """
+    Catalogue of the ratings and related kanji of compound words or example sentences, with cached weight
+    tables per filter. Items are weighted by (1 + rating) times the frequency weight of their most frequent
+    related kanji. When the weight of an item changes, the cached tables that contain it are patched in place.
+    Tables whose filter an item enters or leaves are dropped and rebuilt on the next draw for their filter.
+    """
+
+    def __init__(self):
+        self._items: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._ids_by_kanji: Dict[str, Set[str]] = {}
+        self._tables: "OrderedDict[Tuple[FrozenSet[str], FrozenSet[int]], WeightTable[str]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def upsert(self, doc_id: str, exists: bool, rating: Optional[int], related_kanji: Iterable[str]) -> None:
+        """
+        Add, replace or remove (when exists is False) an item.
+        """
+        item = (rating or 0, tuple(dict.fromkeys(related_kanji or ()))) if exists else None
+        old = self._items.get(doc_id)
+        if item == old:
+            return
+
+        if old:
+            del self._items[doc_id]
+            for kanji in old[1]:
+                doc_ids = self._ids_by_kanji.get(kanji)
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del self._ids_by_kanji[kanji]
+
+        if item:
+            self._items[doc_id] = item
+            for kanji in item[1]:
+                self._ids_by_kanji.setdefault(kanji, set()).add(doc_id)
+
+        self._update_tables(doc_id, old, item)
+
+    def set_rating(self, doc_id: str, rating: Optional[int]) -> None:
+        item = self._items.get(doc_id)
+        if item:
+            self.upsert(doc_id, True, rating, item[1])
+
+    def reweight(self, related_kanji: Iterable[str]) -> None:
+        """
+        Patch the weights of the items related to kanji of which the frequency weight changed.
+        """
+        doc_ids = set()
+        for kanji in related_kanji:
+            doc_ids.update(self._ids_by_kanji.get(kanji, ()))
+        for doc_id in doc_ids:
+            self._update_tables(doc_id, self._items[doc_id], self._items[doc_id])
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def invalidate(self) -> None:
+        self._tables.clear()
+
+    def _update_tables(
+        self,
+        doc_id: str,
+        old: Optional[Tuple[int, Tuple[str, ...]]],
+        item: Optional[Tuple[int, Tuple[str, ...]]],
+    ) -> None:
+        for key in list(self._tables):
+            was_in = old is not None and _matches(key, old)
+            is_in = item is not None and _matches(key, item)
+            if was_in and is_in:
+                table = self._tables[key]
+                # Tables are built from sorted doc_ids.
+                table.set_weight(bisect_left(table.keys, doc_id), self._weight(item))
+            elif was_in or is_in:
+                del self._tables[key]
+
+    def _weight(self, item: Tuple[int, Tuple[str, ...]]) -> float:
+        rating, related_kanji = item
+        kanji_weight = max((_kanji_weights.get(kanji, 1.0) for kanji in related_kanji), default=1.0)
+        return (1 + max(rating, 0)) * kanji_weight
+
+    def table(self, related_kanji: List[str], ratings: List[int]) -> WeightTable:
+        key = (frozenset(related_kanji), frozenset(ratings))
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            return table
+
+        if related_kanji:
+            doc_ids = set()
+            for kanji in key[0]:
+                doc_ids.update(self._ids_by_kanji.get(kanji, ()))
+        else:
+            doc_ids = self._items.keys()
+        if ratings:
+            doc_ids = [doc_id for doc_id in doc_ids if self._items[doc_id][0] in key[1]]
+
+        # Sorted, so a seeded draw is reproducible.
+        doc_ids = sorted(doc_ids)
+        table = WeightTable(doc_ids, [self._weight(self._items[doc_id]) for doc_id in doc_ids])
+        self._tables[key] = table
+        if len(self._tables) > MAX_WEIGHT_TABLES:
+            self._tables.popitem(last=False)
+
+        return table
+
+
+samplers = {
+    settings.MONGO_COMPOUND_WORD_COLLECTION: QuizSampler(),
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: QuizSampler(),
+}
+
+
+def _upsert_kanji(doc_id: str, kanji: Optional[str], frequency_rank: Optional[int]) -> None:
+    old = _kanji_by_id.pop(doc_id, None)
+    if old:
+        _kanji_weights.pop(old[0], None)
+    if kanji:
+        _kanji_by_id[doc_id] = (kanji, frequency_rank)
+        _kanji_weights[kanji] = frequency_weight(frequency_rank)
+
+    new = _kanji_by_id.get(doc_id)
+    if old != new:
+        changed = {entry[0] for entry in (old, new) if entry}
+        for sampler in samplers.values():
+            sampler.reweight(changed)
+
+
+def _clear_kanji() -> None:
+    _kanji_by_id.clear()
+    _kanji_weights.clear()
+    for sampler in samplers.values():
+        sampler.invalidate()
+
+
+def _on_kanji_write(doc_id: str, kanji: Optional[models.KanjiInDb]) -> None:
+    if kanji:
+        _upsert_kanji(doc_id, kanji.kanji, kanji.frequency_rank)
+    else:
+        _upsert_kanji(doc_id, None, None)
+
+
+def _item_listener(sampler: QuizSampler):
+    def on_item_write(doc_id: str, item) -> None:
+        if item:
+            sampler.upsert(doc_id, True, item.rating, item.related_kanji)
+        else:
+            sampler.upsert(doc_id, False, None, ())
+
+    return on_item_write
+
+
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, _on_kanji_write)
+change_listeners.on_drop(settings.MONGO_KANJI_COLLECTION, _clear_kanji)
+for _collection, _sampler in samplers.items():
+    change_listeners.on_write(_collection, _item_listener(_sampler))
+    change_listeners.on_rating(_collection, _sampler.set_rating)
+    change_listeners.on_drop(_collection, _sampler.clear)
+
+
+async def load_quiz_samplers(connection: AsyncIOMotorClient) -> None:
+    """
+    Load the kanji frequency ranks and the catalogue of compound words and example sentences.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    _clear_kanji()
+    kanji_results = get_repository(connection, settings.MONGO_KANJI_COLLECTION).find(
+        fields=["kanji", "frequency_rank"]
+    )
+    async for result in kanji_results:
+        _upsert_kanji(str(result["_id"]), result.get("kanji"), result.get("frequency_rank"))
+
+    for collection, sampler in samplers.items():
+        sampler.clear()
+        results = get_repository(connection, collection).find(fields=["rating", "related_kanji"])
+        async for result in results:
+            sampler.upsert(str(result["_id"]), True, result.get("rating"), result.get("related_kanji"))
+
+    logger.info("Loaded quiz samplers.")
+
+
+def _sample_doc_ids(collection: str, filters: models.SampleFilterParams) -> List[str]:
+    table = samplers[collection].table(filters.related_kanji, filters.ratings)
+    rng = Random(filters.seed) if filters.seed is not None else _rng
+
+    return table.sample(filters.size, rng)
+
+
+async def sample_compound_words(
+    connection: AsyncIOMotorClient, filters: models.SampleFilterParams
+) -> List[models.CompoundWordInDb]:
+    """
+    Draw compound words without replacement, weighted by rating and related kanji frequency.
+
+    :param connection: Async database client.
+    :param filters: SampleFilterParams instance with the filter and the sample size.
+    :return: Returns the drawn compound_word documents in draw order.
+    """
+    logger.debug(">>>>")
+    doc_ids = _sample_doc_ids(settings.MONGO_COMPOUND_WORD_COLLECTION, filters)
+    logger.info(f"Sampled {len(doc_ids)} compound words.")
+
+    return await compound_word_service.get_compound_words_by_ids(connection, doc_ids)
+
+
+async def sample_example_sentences(
+    connection: AsyncIOMotorClient, filters: models.SampleFilterParams
+) -> List[models.ExampleSentenceInDb]:
+    """
+    Draw example sentences without replacement, weighted by rating and related kanji frequency.
+
+    :param connection: Async database client.
+    :param filters: SampleFilterParams instance with the filter and the sample size.
+    :return: Returns the drawn example_sentence documents in draw order.
+    """
+    logger.debug(">>>>")
+    doc_ids = _sample_doc_ids(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, filters)
+    logger.info(f"Sampled {len(doc_ids)} example sentences.")
+
+    return await example_sentence_service.get_example_sentences_by_ids(connection, doc_ids)
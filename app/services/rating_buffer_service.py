@@ -0,0 +1,232 @@
+"""
+Write-behind buffer for the rating updates of compound words and example sentences.
+
+Reviewers change ratings often. Instead of replacing the whole document on every change, a rating update is
+kept in the buffer of the worker, where a later update of the same document replaces the earlier one. The
+buffer is written with one bulk write every RATING_FLUSH_INTERVAL_SECONDS, or as soon as it holds
+RATING_FLUSH_SIZE documents, and when the mongo connection is closed.
+
+Reads of the worker see the buffered ratings, but filters on rating match the rating in the database until
+the buffer is written. Buffering a rating notifies the rating listeners of the in-memory indexes, writing it
+notifies the rating written listeners, through which the cache coherence task publishes the rating to other
+workers. Writing stamps updated_at, so delta sync picks the ratings up. Updates still in the buffer are lost
+when a worker dies without shutting down.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db.repository import ReadOnlyStorageError, get_repository
+from app.services import change_listeners
+from app.utils.metrics import Counter, Gauge
+
+COLLECTIONS = (settings.MONGO_COMPOUND_WORD_COLLECTION, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+
+UPDATES = Counter(
+    "rating_buffer_updates_total",
+    "Rating updates, merged when a buffered update of the same document was replaced.",
+    ("collection", "result"),
+)
+FLUSHES = Counter("rating_buffer_flushes_total", "Bulk writes of the rating buffer.", ("result",))
+PENDING = Gauge("rating_buffer_pending_documents", "Documents with a buffered rating.")
+
+# Rating per doc_id per collection, waiting to be written and being written.
+_pending: Dict[str, Dict[str, int]] = {}
+_flushing: Dict[str, Dict[str, int]] = {}
+_lock: Optional[asyncio.Lock] = None
+_task: Optional[asyncio.Task] = None
+_size_flush: Optional[asyncio.Future] = None
+
+
+def _pending_count() -> int:
+    return sum(len(ratings) for ratings in _pending.values())
+
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+
+def overlay(collection: str, document: dict) -> dict:
+    """
+    Set the buffered rating on a document read from the database.
+
+    :param collection: Name of the collection of the document.
+    :param document: The document with its id in "_id", changed in place.
+    :return: Returns the document.
+    """
+    if _pending or _flushing:
+        doc_id = str(document["_id"])
+        for ratings in (_pending.get(collection), _flushing.get(collection)):
+            if ratings and doc_id in ratings:
+                document["rating"] = ratings[doc_id]
+                break
+    return document
+
+
+async def add(connection: AsyncIOMotorClient, collection: str, doc_id: str, rating: int) -> None:
+    """
+    Buffer the rating of a document, or write it right away when RATING_FLUSH_INTERVAL_SECONDS is None.
+
+    :param connection: Async database client.
+    :param collection: Name of the collection of the document.
+    :param doc_id: The doc_id of the document.
+    :param rating: The new rating.
+    """
+    global _size_flush
+    repository = get_repository(connection, collection)
+    if repository.read_only:
+        raise ReadOnlyStorageError(f"Can't write to {collection}, the storage is read-only.")
+
+    if settings.RATING_FLUSH_INTERVAL_SECONDS is None:
+        await repository.update_fields({doc_id: {"rating": rating, "updated_at": datetime.utcnow()}})
+        UPDATES.labels(collection, "written").inc()
+        change_listeners.notify_rating(collection, doc_id, rating)
+        change_listeners.notify_rating_written(collection, [doc_id])
+        return
+
+    ratings = _pending.setdefault(collection, {})
+    UPDATES.labels(collection, "merged" if doc_id in ratings else "buffered").inc()
+    ratings[doc_id] = rating
+    PENDING.set(_pending_count())
+    change_listeners.notify_rating(collection, doc_id, rating)
+
+    _start(connection)
+    if _pending_count() >= settings.RATING_FLUSH_SIZE and (_size_flush is None or _size_flush.done()):
+        _size_flush = asyncio.ensure_future(flush(connection))
+        _size_flush.add_done_callback(_log_flush_failure)
+
+
+def _log_flush_failure(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.opt(exception=future.exception()).error("Writing the buffered ratings failed.")
+
+
+def discard(collection: str, doc_id: str) -> None:
+    """
+    Drop the buffered rating of a document that is deleted, whether it waits or is being written.
+
+    :param collection: Name of the collection of the document.
+    :param doc_id: The doc_id of the document.
+    """
+    ratings = _pending.get(collection)
+    if ratings and ratings.pop(str(doc_id), None) is not None:
+        PENDING.set(_pending_count())
+    ratings = _flushing.get(collection)
+    if ratings:
+        ratings.pop(str(doc_id), None)
+
+
+@asynccontextmanager
+async def replacing(collection: str, doc_id: str) -> AsyncIterator[Optional[int]]:
+    """
+    Context for reading and replacing a document. Its buffered rating is dropped, the replacement has the
+    rating, and the buffer isn't written until the document is replaced, so a stale rating can't overwrite it.
+
+    :param collection: Name of the collection of the document.
+    :param doc_id: The doc_id of the document.
+    :return: Yields the buffered rating of the document, None if there is none.
+    """
+    async with _get_lock():
+        rating = _pending.get(collection, {}).get(str(doc_id))
+        discard(collection, doc_id)
+        yield rating
+
+
+async def flush(connection: AsyncIOMotorClient) -> None:
+    """
+    Write the buffered ratings with one bulk write per collection. Ratings that fail to be written stay in
+    the buffer, unless the document got a newer rating in the meantime.
+
+    :param connection: Async database client.
+    """
+    global _pending, _flushing
+    async with _get_lock():
+        if not _pending:
+            return
+
+        _flushing, _pending = _pending, {}
+        PENDING.set(0)
+        updated_at = datetime.utcnow()
+        try:
+            for collection in list(_flushing):
+                updates = {
+                    doc_id: {"rating": rating, "updated_at": updated_at}
+                    for doc_id, rating in _flushing[collection].items()
+                }
+                await get_repository(connection, collection).update_fields(updates)
+                logger.debug(f"Wrote {len(updates)} buffered ratings of {collection}.")
+                del _flushing[collection]
+                change_listeners.notify_rating_written(collection, list(updates))
+            FLUSHES.labels("ok").inc()
+        except Exception:
+            FLUSHES.labels("failed").inc()
+            for collection, ratings in _flushing.items():
+                pending = _pending.setdefault(collection, {})
+                for doc_id, rating in ratings.items():
+                    pending.setdefault(doc_id, rating)
+            PENDING.set(_pending_count())
+            raise
+        finally:
+            _flushing = {}
+
+
+async def _run(connection: AsyncIOMotorClient) -> None:
+    while True:
+        await asyncio.sleep(settings.RATING_FLUSH_INTERVAL_SECONDS)
+        try:
+            await flush(connection)
+        except Exception:
+            logger.exception("Writing the buffered ratings failed.")
+
+
+def _start(connection: AsyncIOMotorClient) -> None:
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_event_loop().create_task(_run(connection))
+
+
+async def stop(connection: AsyncIOMotorClient) -> None:
+    """
+    Stop the background task and write the remaining buffered ratings.
+
+    :param connection: Async database client.
+    """
+    global _task, _lock
+    logger.debug(">>>>")
+    if _task is not None:
+        _task.cancel()
+        _task = None
+    count = _pending_count()
+    await flush(connection)
+    _lock = None
+    if count:
+        logger.info(f"Wrote {count} buffered ratings.")
+
+
+def _write_listener(collection: str):
+    def on_write(doc_id: str, document) -> None:
+        if document is None:
+            discard(collection, doc_id)
+
+    return on_write
+
+
+def _drop_listener(collection: str):
+    def on_drop() -> None:
+        _pending.pop(collection, None)
+        PENDING.set(_pending_count())
+
+    return on_drop
+
+
+for _collection in COLLECTIONS:
+    change_listeners.on_write(_collection, _write_listener(_collection))
+    change_listeners.on_drop(_collection, _drop_listener(_collection))
@@ -0,0 +1,317 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners, example_sentence_service
+from app.utils.kanji_text import extract_kanji
+
+# Jouyou numbers start at 1, bit 0 marks sentences that contain kanji outside of the jouyou list.
+NON_JOUYOU_BIT = 0
+
+
+class ReadableSentenceIndex:
+    """
+    Coverage index answering which example sentences only use kanji from a known set.
+
+    Every sentence gets a slot. Its kanji set is stored as a bitset over jouyou numbers, and for every
+    jouyou number a posting bitset over slots is kept. A query ORs the postings of the kanji that are
+    not known, so the subset check for all sentences runs as a few thousand big integer operations.
+    """
+
+    def __init__(self):
+        self._kanji_by_id: Dict[str, Tuple[str, Optional[int]]] = {}
+        self._jouyou_numbers: Dict[str, int] = {}
+        self._slots: Dict[str, int] = {}
+        self._slot_ids: List[Optional[str]] = []
+        self._slot_kanji: List[List[str]] = []
+        self._slot_masks: List[int] = []
+        self._slot_ratings: List[int] = []
+        self._free_slots: List[int] = []
+        self._postings: Dict[int, int] = {}
+        self._rating_slots: Dict[int, int] = {}
+        self._occupied = 0
+        self._bitsets_outdated = False
+
+    def __len__(self):
+        return len(self._slots)
+
+    def upsert_kanji(self, doc_id: str, kanji: Optional[str], jouyou_number: Optional[int]) -> None:
+        """
+        Add, replace or remove (when kanji is None) a jouyou kanji. The bitsets are rebuilt in bulk on the
+        next query, so sentence writes in between (e.g. during an import) stay cheap.
+        """
+        value = (kanji, jouyou_number) if kanji else None
+        if self._kanji_by_id.get(doc_id) == value:
+            return
+
+        if value:
+            self._kanji_by_id[doc_id] = value
+        else:
+            del self._kanji_by_id[doc_id]
+        self._bitsets_outdated = True
+
+    def clear_kanji(self) -> None:
+        self._kanji_by_id.clear()
+        self._bitsets_outdated = True
+
+    def upsert_sentence(self, doc_id: str, example_sentence: Optional[str], rating: Optional[int]) -> None:
+        """
+        Add, replace or remove (when example_sentence is None) an example sentence.
+        """
+        self._remove_sentence(doc_id)
+        if example_sentence is None:
+            return
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = doc_id
+            self._slot_kanji[slot] = extract_kanji(example_sentence)
+            self._slot_ratings[slot] = rating or 0
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(doc_id)
+            self._slot_kanji.append(extract_kanji(example_sentence))
+            self._slot_masks.append(0)
+            self._slot_ratings.append(rating or 0)
+
+        self._slots[doc_id] = slot
+        if not self._bitsets_outdated:
+            self._set_slot_bits(slot)
+
+    def set_rating(self, doc_id: str, rating: Optional[int]) -> None:
+        slot = self._slots.get(doc_id)
+        if slot is None:
+            return
+
+        if not self._bitsets_outdated:
+            self._clear_slot_bits(slot)
+        self._slot_ratings[slot] = rating or 0
+        if not self._bitsets_outdated:
+            self._set_slot_bits(slot)
+
+    def clear_sentences(self) -> None:
+        self._slots.clear()
+        self._slot_ids.clear()
+        self._slot_kanji.clear()
+        self._slot_masks.clear()
+        self._slot_ratings.clear()
+        self._free_slots.clear()
+        self._postings.clear()
+        self._rating_slots.clear()
+        self._occupied = 0
+
+    def _remove_sentence(self, doc_id: str) -> None:
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return
+
+        if not self._bitsets_outdated:
+            self._clear_slot_bits(slot)
+        self._slot_ids[slot] = None
+        self._slot_kanji[slot] = []
+        self._free_slots.append(slot)
+
+    def _mask(self, kanji: List[str]) -> int:
+        mask = 0
+        for char in kanji:
+            mask |= 1 << self._jouyou_numbers.get(char, NON_JOUYOU_BIT)
+        return mask
+
+    def _set_slot_bits(self, slot: int) -> None:
+        slot_bit = 1 << slot
+        mask = self._mask(self._slot_kanji[slot])
+        self._slot_masks[slot] = mask
+        for number in _bit_positions(mask):
+            self._postings[number] = self._postings.get(number, 0) | slot_bit
+        rating = self._slot_ratings[slot]
+        self._rating_slots[rating] = self._rating_slots.get(rating, 0) | slot_bit
+        self._occupied |= slot_bit
+
+    def _clear_slot_bits(self, slot: int) -> None:
+        slot_bit = 1 << slot
+        for number in _bit_positions(self._slot_masks[slot]):
+            posting = self._postings[number] & ~slot_bit
+            if posting:
+                self._postings[number] = posting
+            else:
+                del self._postings[number]
+        rating = self._slot_ratings[slot]
+        rating_slots = self._rating_slots[rating] & ~slot_bit
+        if rating_slots:
+            self._rating_slots[rating] = rating_slots
+        else:
+            del self._rating_slots[rating]
+        self._slot_masks[slot] = 0
+        self._occupied &= ~slot_bit
+
+    def _rebuild_bitsets(self) -> None:
+        logger.info(f"Rebuilding kanji bitsets of {len(self._slots)} example sentences...")
+        self._jouyou_numbers = {
+            kanji: jouyou_number for kanji, jouyou_number in self._kanji_by_id.values() if jouyou_number
+        }
+
+        slots_by_number: Dict[int, List[int]] = {}
+        slots_by_rating: Dict[int, List[int]] = {}
+        jouyou_numbers = self._jouyou_numbers
+        for slot in self._slots.values():
+            mask = 0
+            for number in {jouyou_numbers.get(char, NON_JOUYOU_BIT) for char in self._slot_kanji[slot]}:
+                mask |= 1 << number
+                slots_by_number.setdefault(number, []).append(slot)
+            self._slot_masks[slot] = mask
+            slots_by_rating.setdefault(self._slot_ratings[slot], []).append(slot)
+
+        size = len(self._slot_ids)
+        self._postings = {number: _bitset(slots, size) for number, slots in slots_by_number.items()}
+        self._rating_slots = {rating: _bitset(slots, size) for rating, slots in slots_by_rating.items()}
+        self._occupied = _bitset(self._slots.values(), size)
+        self._bitsets_outdated = False
+
+    def load_sentences(self, sentences: Iterable[Tuple[str, Optional[str], Optional[int]]]) -> None:
+        """
+        Replace all example sentences. Builds the bitsets in bulk, which is much faster than upserting.
+
+        :param sentences: Iterable of (doc_id, example_sentence, rating) tuples.
+        """
+        self.clear_sentences()
+        for doc_id, example_sentence, rating in sentences:
+            if example_sentence is None or doc_id in self._slots:
+                continue
+            self._slots[doc_id] = len(self._slot_ids)
+            self._slot_ids.append(doc_id)
+            self._slot_kanji.append(extract_kanji(example_sentence))
+            self._slot_masks.append(0)
+            self._slot_ratings.append(rating or 0)
+
+        self._rebuild_bitsets()
+
+    def query(
+        self, known_kanji: Iterable[str], ratings: List[int], offset: int, limit: int
+    ) -> Tuple[int, List[str]]:
+        """
+        Find the sentences of which all kanji are in the known set.
+
+        :param known_kanji: The kanji the reader knows.
+        :param ratings: Only return sentences with one of these ratings. All ratings if empty.
+        :param offset: Number of matching sentences to skip.
+        :param limit: Maximum number of doc_ids to return, 0 for no limit.
+        :return: Returns the total number of matching sentences and the doc_ids of the requested page.
+        """
+        if self._bitsets_outdated:
+            self._rebuild_bitsets()
+
+        known_numbers = {self._jouyou_numbers.get(char) for char in known_kanji}
+        excluded = 0
+        for number, posting in self._postings.items():
+            if number not in known_numbers:
+                excluded |= posting
+
+        candidates = self._occupied & ~excluded
+        if ratings:
+            rating_slots = 0
+            for rating in ratings:
+                rating_slots |= self._rating_slots.get(rating, 0)
+            candidates &= rating_slots
+
+        # Least significant bit first, so string positions are slot numbers.
+        bits = bin(candidates)[:1:-1]
+        total = bits.count("1")
+
+        doc_ids = []
+        position = -1
+        for index in range(offset + limit if limit else total):
+            position = bits.find("1", position + 1)
+            if position < 0:
+                break
+            if index >= offset:
+                doc_ids.append(self._slot_ids[position])
+
+        return total, doc_ids
+
+
+def _bitset(positions: Iterable[int], size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _bit_positions(mask: int) -> List[int]:
+    positions = []
+    while mask:
+        lowest_bit = mask & -mask
+        positions.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return positions
+
+
+index = ReadableSentenceIndex()
+
+
+def _on_kanji_write(doc_id: str, kanji: Optional[models.KanjiInDb]) -> None:
+    if kanji:
+        index.upsert_kanji(doc_id, kanji.kanji, kanji.jouyou_number)
+    else:
+        index.upsert_kanji(doc_id, None, None)
+
+
+def _on_example_sentence_write(doc_id: str, example_sentence: Optional[models.ExampleSentenceInDb]) -> None:
+    if example_sentence:
+        index.upsert_sentence(doc_id, example_sentence.example_sentence, example_sentence.rating)
+    else:
+        index.upsert_sentence(doc_id, None, None)
+
+
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, _on_kanji_write)
+change_listeners.on_write(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, _on_example_sentence_write)
+change_listeners.on_rating(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, index.set_rating)
+change_listeners.on_drop(settings.MONGO_KANJI_COLLECTION, index.clear_kanji)
+change_listeners.on_drop(settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, index.clear_sentences)
+
+
+async def load_readable_sentence_index(connection: AsyncIOMotorClient) -> None:
+    """
+    Load all kanji and example sentences into the readable sentence index.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    kanji_results = get_repository(connection, settings.MONGO_KANJI_COLLECTION).find(
+        fields=["kanji", "jouyou_number"]
+    )
+    async for result in kanji_results:
+        index.upsert_kanji(str(result["_id"]), result.get("kanji"), result.get("jouyou_number"))
+
+    results = get_repository(connection, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION).find(
+        fields=["example_sentence", "rating"]
+    )
+    index.load_sentences(
+        [
+            (str(result["_id"]), result.get("example_sentence"), result.get("rating"))
+            async for result in results
+        ]
+    )
+
+    logger.info(f"Loaded readable sentence index with {len(index)} example sentences.")
+
+
+async def get_readable_example_sentences(
+    connection: AsyncIOMotorClient, filters: models.ReadableExampleSentenceFilterParams
+) -> List[models.ExampleSentenceInDb]:
+    """
+    Get the example sentences that only use kanji from a known set.
+
+    :param connection: Async database client.
+    :param filters: ReadableExampleSentenceFilterParams instance with the known kanji, ratings and page.
+    :return: Returns the matching example_sentence documents as a list.
+    """
+    logger.debug(">>>>")
+    known_kanji = set("".join(filters.known_kanji))
+    total, doc_ids = index.query(known_kanji, filters.ratings, filters.offset, filters.limit)
+    logger.info(f"{total} example sentences are readable with {len(known_kanji)} known kanji.")
+
+    return await example_sentence_service.get_example_sentences_by_ids(connection, doc_ids)
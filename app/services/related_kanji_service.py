@@ -0,0 +1,116 @@
+"""
+Automatic related_kanji of compound words and example sentences.
+
+Creates and updates add the jouyou kanji in the text of the item to its related_kanji, after the kanji that
+were already set. Kanji are never removed, so links set by hand to kanji outside the text are kept. The
+jouyou kanji are the kanji documents with a jouyou_number, kept in memory and loaded on first use.
+"""
+from collections import Counter
+from typing import Dict, List, Optional
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners
+from app.utils.kanji_text import extract_kanji
+
+
+class JouyouKanjiSet:
+    """
+    The jouyou kanji of the kanji collection, maintained incrementally from kanji writes.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._kanji_by_id: Dict[str, str] = {}
+        self._kanji = Counter()
+
+    def __len__(self):
+        return len(self._kanji)
+
+    def __contains__(self, kanji: str) -> bool:
+        return kanji in self._kanji
+
+    def upsert(self, doc_id: str, kanji: Optional[str], jouyou_number: Optional[int]) -> None:
+        """
+        Add, replace or remove (when kanji is None or not jouyou) a kanji.
+        """
+        old = self._kanji_by_id.pop(doc_id, None)
+        if old is not None:
+            self._kanji[old] -= 1
+            if self._kanji[old] <= 0:
+                del self._kanji[old]
+
+        if kanji and jouyou_number:
+            self._kanji_by_id[doc_id] = kanji
+            self._kanji[kanji] += 1
+
+    def clear(self) -> None:
+        self._kanji_by_id.clear()
+        self._kanji.clear()
+
+    def link(self, text: Optional[str], related_kanji: Optional[List[str]]) -> List[str]:
+        """
+        The related kanji followed by the jouyou kanji of the text that aren't related yet.
+        """
+        linked = list(related_kanji or [])
+        known = set(linked)
+        for kanji in extract_kanji(text):
+            if kanji not in known and kanji in self._kanji:
+                linked.append(kanji)
+                known.add(kanji)
+        return linked
+
+
+jouyou_kanji = JouyouKanjiSet()
+
+
+def _on_kanji_write(doc_id: str, kanji: Optional[models.KanjiInDb]) -> None:
+    if kanji:
+        jouyou_kanji.upsert(doc_id, kanji.kanji, kanji.jouyou_number)
+    else:
+        jouyou_kanji.upsert(doc_id, None, None)
+
+
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, _on_kanji_write)
+change_listeners.on_drop(settings.MONGO_KANJI_COLLECTION, jouyou_kanji.clear)
+
+
+async def load_jouyou_kanji(connection: AsyncIOMotorClient) -> None:
+    """
+    Load the jouyou kanji set from the kanji documents.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    jouyou_kanji.clear()
+    repository = get_repository(connection, settings.MONGO_KANJI_COLLECTION)
+    results = repository.find(fields=["kanji", "jouyou_number"])
+    async for result in results:
+        jouyou_kanji.upsert(str(result["_id"]), result.get("kanji"), result.get("jouyou_number"))
+    jouyou_kanji.loaded = True
+
+    logger.info(f"Loaded {len(jouyou_kanji)} jouyou kanji.")
+
+
+async def link_related_kanji(
+    connection: AsyncIOMotorClient, text: Optional[str], related_kanji: Optional[List[str]]
+) -> Optional[List[str]]:
+    """
+    Add the jouyou kanji in the text of a compound word or example sentence to its related kanji.
+
+    :param connection: Async database client.
+    :param text: The compound word or example sentence.
+    :param related_kanji: The related kanji set on the item.
+    :return: Returns the related kanji followed by the added kanji, or related_kanji unchanged when
+    AUTO_RELATED_KANJI is off.
+    """
+    if not settings.AUTO_RELATED_KANJI:
+        return related_kanji
+
+    if not jouyou_kanji.loaded:
+        await load_jouyou_kanji(connection)
+    return jouyou_kanji.link(text, related_kanji)
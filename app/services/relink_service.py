@@ -0,0 +1,126 @@
+"""
+Background job that adds the jouyou kanji in the text of all compound words and example sentences to their
+related_kanji, for documents written before automatic linking or before their kanji were imported.
+
+Each collection is read in batches of RELINK_BATCH_SIZE documents. Up to RELINK_CONCURRENCY batches per
+collection are linked and written at the same time, with one bulk write of the changed documents per batch.
+A document that is updated between being read and written by the job may lose the related kanji set by
+that update, run the job when the dictionary isn't being edited.
+"""
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners, rating_buffer_service, related_kanji_service
+from app.utils.metrics import Counter
+
+# Text field and model per collection.
+COLLECTIONS = {
+    settings.MONGO_COMPOUND_WORD_COLLECTION: ("compound_word", models.CompoundWordInDb),
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: ("example_sentence", models.ExampleSentenceInDb),
+}
+
+RELINKED_DOCUMENTS = Counter(
+    "relink_documents_total", "Documents read and changed by the relink job.", ("collection", "result")
+)
+
+status = models.RelinkJobStatus()
+_task: Optional[asyncio.Task] = None
+
+
+async def _relink_batch(
+    connection: AsyncIOMotorClient, collection: str, documents: List[dict], semaphore: asyncio.Semaphore
+) -> None:
+    try:
+        text_field, model = COLLECTIONS[collection]
+        updates = {}
+        updated_at = datetime.utcnow()
+        for document in documents:
+            related_kanji = document.get("related_kanji") or []
+            linked = related_kanji_service.jouyou_kanji.link(document.get(text_field), related_kanji)
+            if linked != related_kanji:
+                updates[document["_id"]] = {"related_kanji": linked, "updated_at": updated_at}
+
+        if updates:
+            await get_repository(connection, collection).update_fields(updates)
+        for document in documents:
+            if document["_id"] in updates:
+                document.update(updates[document["_id"]])
+                item = model.from_document(rating_buffer_service.overlay(collection, document))
+                change_listeners.notify_write(collection, str(document["_id"]), item)
+
+        status.scanned[collection] = status.scanned.get(collection, 0) + len(documents)
+        status.changed[collection] = status.changed.get(collection, 0) + len(updates)
+        RELINKED_DOCUMENTS.labels(collection, "read").inc(len(documents))
+        RELINKED_DOCUMENTS.labels(collection, "changed").inc(len(updates))
+    finally:
+        semaphore.release()
+
+
+async def _relink_collection(connection: AsyncIOMotorClient, collection: str) -> None:
+    semaphore = asyncio.Semaphore(settings.RELINK_CONCURRENCY)
+    batches = []
+    documents = []
+    results = get_repository(connection, collection).find(batch_size=settings.RELINK_BATCH_SIZE)
+    async for document in results:
+        documents.append(document)
+        if len(documents) >= settings.RELINK_BATCH_SIZE:
+            await semaphore.acquire()
+            batches.append(asyncio.ensure_future(_relink_batch(connection, collection, documents, semaphore)))
+            documents = []
+
+    if documents:
+        await semaphore.acquire()
+        batches.append(asyncio.ensure_future(_relink_batch(connection, collection, documents, semaphore)))
+    await asyncio.gather(*batches)
+    logger.info(f"Relinked {collection}: {status.changed.get(collection, 0)} documents changed.")
+
+
+def _reset_status() -> None:
+    status.running = True
+    status.started_at = datetime.utcnow()
+    status.finished_at = None
+    status.scanned, status.changed, status.error = {}, {}, None
+
+
+async def relink_all(connection: AsyncIOMotorClient) -> models.RelinkJobStatus:
+    """
+    Add the jouyou kanji in the text of all compound words and example sentences to their related kanji.
+
+    :param connection: Async database client.
+    :return: Returns the status of the job.
+    """
+    logger.debug(">>>>")
+    _reset_status()
+    try:
+        await related_kanji_service.load_jouyou_kanji(connection)
+        await asyncio.gather(*(_relink_collection(connection, collection) for collection in COLLECTIONS))
+    except Exception as e:
+        logger.exception("Relinking related kanji failed.")
+        status.error = str(e)
+    finally:
+        status.running = False
+        status.finished_at = datetime.utcnow()
+    return status
+
+
+def start_relink(connection: AsyncIOMotorClient) -> bool:
+    """
+    Start the relink job in the background, unless it is running.
+
+    :param connection: Async database client.
+    :return: Returns whether the job was started.
+    """
+    global _task
+    if _task is not None and not _task.done():
+        return False
+
+    _reset_status()
+    _task = asyncio.ensure_future(relink_all(connection))
+    return True
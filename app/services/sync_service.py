@@ -0,0 +1,125 @@
+"""
+Delta sync of the kanji, compound words and example sentences for clients that keep a local copy.
+
+Creates and updates stamp updated_at on the documents, deletes leave a tombstone with the deleted doc_id
+and a full kanji dictionary import leaves a tombstone without doc_id per dropped collection. A client sends
+the watermark of its previous sync and gets the documents updated and the doc_ids deleted after it.
+
+The watermark lags SYNC_WATERMARK_LAG_SECONDS behind the time of the sync, since updated_at is stamped before
+the write reaches the database. Documents written within the lag are sent again by the next sync, which is
+harmless for clients that upsert by doc_id.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import DocId, get_repository
+
+# Response fields of the documents and deleted doc_ids per collection.
+FIELDS = {
+    settings.MONGO_KANJI_COLLECTION: ("kanji", "deleted_kanji", models.KanjiInDb),
+    settings.MONGO_COMPOUND_WORD_COLLECTION: (
+        "compound_words",
+        "deleted_compound_words",
+        models.CompoundWordInDb,
+    ),
+    settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: (
+        "example_sentences",
+        "deleted_example_sentences",
+        models.ExampleSentenceInDb,
+    ),
+}
+
+
+def _utc(value: datetime) -> datetime:
+    # Mongo returns naive datetimes in UTC, compare in the same form.
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def record_deletes(connection: AsyncIOMotorClient, collection: str, doc_ids: Iterable[DocId]) -> None:
+    """
+    Leave tombstones for deleted documents.
+
+    :param connection: Async database client.
+    :param collection: Name of the collection the documents were deleted from.
+    :param doc_ids: The doc_ids of the deleted documents.
+    """
+    deleted_at = datetime.utcnow()
+    repository = get_repository(connection, settings.MONGO_TOMBSTONE_COLLECTION)
+    for doc_id in doc_ids:
+        await repository.insert_one(
+            {"collection": collection, "doc_id": str(doc_id), "deleted_at": deleted_at}
+        )
+
+
+async def record_drop(connection: AsyncIOMotorClient, collection: str) -> None:
+    """
+    Leave a tombstone for a dropped collection, clients that synced before it get all documents again.
+
+    :param connection: Async database client.
+    :param collection: Name of the dropped collection.
+    """
+    repository = get_repository(connection, settings.MONGO_TOMBSTONE_COLLECTION)
+    await repository.insert_one({"collection": collection, "doc_id": None, "deleted_at": datetime.utcnow()})
+
+
+async def create_indexes(connection: AsyncIOMotorClient) -> None:
+    """
+    Create the updated_at indexes of the synced collections and the index that expires the tombstones.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    for collection in FIELDS:
+        await get_repository(connection, collection).create_index("updated_at")
+    await get_repository(connection, settings.MONGO_TOMBSTONE_COLLECTION).create_index(
+        "deleted_at", expire_after_seconds=settings.SYNC_TOMBSTONE_RETENTION_SECONDS
+    )
+
+
+async def get_changes(connection: AsyncIOMotorClient, since: Optional[datetime] = None) -> models.SyncChanges:
+    """
+    Get the documents created, updated or deleted after a watermark.
+
+    :param connection: Async database client.
+    :param since: Watermark of the previous sync, None for all documents.
+    :return: Returns the changes and the watermark for the next sync.
+    """
+    logger.debug(">>>>")
+    now = datetime.utcnow()
+    changes = models.SyncChanges(watermark=now - timedelta(seconds=settings.SYNC_WATERMARK_LAG_SECONDS))
+
+    tombstones = []
+    if since is not None:
+        since = _utc(since)
+        tombstone_repository = get_repository(connection, settings.MONGO_TOMBSTONE_COLLECTION)
+        tombstones = [tombstone async for tombstone in tombstone_repository.find_after("deleted_at", since)]
+    retention = timedelta(seconds=settings.SYNC_TOMBSTONE_RETENTION_SECONDS)
+    changes.reset = (
+        since is None
+        or since < now - retention
+        or any(tombstone["doc_id"] is None for tombstone in tombstones)
+    )
+
+    for collection, (field, deleted_field, model) in FIELDS.items():
+        repository = get_repository(connection, collection)
+        results = repository.find() if changes.reset else repository.find_after("updated_at", since)
+        setattr(changes, field, [model.from_document(result) async for result in results])
+
+        if not changes.reset:
+            deleted = [
+                tombstone["doc_id"] for tombstone in tombstones if tombstone["collection"] == collection
+            ]
+            setattr(changes, deleted_field, list(dict.fromkeys(deleted)))
+
+    logger.debug(
+        f"Sync since {since}: {len(changes.kanji)} kanji, {len(changes.compound_words)} compound words, "
+        f"{len(changes.example_sentences)} example sentences, reset {changes.reset}."
+    )
+    return changes
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import get_repository
+from app.services import change_listeners
+from app.utils.aho_corasick import AhoCorasickAutomaton
+
+
+class TextAnnotationIndex:
+    """
+    In-memory index of the known compound words and kanji, used to annotate texts in a single pass.
+
+    The automaton is rebuilt lazily on the next annotation when a surface that it doesn't know yet is added.
+    Removed surfaces only lose their entry in the payload lookup, so deletes never trigger a rebuild.
+    """
+
+    def __init__(self):
+        self._surfaces_by_id: Dict[Tuple[models.AnnotationKindEnum, str], str] = {}
+        self._payloads: Dict[str, Set[Tuple[models.AnnotationKindEnum, str]]] = {}
+        self._automaton = AhoCorasickAutomaton([])
+        # Set when a surface that the automaton doesn't know is added.
+        self._automaton_outdated = False
+
+    def __len__(self):
+        return len(self._surfaces_by_id)
+
+    def upsert(self, kind: models.AnnotationKindEnum, doc_id: str, surface: Optional[str]) -> None:
+        """
+        Add, replace or remove (when surface is None) the surface of a document.
+        """
+        key = (kind, doc_id)
+        old_surface = self._surfaces_by_id.get(key)
+        if old_surface == surface:
+            return
+
+        if old_surface is not None:
+            del self._surfaces_by_id[key]
+            payload = self._payloads.get(old_surface)
+            if payload:
+                payload.discard(key)
+                if not payload:
+                    del self._payloads[old_surface]
+
+        if surface:
+            self._surfaces_by_id[key] = surface
+            self._payloads.setdefault(surface, set()).add(key)
+            if surface not in self._automaton.patterns:
+                self._automaton_outdated = True
+
+    def clear(self, kind: models.AnnotationKindEnum) -> None:
+        for key in [key for key in self._surfaces_by_id if key[0] == kind]:
+            self.upsert(kind, key[1], None)
+
+    def annotate(self, text: str) -> List[models.TextAnnotation]:
+        if self._automaton_outdated:
+            logger.info(f"Rebuilding text annotation automaton for {len(self._payloads)} surfaces...")
+            self._automaton = AhoCorasickAutomaton(self._payloads)
+            self._automaton_outdated = False
+
+        annotations = []
+        for start, end in self._automaton.find_all(text):
+            surface = text[start:end]
+            for kind, doc_id in self._payloads.get(surface, ()):
+                annotations.append(
+                    models.TextAnnotation(start=start, end=end, surface=surface, kind=kind, doc_id=doc_id)
+                )
+
+        annotations.sort(key=lambda annotation: (annotation.start, -annotation.end))
+        return annotations
+
+
+index = TextAnnotationIndex()
+
+
+def _on_kanji_write(doc_id: str, kanji: Optional[models.KanjiInDb]) -> None:
+    index.upsert(models.AnnotationKindEnum.kanji, doc_id, kanji.kanji if kanji else None)
+
+
+def _on_compound_word_write(doc_id: str, compound_word: Optional[models.CompoundWordInDb]) -> None:
+    surface = compound_word.compound_word if compound_word else None
+    index.upsert(models.AnnotationKindEnum.compound_word, doc_id, surface)
+
+
+change_listeners.on_write(settings.MONGO_KANJI_COLLECTION, _on_kanji_write)
+change_listeners.on_write(settings.MONGO_COMPOUND_WORD_COLLECTION, _on_compound_word_write)
+change_listeners.on_drop(
+    settings.MONGO_KANJI_COLLECTION, lambda: index.clear(models.AnnotationKindEnum.kanji)
+)
+change_listeners.on_drop(
+    settings.MONGO_COMPOUND_WORD_COLLECTION, lambda: index.clear(models.AnnotationKindEnum.compound_word)
+)
+
+
+async def load_text_annotation_index(connection: AsyncIOMotorClient) -> None:
+    """
+    Load all kanji and compound words into the text annotation index.
+
+    :param connection: Async database client.
+    """
+    logger.debug(">>>>")
+    kanji_results = get_repository(connection, settings.MONGO_KANJI_COLLECTION).find(fields=["kanji"])
+    async for result in kanji_results:
+        index.upsert(models.AnnotationKindEnum.kanji, str(result["_id"]), result.get("kanji"))
+
+    compound_word_repository = get_repository(connection, settings.MONGO_COMPOUND_WORD_COLLECTION)
+    async for result in compound_word_repository.find(fields=["compound_word"]):
+        index.upsert(models.AnnotationKindEnum.compound_word, str(result["_id"]), result.get("compound_word"))
+
+    logger.info(f"Loaded text annotation index with {len(index)} surfaces.")
+
+
+async def annotate_text(text: str) -> models.TextAnnotationResult:
+    """
+    Find every known compound word and kanji in a text.
+
+    :param text: The text to annotate.
+    :return: Returns a TextAnnotationResult with all (overlapping) matches ordered by offset.
+    """
+    logger.debug(">>>>")
+    annotations = index.annotate(text)
+    logger.info(f"Found {len(annotations)} annotations in text of length {len(text)}.")
+
+    return models.TextAnnotationResult(annotations=annotations)
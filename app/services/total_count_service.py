@@ -0,0 +1,112 @@
+"""
+Total counts for the X-Total-Count header of the list endpoints.
+
+Estimated counts of a whole collection come from the collection metadata. Estimated counts of a filter are
+counted once and cached until the next write to the collection, through the change listeners. Rating updates
+invalidate the cache when the rating buffer has written them, not when they are buffered, since counting
+reads the database. Writes of other workers reach the cache through the cache coherence task. Exact counts
+are always counted.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app import models
+from app.db.repository import Where, get_repository
+from app.services import change_listeners
+from app.utils.metrics import Counter
+
+COLLECTIONS = (settings.MONGO_COMPOUND_WORD_COLLECTION, settings.MONGO_EXAMPLE_SENTENCE_COLLECTION)
+
+TOTAL_COUNTS = Counter(
+    "total_counts_total",
+    "Total counts of the list endpoints by source: collection metadata, cache or counting.",
+    ("collection", "source"),
+)
+
+# Counts per collection and filter, least recently used first.
+_cache: "OrderedDict[Tuple[str, Tuple], int]" = OrderedDict()
+# Bumped by every write, counts started before a write aren't cached.
+_generations: Dict[str, int] = {collection: 0 for collection in COLLECTIONS}
+
+
+def _cache_key(collection: str, where: Where) -> Tuple[str, Tuple]:
+    return collection, tuple(sorted((field, tuple(sorted(set(values)))) for field, values in where.items()))
+
+
+def invalidate(collection: str) -> None:
+    """
+    Forget the cached counts of a collection.
+    """
+    _generations[collection] = _generations.get(collection, 0) + 1
+    for key in [key for key in _cache if key[0] == collection]:
+        del _cache[key]
+
+
+def _write_listener(collection: str):
+    def on_write(doc_id: str, document) -> None:
+        invalidate(collection)
+
+    return on_write
+
+
+def _rating_written_listener(collection: str):
+    def on_rating_written(doc_ids: List[str]) -> None:
+        invalidate(collection)
+
+    return on_rating_written
+
+
+def _drop_listener(collection: str):
+    def on_drop() -> None:
+        invalidate(collection)
+
+    return on_drop
+
+
+for _collection in COLLECTIONS:
+    change_listeners.on_write(_collection, _write_listener(_collection))
+    change_listeners.on_rating_written(_collection, _rating_written_listener(_collection))
+    change_listeners.on_drop(_collection, _drop_listener(_collection))
+
+
+async def get_total_count(
+    connection: AsyncIOMotorClient, collection: str, where: Where, mode: models.TotalCountEnum
+) -> int:
+    """
+    Count the documents matching the filter of a list request, without its offset and limit.
+
+    :param connection: Async database client.
+    :param collection: Name of the listed collection.
+    :param where: The conditions of the list request.
+    :param mode: Estimated or exact.
+    :return: Returns the number of matching documents.
+    """
+    logger.debug(">>>>")
+    repository = get_repository(connection, collection)
+    if mode == models.TotalCountEnum.exact:
+        TOTAL_COUNTS.labels(collection, "counted").inc()
+        return await repository.count(where)
+
+    if not where:
+        TOTAL_COUNTS.labels(collection, "metadata").inc()
+        return await repository.estimated_count()
+
+    key = _cache_key(collection, where)
+    count = _cache.get(key)
+    if count is not None:
+        _cache.move_to_end(key)
+        TOTAL_COUNTS.labels(collection, "cached").inc()
+        return count
+
+    generation = _generations.get(collection, 0)
+    count = await repository.count(where)
+    TOTAL_COUNTS.labels(collection, "counted").inc()
+    if _generations.get(collection, 0) == generation:
+        _cache[key] = count
+        while len(_cache) > settings.TOTAL_COUNT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return count
@@ -0,0 +1,76 @@
+"""Aho-Corasick automaton for finding many patterns in a text in a single pass."""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasickAutomaton:
+    """
+    Immutable Aho-Corasick automaton over a set of string patterns.
+
+    Matching runs in O(len(text) + number of matches), independent of the number of patterns.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        # Length of the pattern ending in a node, 0 if no pattern ends there.
+        self._lengths: List[int] = [0]
+        self._fail: List[int] = [0]
+        # Nearest node on the failure chain in which a pattern ends.
+        self._output_link: List[int] = [0]
+        self.patterns = frozenset(pattern for pattern in patterns if pattern)
+
+        for pattern in self.patterns:
+            self._add(pattern)
+        self._build_links()
+
+    def _add(self, pattern: str) -> None:
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._lengths.append(0)
+                self._fail.append(0)
+                self._output_link.append(0)
+            node = next_node
+        self._lengths[node] = len(pattern)
+
+    def _build_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                if fail == child:
+                    fail = 0
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._lengths[fail] else self._output_link[fail]
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Find all occurrences of all patterns in the text, including overlapping ones.
+
+        :param text: The text to search.
+        :return: Yields (start, end) offsets of every match, ordered by end offset.
+        """
+        goto = self._goto
+        fail = self._fail
+        lengths = self._lengths
+        output_link = self._output_link
+
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            output = node if lengths[node] else output_link[node]
+            while output:
+                yield index + 1 - lengths[output], index + 1
+                output = output_link[output]
@@ -0,0 +1,19 @@
+"""Helpers for finding kanji in Japanese text."""
+import re
+from typing import List
+
+# CJK unified ideographs, extension A and compatibility ideographs.
+KANJI_PATTERN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+
+def extract_kanji(text: str) -> List[str]:
+    """
+    Find the distinct kanji in a text.
+
+    :param text: The text to search.
+    :return: Returns the kanji in order of first appearance.
+    """
+    if not text:
+        return []
+
+    return list(dict.fromkeys(KANJI_PATTERN.findall(text)))
@@ -1,5 +1,6 @@
 """Configure handlers and formats for application loggers."""
 import logging
+import random
 import sys
 from pprint import pformat
 
@@ -8,6 +9,13 @@ from pprint import pformat
 from loguru import logger
 from loguru._defaults import LOGURU_FORMAT
 
+from app.core.config import settings
+
+LOG_PROFILES = {
+    "development": {"level": "DEBUG", "json": False, "enqueue": False, "debug_sample_rate": 1.0},
+    "production": {"level": "INFO", "json": True, "enqueue": True, "debug_sample_rate": 0.01},
+}
+
 
 class InterceptHandler(logging.Handler):
     """
@@ -54,6 +62,40 @@ def format_record(record: dict) -> str:
     return format_string
 
 
+def format_json_record(record: dict) -> str:
+    """
+    Format for loguru loggers that serialize records to JSON. Only the message is formatted, payloads and
+    other extras are serialized as structured fields by loguru.
+    """
+    return "{message}"
+
+
+def sample_debug_records(sample_rate: float):
+    """
+    Create a loguru filter that only lets through a fraction of the DEBUG (and lower) records.
+    """
+
+    def sample_filter(record: dict) -> bool:
+        return record["level"].no > logging.DEBUG or random.random() < sample_rate
+
+    return sample_filter
+
+
+def get_log_options() -> dict:
+    """
+    Combine the defaults of the configured logging profile with the LOG_ settings that override them.
+    """
+    options = dict(LOG_PROFILES[settings.LOG_PROFILE])
+    overrides = {
+        "level": settings.LOG_LEVEL,
+        "json": settings.LOG_JSON,
+        "enqueue": settings.LOG_ENQUEUE,
+        "debug_sample_rate": settings.LOG_DEBUG_SAMPLE_RATE,
+    }
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    return options
+
+
 def init_logging():
     """
     Replaces logging handlers with a handler for using the custom handler.
@@ -87,4 +129,24 @@ def init_logging():
     # set logs output, level and format
     logger.level("DEBUG", color="<m>")
     logger.level("INFO", color="<blue>")
-    logger.configure(handlers=[{"sink": sys.stdout, "level": logging.DEBUG, "format": format_record}])
+
+    options = get_log_options()
+    handler = {
+        "sink": sys.stdout,
+        "level": options["level"],
+        "format": format_json_record if options["json"] else format_record,
+        "serialize": options["json"],
+        # Write from a background thread, so requests don't block on stdout.
+        "enqueue": options["enqueue"],
+    }
+    if options["debug_sample_rate"] < 1.0:
+        handler["filter"] = sample_debug_records(options["debug_sample_rate"])
+
+    logger.configure(handlers=[handler])
+
+
+def close_logging():
+    """
+    Wait until all enqueued log records are written.
+    """
+    logger.complete()
@@ -0,0 +1,138 @@
+"""
+Statistical CPU profiler for single requests, with output in the folded stack format of flamegraph.pl,
+speedscope and inferno.
+
+A thread samples the stack of the event loop thread every interval. Samples are only kept while the task of
+the profiled request runs, so other requests served by the same worker at the same time are left out. Work
+the request hands to other tasks or threads is not sampled.
+"""
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import List, Optional
+
+# The frames of the event loop below the request are cut from the stacks.
+_ROOT_FUNCTIONS = {"_run_once", "run_forever"}
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    # ";" separates the frames in the folded format.
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _folded_stack(frame: Optional[FrameType]) -> str:
+    names = []
+    while frame is not None and frame.f_code.co_name not in _ROOT_FUNCTIONS:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    # The sampling thread only runs when the event loop thread releases the GIL, by default every 5 ms. The
+    # switch interval is shortened while profilers run.
+    _running = 0
+    _switch_interval = sys.getswitchinterval()
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """
+        Start sampling the current task. Must be called from the task to profile.
+        """
+        self._thread_id = threading.get_ident()
+        self._loop = asyncio.get_event_loop()
+        self._task = asyncio.current_task()
+        if SamplingProfiler._running == 0:
+            SamplingProfiler._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self.interval, SamplingProfiler._switch_interval))
+        SamplingProfiler._running += 1
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None or self._stopped.is_set():
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        SamplingProfiler._running -= 1
+        if SamplingProfiler._running == 0:
+            sys.setswitchinterval(SamplingProfiler._switch_interval)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            # Read without a lock, a sample taken while the loop switches tasks may be counted for either.
+            if self._task is not None and asyncio.tasks._current_tasks.get(self._loop) is not self._task:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            stack = _folded_stack(frame)
+            if stack:
+                self.samples[stack] += 1
+
+    def folded(self) -> str:
+        """
+        The samples as lines of semicolon separated frames, outermost first, and the number of samples.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def save_profile(directory: str, name: str, profile: str, max_files: int) -> str:
+    """
+    Write a folded profile to directory and remove the oldest profiles beyond max_files.
+
+    :return: Returns the file name of the profile.
+    """
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"{name}.folded"
+    with open(os.path.join(directory, file_name), "w") as profile_file:
+        profile_file.write(profile)
+
+    profiles = list_profiles(directory)
+    for old in profiles[max_files:]:
+        try:
+            os.remove(os.path.join(directory, old["name"]))
+        except OSError:
+            pass
+    return file_name
+
+
+def list_profiles(directory: str) -> List[dict]:
+    """
+    The profiles in directory, newest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".folded"):
+            stat = entry.stat()
+            profiles.append({"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime})
+    return sorted(profiles, key=lambda profile: profile["modified"], reverse=True)
+
+
+def read_profile(directory: str, name: str) -> Optional[str]:
+    """
+    The content of a profile, None if there is no profile with that name.
+    """
+    # Only plain file names, no paths out of the directory.
+    if os.path.basename(name) != name or not name.endswith(".folded"):
+        return None
+
+    try:
+        with open(os.path.join(directory, name)) as profile_file:
+            return profile_file.read()
+    except FileNotFoundError:
+        return None
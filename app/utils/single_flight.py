@@ -0,0 +1,87 @@
+"""
+Single-flight coalescing of concurrent identical calls to expensive read functions.
+
+While a call is in flight, identical calls wait for its result instead of running the same reads again. The
+callers share the result, so it must not be changed by them. Once the call completes the next call runs
+again, there is no caching beyond the calls that overlap.
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.core.config import settings
+from app.utils.metrics import Counter
+
+T = TypeVar("T")
+
+CALLS = Counter(
+    "single_flight_calls_total",
+    "Calls of coalesced functions, by whether they ran (leader) or joined a call in flight (shared).",
+    ("function", "result"),
+)
+
+
+def _call_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    # The first argument is the database client, calls on differently routed clients are not shared.
+    if args:
+        args = (id(args[0]), *(repr(arg) for arg in args[1:]))
+    return args, tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run call, or wait for the call in flight with the same key.
+
+        The call runs in its own task, so a caller that is cancelled doesn't cancel it for the others.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            CALLS.labels(self.name, "leader").inc()
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(functools.partial(self._done, key))
+        else:
+            CALLS.labels(self.name, "shared").inc()
+        return await asyncio.shield(future)
+
+    def _done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Retrieved so an error is not logged as never retrieved when all callers went away.
+            future.exception()
+
+    def forget(self) -> None:
+        """
+        Let the next calls run again instead of joining the calls in flight, e.g. after a write that the
+        calls in flight may not see.
+        """
+        self._calls.clear()
+
+
+def single_flight(name: str):
+    """
+    Decorator coalescing concurrent calls of an async function with equal arguments. The SingleFlight is
+    available as the flight attribute of the decorated function.
+
+    :param name: Name of the function in the metrics.
+    """
+
+    def decorator(function: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        flight = SingleFlight(name)
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs) -> T:
+            if not settings.SINGLE_FLIGHT:
+                return await function(*args, **kwargs)
+            return await flight.do(_call_key(args, kwargs), lambda: function(*args, **kwargs))
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
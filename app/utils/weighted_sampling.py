@@ -0,0 +1,66 @@
+"""Weighted random sampling without replacement from precomputed weight tables."""
+import heapq
+from bisect import bisect_right
+from itertools import accumulate
+from random import Random
+from typing import Generic, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class WeightTable(Generic[T]):
+    """
+    Cumulative weight array over a fixed list of keys.
+
+    Building the table is O(n). Drawing a sample of k keys is O(k log n) by inverse transform sampling with
+    rejection of duplicates, which is cheap as long as the sample is small compared to the table and the
+    weights are of similar magnitude. Larger samples fall back to the Efraimidis-Spirakis method, which is
+    O(n log k). Changing a weight is O(1), the cumulative weights are recomputed in O(n) on the next draw.
+    """
+
+    def __init__(self, keys: Sequence[T], weights: Sequence[float]):
+        pairs = [(key, weight) for key, weight in zip(keys, weights) if weight > 0]
+        self.keys: List[T] = [key for key, _ in pairs]
+        self.weights: List[float] = [weight for _, weight in pairs]
+        self.cumulative: List[float] = list(accumulate(self.weights))
+        self._cumulative_outdated = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set_weight(self, index: int, weight: float) -> None:
+        """
+        Change the weight of the key at index to a positive weight.
+        """
+        self.weights[index] = weight
+        self._cumulative_outdated = True
+
+    def sample(self, size: int, rng: Random) -> List[T]:
+        """
+        Draw keys without replacement, with probabilities proportional to their weights.
+
+        :param size: Number of keys to draw. If it exceeds the table size, all keys are returned.
+        :param rng: Random number generator to draw with.
+        :return: Returns the drawn keys in draw order.
+        """
+        size = min(size, len(self.keys))
+        if size <= 0:
+            return []
+
+        if size * 2 > len(self.keys):
+            ranked = heapq.nlargest(
+                size, zip((rng.random() ** (1.0 / weight) for weight in self.weights), range(len(self.keys)))
+            )
+            return [self.keys[index] for _, index in ranked]
+
+        if self._cumulative_outdated:
+            self.cumulative = list(accumulate(self.weights))
+            self._cumulative_outdated = False
+        total = self.cumulative[-1]
+        last = len(self.keys) - 1
+        chosen = {}
+        while len(chosen) < size:
+            index = min(bisect_right(self.cumulative, rng.random() * total), last)
+            chosen.setdefault(index, None)
+
+        return [self.keys[index] for index in chosen]
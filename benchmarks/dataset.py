@@ -0,0 +1,146 @@
+"""
+Deterministic generator of a jouyou-scale kanji dictionary dataset in the format of the upload file.
+
+Kanji are drawn into compound words and example sentences by newspaper frequency, so the related_kanji
+fan-out is skewed like the real data: the most frequent kanji appear in thousands of items, the rarest in a
+handful. Every item is listed in the kanji dict of each of its related kanji, as in the upload file.
+"""
+from itertools import accumulate
+from random import Random
+from typing import Dict, List
+
+JOUYOU_KANJI_COUNT = 2136
+COMPOUND_WORD_COUNT = 50_000
+EXAMPLE_SENTENCE_COUNT = 100_000
+DEFAULT_SEED = 2136
+# Exponent of the Zipf-like distribution of kanji over items.
+FREQUENCY_SKEW = 0.6
+
+CJK_START = 0x4E00
+CJK_END = 0x9FA5
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+PARTICLES = ("は", "が", "を", "に", "で", "と", "の", "も", "から", "まで")
+ENDINGS = ("です。", "ます。", "した。", "ません。", "だ。", "る。")
+WORDS = (
+    "water",
+    "fire",
+    "mountain",
+    "river",
+    "person",
+    "day",
+    "book",
+    "study",
+    "car",
+    "power",
+    "light",
+    "electric",
+    "country",
+    "sea",
+    "tree",
+    "heart",
+    "word",
+    "time",
+    "road",
+    "flower",
+)
+
+
+def _reading(rng: Random, length: int) -> str:
+    return "".join(rng.choice(KANA) for _ in range(length))
+
+
+def _kanji(rng: Random, count: int) -> List[dict]:
+    characters = [chr(code) for code in rng.sample(range(CJK_START, CJK_END + 1), count)]
+    # Newspaper frequency ranks go up to 2500, a few jouyou kanji are unranked.
+    frequency_ranks = rng.sample(range(1, 2501), count)
+    radicals = characters[:214]
+
+    kanji = []
+    for jouyou_number, (character, frequency_rank) in enumerate(zip(characters, frequency_ranks), start=1):
+        kanji.append(
+            {
+                "jouyou_number": jouyou_number,
+                "kanji": character,
+                "kanji_section": rng.choice(("あ", "い")),
+                "radical": rng.choice(radicals),
+                "strokes": max(1, min(29, round(rng.gauss(10, 4)))),
+                "jlpt_level": rng.choice(("1", "2", "3", "4", "5")),
+                "frequency_rank": frequency_rank if rng.random() > 0.03 else None,
+                "onyomi": [_reading(rng, rng.randint(1, 3)) for _ in range(rng.randint(1, 2))],
+                "kunyomi": [_reading(rng, rng.randint(2, 4)) for _ in range(rng.randint(0, 3))] or [""],
+                "meaning": rng.sample(WORDS, rng.randint(1, 3)),
+            }
+        )
+    return kanji
+
+
+def generate_kanji_dicts(
+    seed: int = DEFAULT_SEED,
+    kanji_count: int = JOUYOU_KANJI_COUNT,
+    compound_word_count: int = COMPOUND_WORD_COUNT,
+    example_sentence_count: int = EXAMPLE_SENTENCE_COUNT,
+) -> List[dict]:
+    """
+    Generate kanji dicts as they are posted to or uploaded at /kanji-dictionaries. The same seed and counts
+    always give the same data.
+
+    :param seed: Seed of the random generator.
+    :param kanji_count: Number of kanji, at most 2500.
+    :param compound_word_count: Number of distinct compound words.
+    :param example_sentence_count: Number of distinct example sentences.
+    :return: Returns a list of kanji dict documents.
+    """
+    rng = Random(seed)
+    kanji = _kanji(rng, kanji_count)
+    characters = [item["kanji"] for item in kanji]
+    # Zipf-like weights by frequency rank, unranked kanji are the rarest.
+    cum_weights = list(accumulate((item["frequency_rank"] or 3000) ** -FREQUENCY_SKEW for item in kanji))
+    items_by_kanji: Dict[str, Dict[str, List[dict]]] = {
+        character: {"compound_words": [], "example_sentences": []} for character in characters
+    }
+
+    compound_words = set()
+    while len(compound_words) < compound_word_count:
+        length = rng.choices((1, 2, 3, 4), (5, 70, 15, 10))[0]
+        word_kanji = rng.choices(characters, cum_weights=cum_weights, k=length)
+        compound_word = "".join(word_kanji)
+        if compound_word in compound_words:
+            continue
+        compound_words.add(compound_word)
+
+        related_kanji = list(dict.fromkeys(word_kanji))
+        item = {
+            "compound_word": compound_word,
+            "hiragana": ",".join(_reading(rng, rng.randint(1, 3)) for _ in word_kanji),
+            "translation": " ".join(rng.sample(WORDS, rng.randint(1, 3))),
+            "rating": rng.choices((0, 1, 2, 3), (40, 30, 20, 10))[0],
+            "related_kanji": related_kanji,
+        }
+        for character in related_kanji:
+            items_by_kanji[character]["compound_words"].append(item)
+
+    example_sentences = set()
+    while len(example_sentences) < example_sentence_count:
+        parts = []
+        sentence_kanji = []
+        for _ in range(rng.randint(2, 6)):
+            word_kanji = rng.choices(characters, cum_weights=cum_weights, k=rng.randint(1, 2))
+            sentence_kanji.extend(word_kanji)
+            parts.append("".join(word_kanji) + _reading(rng, rng.randint(0, 2)) + rng.choice(PARTICLES))
+        example_sentence = "".join(parts) + rng.choice(ENDINGS)
+        if example_sentence in example_sentences:
+            continue
+        example_sentences.add(example_sentence)
+
+        related_kanji = list(dict.fromkeys(sentence_kanji))
+        item = {
+            "example_sentence": example_sentence,
+            "hiragana": _reading(rng, len(example_sentence)),
+            "translation": " ".join(rng.choices(WORDS, k=rng.randint(4, 10))),
+            "rating": rng.choices((0, 1, 2, 3), (40, 30, 20, 10))[0],
+            "related_kanji": related_kanji,
+        }
+        for character in related_kanji:
+            items_by_kanji[character]["example_sentences"].append(item)
+
+    return [dict(item, **items_by_kanji[item["kanji"]]) for item in kanji]
@@ -0,0 +1,342 @@
+"""
+Benchmark the kanji dictionary import, the kanji dictionary dump, model hydration and the list, filter and
+update endpoints on a generated jouyou-scale dataset.
+
+    python -m benchmarks.run --scale 0.1 --output benchmark.json
+
+The mongo backend drops and fills the --database database, don't point it at real data. The memory backend
+runs the same code on the in-memory storage engine, as a baseline without database latency. Results are
+written as JSON, one entry per benchmark, with latencies in milliseconds and database round trips counted
+by the mongo command monitor.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from statistics import mean
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+# The settings are read on import of the app.
+os.environ.setdefault("PROJECT_NAME", "kanji_benchmark")
+os.environ.setdefault("FIRST_SUPERUSER", "benchmark@example.com")
+os.environ.setdefault("FIRST_SUPERUSER_PASSWORD", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.datastructures import UploadFile  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from app import models  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db.command_monitoring import RequestDbStats, command_monitor, current_request_stats  # noqa: E402
+from app.db.memory_repository import InMemoryStorage  # noqa: E402
+from app.db.mongodb import db  # noqa: E402
+from app.db.repository import get_repository  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import kanji_dict_service  # noqa: E402
+from app.services.index_loader import load_in_memory_indexes  # noqa: E402
+from benchmarks.dataset import (  # noqa: E402
+    COMPOUND_WORD_COUNT,
+    DEFAULT_SEED,
+    EXAMPLE_SENTENCE_COUNT,
+    JOUYOU_KANJI_COUNT,
+    generate_kanji_dicts,
+)
+
+BACKENDS = ("mongo", "memory")
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+
+    def percentile(fraction: float) -> float:
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    return {
+        "runs": len(latencies),
+        "min_ms": round(latencies[0] * 1000, 3),
+        "p50_ms": round(percentile(0.5) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "mean_ms": round(mean(latencies) * 1000, 3),
+    }
+
+
+async def _timed(coroutine) -> Tuple[Any, float, RequestDbStats]:
+    stats = RequestDbStats()
+    token = current_request_stats.set(stats)
+    try:
+        start = time.perf_counter()
+        result = await coroutine
+        return result, time.perf_counter() - start, stats
+    finally:
+        current_request_stats.reset(token)
+
+
+async def asgi_request(
+    method: str, path: str, query_string: str = "", body: Optional[dict] = None
+) -> Tuple[int, bytes]:
+    """
+    Send a request straight to the ASGI app, so the whole middleware and endpoint stack is measured without
+    an HTTP client or server.
+    """
+    content = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": quote(query_string, safe="=&").encode(),
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    request_messages = [{"type": "http.request", "body": content, "more_body": False}]
+    response = {"status": 0, "body": b""}
+
+    async def receive():
+        if request_messages:
+            return request_messages.pop()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["body"]
+
+
+async def bench_import(kanji_dicts: List[dict]) -> Dict[str, Any]:
+    """
+    Import the dataset through the upload path: parse the JSON file, convert to KanjiDict models and run
+    import_kanji_dict_list.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".json", encoding="utf-8", delete=False) as dataset_file:
+        json.dump(kanji_dicts, dataset_file, ensure_ascii=False)
+
+    try:
+        upload_file = UploadFile("kanji_dicts.json", file=open(dataset_file.name, "rb"))
+        _, seconds, stats = await _timed(kanji_dict_service.process_file_upload(db.client, upload_file))
+    finally:
+        os.remove(dataset_file.name)
+
+    return {
+        "name": "import_kanji_dict_list",
+        "seconds": round(seconds, 3),
+        "kanji_per_second": round(len(kanji_dicts) / seconds, 1),
+        "round_trips": stats.round_trips,
+        "db_seconds": round(stats.db_time, 3),
+    }
+
+
+async def bench_get_kanji_dicts(repeat: int) -> Dict[str, Any]:
+    latencies = []
+    for _ in range(repeat):
+        kanji_dicts, seconds, stats = await _timed(kanji_dict_service.get_kanji_dicts(db.client))
+        latencies.append(seconds)
+
+    # A separate run, tracing allocations slows the call down.
+    tracemalloc.start()
+    await kanji_dict_service.get_kanji_dicts(db.client)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": "get_kanji_dicts",
+        "kanji_dicts": len(kanji_dicts),
+        "round_trips": stats.round_trips,
+        "peak_memory_mb": round(peak / 1024 / 1024, 1),
+        **_latency_summary(latencies),
+    }
+
+
+def _hydrate_validated(model, documents: List[dict]) -> list:
+    # The hydration of the services before RWModel.from_document.
+    results = []
+    for document in documents:
+        document = {key: value for key, value in document.items() if key != "doc_id"}
+        result = model(**document)
+        result.doc_id = document.get("_id")
+        results.append(result)
+    return results
+
+
+async def bench_hydration(repeat: int) -> List[Dict[str, Any]]:
+    """
+    Compare building models from all documents of a collection with validation and with from_document. The
+    documents are read once up front, so only the hydration is timed.
+    """
+    results = []
+    for collection, model in [
+        (settings.MONGO_KANJI_COLLECTION, models.KanjiInDb),
+        (settings.MONGO_COMPOUND_WORD_COLLECTION, models.CompoundWordInDb),
+        (settings.MONGO_EXAMPLE_SENTENCE_COLLECTION, models.ExampleSentenceInDb),
+    ]:
+        documents = [document async for document in get_repository(db.client, collection).find()]
+        for path, hydrate in [
+            ("validated", lambda: _hydrate_validated(model, documents)),
+            ("from_document", lambda: [model.from_document(document) for document in documents]),
+        ]:
+            latencies = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hydrate()
+                latencies.append(time.perf_counter() - start)
+            results.append(
+                {
+                    "name": f"hydrate_{collection}_{path}",
+                    "documents": len(documents),
+                    "round_trips": 0,
+                    **_latency_summary(latencies),
+                }
+            )
+    return results
+
+
+async def bench_endpoint(name: str, repeat: int, method: str, path: str, query_string="", body=None):
+    latencies = []
+    round_trips = []
+    for _ in range(repeat):
+        (status, content), seconds, stats = await _timed(asgi_request(method, path, query_string, body))
+        if status >= 400:
+            raise RuntimeError(f"{method} {path}?{query_string} returned {status}: {content[:200]}")
+        latencies.append(seconds)
+        round_trips.append(stats.round_trips)
+
+    return {
+        "name": name,
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "response_bytes": len(content),
+        "round_trips": max(round_trips),
+        **_latency_summary(latencies),
+    }
+
+
+async def bench_endpoints(kanji_dicts: List[dict], repeat: int) -> List[Dict[str, Any]]:
+    api = settings.API_V1_STR
+    by_frequency = sorted(kanji_dicts, key=lambda item: item["frequency_rank"] or 3000)
+    frequent = by_frequency[0]["kanji"]
+    common = by_frequency[len(by_frequency) // 2]["kanji"]
+    rare = by_frequency[-1]["kanji"]
+
+    _, content = await asgi_request("GET", f"{api}/kanjis/", "limit=1")
+    kanji_id = json.loads(content)[0]["doc_id"]
+    _, content = await asgi_request("GET", f"{api}/compound-words/", f"related_kanji={common}&limit=1")
+    compound_word_id = json.loads(content)[0]["doc_id"]
+    _, content = await asgi_request("GET", f"{api}/example-sentences/", f"related_kanji={common}&limit=1")
+    example_sentence_id = json.loads(content)[0]["doc_id"]
+
+    cases = [
+        ("list_kanji", "GET", f"{api}/kanjis/", "offset=0&limit=100", None),
+        ("list_all_kanji", "GET", f"{api}/kanjis/", "limit=0", None),
+        ("get_kanji", "GET", f"{api}/kanjis/{kanji_id}", "", None),
+        ("list_compound_words", "GET", f"{api}/compound-words/", "limit=100", None),
+        ("filter_frequent_kanji", "GET", f"{api}/compound-words/", f"related_kanji={frequent}", None),
+        ("filter_rare_kanji", "GET", f"{api}/compound-words/", f"related_kanji={rare}", None),
+        (
+            "filter_example_sentences_kanji_and_ratings",
+            "GET",
+            f"{api}/example-sentences/",
+            f"related_kanji={common}&related_kanji={rare}&ratings=2&ratings=3",
+            None,
+        ),
+        ("update_kanji", "PUT", f"{api}/kanjis/{kanji_id}", "", {"meaning": ["benchmark"]}),
+        ("update_compound_word", "PUT", f"{api}/compound-words/{compound_word_id}", "", {"rating": 3}),
+        ("update_sentence", "PUT", f"{api}/example-sentences/{example_sentence_id}", "", {"rating": 3}),
+    ]
+
+    return [await bench_endpoint(name, repeat, *case) for name, *case in cases]
+
+
+async def run(args) -> Dict[str, Any]:
+    if args.backend == "memory":
+        db.client = InMemoryStorage()
+    else:
+        settings.MONGO_DB = args.database
+        db.client = AsyncIOMotorClient(args.mongo_url, event_listeners=[command_monitor])
+        await db.client.drop_database(args.database)
+
+    counts = {
+        "kanji": min(JOUYOU_KANJI_COUNT, max(1, round(JOUYOU_KANJI_COUNT * args.scale))),
+        "compound_words": round(COMPOUND_WORD_COUNT * args.scale),
+        "example_sentences": round(EXAMPLE_SENTENCE_COUNT * args.scale),
+    }
+    print(f"Generating dataset {counts}...", file=sys.stderr)
+    kanji_dicts = generate_kanji_dicts(args.seed, *counts.values())
+
+    results = []
+    try:
+        print("Importing...", file=sys.stderr)
+        results.append(await bench_import(kanji_dicts))
+        await load_in_memory_indexes()
+
+        print("Dumping kanji dicts...", file=sys.stderr)
+        results.append(await bench_get_kanji_dicts(max(1, args.repeat // 10)))
+
+        print("Hydrating models...", file=sys.stderr)
+        results.extend(await bench_hydration(max(1, args.repeat // 10)))
+
+        print("Requesting endpoints...", file=sys.stderr)
+        results.extend(await bench_endpoints(kanji_dicts, args.repeat))
+    finally:
+        if args.backend == "mongo" and not args.keep:
+            await db.client.drop_database(args.database)
+        db.client.close()
+
+    return {
+        "meta": {
+            "backend": args.backend,
+            "seed": args.seed,
+            "scale": args.scale,
+            "counts": counts,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        },
+        "benchmarks": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the kanji dictionary API on a generated dataset.")
+    parser.add_argument("--backend", choices=BACKENDS, default="mongo")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="kanji_benchmark", help="Dropped before and after the run.")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database after the run.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--scale", type=float, default=1.0, help="Fraction of the full dataset size.")
+    parser.add_argument("--repeat", type=int, default=50, help="Requests per endpoint benchmark.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    for result in results["benchmarks"]:
+        timing = f"p50 {result['p50_ms']} ms" if "p50_ms" in result else f"{result['seconds']} s"
+        print(f"{result['name']:<45} {timing:>16} {result['round_trips']:>8} round trips", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
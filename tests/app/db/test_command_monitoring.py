@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from app.db.command_monitoring import CommandMonitor, RequestDbStats, current_request_stats, query_shape
+
+
+def test_query_shape_keeps_fields_and_operators():
+    query = {"related_kanji": {"$in": ["日", "本"]}, "rating": 3, "$or": []}
+
+    assert query_shape(query) == {"related_kanji": {"$in": ["str"]}, "rating": "int", "$or": []}
+
+
+def test_commands_are_counted_for_the_current_request():
+    monitor = CommandMonitor()
+    stats = RequestDbStats()
+    token = current_request_stats.set(stats)
+    try:
+        for request_id in range(3):
+            event = SimpleNamespace(
+                request_id=request_id,
+                connection_id=("localhost", 27017),
+                command_name="find",
+                command={"find": "kanji", "filter": {"kanji": "日"}},
+                database_name="kanji",
+                duration_micros=1500,
+            )
+            monitor.started(event)
+            monitor.succeeded(event)
+    finally:
+        current_request_stats.reset(token)
+
+    assert stats.round_trips == 3
+    assert abs(stats.db_time - 0.0045) < 1e-9
+    assert not monitor._pending
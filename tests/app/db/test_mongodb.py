@@ -0,0 +1,23 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from app.db.mongodb import ReadRoutedClient, make_read_preference
+
+
+def test_make_read_preference():
+    assert make_read_preference("primary") == Primary()
+    assert make_read_preference("secondaryPreferred", 120) == SecondaryPreferred(max_staleness=120)
+    assert make_read_preference("secondaryPreferred").max_staleness == -1
+
+
+def test_read_routed_client_databases_use_route_group_settings():
+    client = AsyncIOMotorClient("mongodb://localhost:27017", connect=False)
+    read_client = ReadRoutedClient(client, SecondaryPreferred(max_staleness=90), ReadConcern("majority"))
+
+    collection = read_client["common_kanji"]["kanji"]
+
+    assert collection.read_preference == SecondaryPreferred(max_staleness=90)
+    assert collection.read_concern == ReadConcern("majority")
+    assert read_client["common_kanji"] is read_client["common_kanji"]
+    assert client["common_kanji"].read_preference == Primary()
@@ -0,0 +1,211 @@
+"""
+Contract tests that every Repository implementation must pass.
+
+The Motor implementation runs against a real server when MONGO_TEST_URL is set, e.g.
+MONGO_TEST_URL=mongodb://localhost:27017, and is skipped otherwise.
+"""
+import os
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from app.db.memory_repository import InMemoryRepository
+from app.db.repository import MotorRepository
+
+TEST_DATABASE = "kanji_contract_test"
+
+
+@pytest.fixture(params=["memory", "motor"])
+def repository(request):
+    if request.param == "memory":
+        yield InMemoryRepository(("compound_word", "related_kanji", "rating"))
+        return
+
+    url = os.environ.get("MONGO_TEST_URL")
+    if not url:
+        pytest.skip("Set MONGO_TEST_URL to run the contract tests against mongo.")
+
+    collection_name = f"compound_word_{uuid4().hex}"
+    yield MotorRepository(AsyncIOMotorClient(url)[TEST_DATABASE][collection_name])
+    MongoClient(url)[TEST_DATABASE].drop_collection(collection_name)
+
+
+def compound_word(word, related_kanji, rating=0):
+    return {
+        "compound_word": word,
+        "hiragana": "",
+        "translation": "",
+        "rating": rating,
+        "related_kanji": related_kanji,
+    }
+
+
+async def insert_all(repository, *documents):
+    return [await repository.insert_one(document) for document in documents]
+
+
+async def find_words(repository, **kwargs):
+    return [result["compound_word"] async for result in repository.find(**kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_insert_and_find_by_id(repository):
+    document = compound_word("亜鉛", ["亜", "鉛"])
+
+    doc_id = await repository.insert_one(document)
+
+    assert isinstance(doc_id, ObjectId)
+    assert "_id" not in document
+    result = await repository.find_one_by_id(str(doc_id))
+    assert result["_id"] == doc_id
+    assert result["related_kanji"] == ["亜", "鉛"]
+    assert await repository.find_one_by_id(ObjectId()) is None
+    assert await repository.exists(str(doc_id))
+    result["related_kanji"].append("日")
+    assert (await repository.find_one_by_id(doc_id))["related_kanji"] == ["亜", "鉛"]
+    assert not await repository.exists(ObjectId())
+
+
+@pytest.mark.asyncio
+async def test_find_one_by_natural_key(repository):
+    await insert_all(repository, compound_word("亜鉛", ["亜", "鉛"]), compound_word("亜流", ["亜", "流"]))
+
+    assert (await repository.find_one_by("compound_word", "亜流"))["related_kanji"] == ["亜", "流"]
+    assert await repository.find_one_by("compound_word", "日本") is None
+
+
+@pytest.mark.asyncio
+async def test_find_filters_in_insertion_order(repository):
+    await insert_all(
+        repository,
+        compound_word("亜鉛", ["亜", "鉛"], rating=1),
+        compound_word("日本", ["日", "本"], rating=2),
+        compound_word("亜流", ["亜", "流"], rating=2),
+        compound_word("本日", ["本", "日"], rating=3),
+    )
+
+    assert await find_words(repository) == ["亜鉛", "日本", "亜流", "本日"]
+    assert await find_words(repository, where={"related_kanji": ["亜", "日"]}) == ["亜鉛", "日本", "亜流", "本日"]
+    assert await find_words(repository, where={"related_kanji": ["亜"], "rating": [2, 3]}) == ["亜流"]
+    assert await find_words(repository, where={"rating": [2]}, offset=1) == ["亜流"]
+    assert await find_words(repository, offset=1, limit=2) == ["日本", "亜流"]
+    assert await find_words(repository, where={"related_kanji": ["火"]}) == []
+
+
+@pytest.mark.asyncio
+async def test_find_fields(repository):
+    doc_id = await repository.insert_one(compound_word("亜鉛", ["亜", "鉛"], rating=1))
+
+    results = [result async for result in repository.find(fields=["rating"])]
+
+    assert results == [{"_id": doc_id, "rating": 1}]
+
+
+@pytest.mark.asyncio
+async def test_find_by_ids_and_ids_by(repository):
+    first, second = await insert_all(repository, compound_word("亜鉛", ["亜"]), compound_word("亜鉛", ["鉛"]))
+    await repository.insert_one(compound_word("日本", ["日"]))
+
+    results = await repository.find_by_ids([str(second), first, ObjectId()])
+
+    assert sorted(result["_id"] for result in results) == sorted([first, second])
+    assert sorted(await repository.find_ids_by("compound_word", "亜鉛")) == sorted([first, second])
+
+
+@pytest.mark.asyncio
+async def test_count_by(repository):
+    await insert_all(
+        repository,
+        compound_word("亜鉛", ["亜", "鉛"], rating=1),
+        compound_word("亜流", ["亜", "流"], rating=2),
+        compound_word("日本", ["日", "本"], rating=2),
+    )
+
+    assert await repository.count_by("rating") == {1: 1, 2: 2}
+    assert await repository.count_by("rating", {"related_kanji": ["亜"]}) == {1: 1, 2: 1}
+
+
+@pytest.mark.asyncio
+async def test_replace_keeps_position_and_updates_indexes(repository):
+    first, _ = await insert_all(repository, compound_word("亜鉛", ["亜", "鉛"]), compound_word("日本", ["日", "本"]))
+
+    await repository.replace_one(first, compound_word("亜鉛", ["鉛"], rating=3))
+
+    assert await find_words(repository) == ["亜鉛", "日本"]
+    assert await find_words(repository, where={"related_kanji": ["亜"]}) == []
+    assert await find_words(repository, where={"rating": [3]}) == ["亜鉛"]
+
+
+@pytest.mark.asyncio
+async def test_update_fields_updates_indexes(repository):
+    first, second = await insert_all(repository, compound_word("亜鉛", ["亜"]), compound_word("日本", ["日"]))
+
+    await repository.update_fields(
+        {first: {"rating": 3}, str(second): {"rating": 2}, ObjectId(): {"rating": 1}}
+    )
+
+    assert (await repository.find_one_by_id(first))["rating"] == 3
+    assert (await repository.find_one_by_id(second))["related_kanji"] == ["日"]
+    assert await find_words(repository, where={"rating": [3]}) == ["亜鉛"]
+    assert await find_words(repository, where={"rating": [0]}) == []
+    assert await repository.count_by("rating") == {3: 1, 2: 1}
+
+
+@pytest.mark.asyncio
+async def test_delete_and_drop(repository):
+    first, second = await insert_all(repository, compound_word("亜鉛", ["亜"]), compound_word("日本", ["日"]))
+
+    await repository.delete_by_ids([first])
+
+    assert await repository.find_one_by_id(first) is None
+    assert await find_words(repository, where={"related_kanji": ["亜"]}) == []
+    assert await find_words(repository) == ["日本"]
+
+    await repository.drop()
+
+    assert await find_words(repository) == []
+
+
+@pytest.mark.asyncio
+async def test_find_after_in_field_order(repository):
+    for word, updated_at in [("亜鉛", datetime(2024, 1, 3)), ("日本", datetime(2024, 1, 1)), ("亜流", None)]:
+        document = compound_word(word, [])
+        if updated_at:
+            document["updated_at"] = updated_at
+        await repository.insert_one(document)
+    await repository.insert_one({**compound_word("本日", []), "updated_at": datetime(2024, 1, 2)})
+
+    results = repository.find_after("updated_at", datetime(2024, 1, 1))
+    assert [result["compound_word"] async for result in results] == ["本日", "亜鉛"]
+
+
+@pytest.mark.asyncio
+async def test_results_are_copies(repository):
+    doc_id = await repository.insert_one(compound_word("亜鉛", ["亜", "鉛"]))
+
+    result = await repository.find_one_by_id(doc_id)
+    del result["compound_word"]
+    result["related_kanji"] = []
+
+    assert (await repository.find_one_by_id(doc_id))["compound_word"] == "亜鉛"
+    assert await find_words(repository, where={"related_kanji": ["亜"]}) == ["亜鉛"]
+
+
+@pytest.mark.asyncio
+async def test_count(repository):
+    await insert_all(
+        repository,
+        compound_word("亜鉛", ["亜", "鉛"], rating=1),
+        compound_word("亜流", ["亜", "流"], rating=2),
+        compound_word("日本", ["日", "本"], rating=1),
+    )
+
+    assert await repository.count() == 3
+    assert await repository.estimated_count() == 3
+    assert await repository.count({"related_kanji": ["亜"]}) == 2
+    assert await repository.count({"related_kanji": ["亜"], "rating": [1]}) == 1
+    assert await repository.count({"hiragana": ["x"]}) == 0
@@ -0,0 +1,89 @@
+import pytest
+from bson import ObjectId
+
+from app.core.config import settings
+from app.db.memory_repository import InMemoryStorage
+from app.db.repository import ReadOnlyStorageError
+from app.db.snapshot import SnapshotStorage, export_snapshot
+
+
+def compound_word(word, related_kanji, rating=0):
+    return {
+        "compound_word": word,
+        "hiragana": "",
+        "translation": "",
+        "rating": rating,
+        "related_kanji": related_kanji,
+    }
+
+
+async def export_and_open(tmp_path):
+    source = InMemoryStorage()
+    compound_words = source.repository(settings.MONGO_COMPOUND_WORD_COLLECTION)
+    for document in [
+        compound_word("亜鉛", ["亜", "鉛"], rating=1),
+        compound_word("日本", ["日", "本"], rating=2),
+        compound_word("亜流", ["亜", "流"], rating=2),
+        compound_word("本日", ["本", "日"], rating=3),
+    ]:
+        await compound_words.insert_one(document)
+    await source.repository(settings.MONGO_KANJI_COLLECTION).insert_one({"kanji": "亜", "meaning": ["Asia"]})
+
+    path = str(tmp_path / "snapshot.sqlite")
+    counts = await export_snapshot(source, path)
+    assert counts == {
+        settings.MONGO_KANJI_COLLECTION: 1,
+        settings.MONGO_COMPOUND_WORD_COLLECTION: 4,
+        settings.MONGO_EXAMPLE_SENTENCE_COLLECTION: 0,
+        settings.MONGO_TOMBSTONE_COLLECTION: 0,
+    }
+
+    return source, SnapshotStorage(path)
+
+
+async def find_words(repository, **kwargs):
+    return [result["compound_word"] async for result in repository.find(**kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_reads_like_the_source(tmp_path):
+    source, storage = await export_and_open(tmp_path)
+    expected = source.repository(settings.MONGO_COMPOUND_WORD_COLLECTION)
+    repository = storage.repository(settings.MONGO_COMPOUND_WORD_COLLECTION)
+
+    for kwargs in [
+        {},
+        {"where": {"related_kanji": ["亜", "日"]}},
+        {"where": {"related_kanji": ["亜"], "rating": [2, 3]}},
+        {"where": {"rating": [2]}, "offset": 1},
+        {"where": {"hiragana": [""]}, "offset": 1, "limit": 2},
+        {"offset": 1, "limit": 2},
+    ]:
+        assert await find_words(repository, **kwargs) == await find_words(expected, **kwargs)
+
+    document = await repository.find_one_by("compound_word", "亜流")
+    assert document == await expected.find_one_by_id(document["_id"])
+    assert await repository.find_one_by_id(document["_id"]) == document
+    assert await repository.find_one_by_id(ObjectId()) is None
+    assert await repository.exists(document["_id"]) and not await repository.exists(ObjectId())
+    results = await repository.find_by_ids([str(document["_id"])])
+    assert [result["_id"] for result in results] == [document["_id"]]
+    assert await repository.count_by("rating", {"related_kanji": ["亜"]}) == {1: 1, 2: 1}
+    assert [result async for result in repository.find(fields=["rating"], limit=1)] == [
+        {"_id": (await repository.find_one_by("compound_word", "亜鉛"))["_id"], "rating": 1}
+    ]
+    kanji = await storage.repository(settings.MONGO_KANJI_COLLECTION).find_one_by("kanji", "亜")
+    assert kanji["meaning"] == ["Asia"]
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_read_only(tmp_path):
+    _, storage = await export_and_open(tmp_path)
+    repository = storage.repository(settings.MONGO_COMPOUND_WORD_COLLECTION)
+
+    with pytest.raises(ReadOnlyStorageError):
+        await repository.insert_one(compound_word("火山", ["火", "山"]))
+    with pytest.raises(ReadOnlyStorageError):
+        await repository.drop()
+    storage.close()
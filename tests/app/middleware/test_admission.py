@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.middleware.admission import AdmissionGate, QueueFullError, route_group
+
+
+def test_route_groups():
+    api = settings.API_V1_STR
+    assert route_group("POST", f"{api}/kanji-dictionaries/upload/") == "imports"
+    assert route_group("GET", f"{api}/kanji-dictionaries/") == "dictionary"
+    assert route_group("GET", f"{api}/compound-words/export/") == "dictionary"
+    assert route_group("GET", f"{api}/kanjis/5f0c5e3f9d1e4a6b8c7d2e1f") == "reads"
+    assert route_group("POST", f"{api}/text-annotations/") == "reads"
+    assert route_group("PUT", f"{api}/kanjis/5f0c5e3f9d1e4a6b8c7d2e1f") == "writes"
+    assert route_group("GET", "/metrics") is None
+
+
+@pytest.mark.asyncio
+async def test_gate_queues_in_order_and_rejects_when_full():
+    gate = AdmissionGate("imports", concurrency=1, queue_depth=2)
+    assert await gate.acquire() == 0
+
+    order = []
+
+    async def request(name):
+        await gate.acquire()
+        order.append(name)
+        gate.release()
+
+    waiting = [asyncio.ensure_future(request(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    assert gate.queued == 2
+
+    with pytest.raises(QueueFullError):
+        await gate.acquire()
+
+    gate.release()
+    await asyncio.gather(*waiting)
+    assert order == ["first", "second"]
+    assert gate.active == 0
+
+
+@pytest.mark.asyncio
+async def test_gate_times_out_without_losing_the_slot():
+    gate = AdmissionGate("writes", concurrency=1, queue_depth=1)
+    await gate.acquire()
+
+    with pytest.raises(QueueFullError):
+        await gate.acquire(timeout=0.01)
+    assert gate.queued == 0
+
+    gate.release()
+    assert gate.active == 0
+    assert await gate.acquire() == 0
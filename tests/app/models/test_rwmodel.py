@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app import models
+
+
+def test_from_document_matches_validated_model():
+    doc_id = ObjectId()
+    document = {
+        "_id": doc_id,
+        "doc_id": str(doc_id),
+        "compound_word": "亜鉛",
+        "hiragana": "あ,えん",
+        "translation": "zinc",
+        "related_kanji": ["亜", "鉛"],
+        "updated_at": datetime(2024, 1, 1),
+    }
+
+    model = models.CompoundWordInDb.from_document(document)
+
+    validated = models.CompoundWordInDb(**{key: value for key, value in document.items() if key != "doc_id"})
+    validated.doc_id = doc_id
+    assert model.doc_id == doc_id
+    assert model.dict() == validated.dict()
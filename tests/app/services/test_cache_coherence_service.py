@@ -0,0 +1,140 @@
+import pytest
+from pymongo.errors import PyMongoError
+
+from app.services import cache_coherence_service
+from app.services.cache_coherence_service import ChangeFollower, latest_changes, rating_changes
+
+
+def entry(seq, collection="kanji", doc_id="", op="write"):
+    return {"_id": seq, "collection": collection, "doc_id": doc_id, "op": op}
+
+
+def test_follower_accepts_entries_in_sequence():
+    follower = ChangeFollower(3)
+
+    accepted, lost = follower.accept([entry(4), entry(5)], now=0.0)
+
+    assert [item["_id"] for item in accepted] == [4, 5]
+    assert not lost
+    assert follower.last_seen == 5
+
+
+def test_follower_waits_for_missing_entries():
+    follower = ChangeFollower(3, gap_grace=10.0)
+
+    accepted, lost = follower.accept([entry(4), entry(6)], now=0.0)
+    assert [item["_id"] for item in accepted] == [4]
+    assert follower.last_seen == 4
+
+    # The missing entry was inserted in the meantime.
+    accepted, lost = follower.accept([entry(5), entry(6)], now=5.0)
+    assert [item["_id"] for item in accepted] == [5, 6]
+    assert not lost
+
+
+def test_follower_gives_up_on_missing_entries_after_the_grace_period():
+    follower = ChangeFollower(3, gap_grace=10.0)
+
+    assert follower.accept([entry(5)], now=0.0) == ([], False)
+    accepted, lost = follower.accept([entry(5), entry(6)], now=10.0)
+
+    assert [item["_id"] for item in accepted] == [5, 6]
+    assert lost
+    assert follower.last_seen == 6
+
+
+def test_follower_gives_up_on_missing_entries_after_the_last_entry():
+    follower = ChangeFollower(3, gap_grace=10.0)
+
+    assert follower.accept([entry(4)], now=0.0, version=5) == ([entry(4)], False)
+    assert follower.accept([], now=5.0, version=5) == ([], False)
+    assert follower.last_seen == 4
+
+    assert follower.accept([], now=10.0, version=5) == ([], True)
+    assert follower.last_seen == 5
+
+
+class FakeChangeLog:
+    def __init__(self):
+        self.seq = 0
+        self.entries = {}
+        self.fail_inserts = 0
+
+    async def find_one_and_update(self, query, update, upsert, return_document):
+        self.seq += update["$inc"]["seq"]
+        return {"_id": query["_id"], "seq": self.seq}
+
+    async def insert_many(self, entries, ordered):
+        if self.fail_inserts:
+            self.fail_inserts -= 1
+            raise PyMongoError("insert failed")
+        self.entries.update((entry["_id"], entry) for entry in entries)
+
+
+@pytest.fixture
+def change_log(monkeypatch):
+    change_log = FakeChangeLog()
+    monkeypatch.setattr(cache_coherence_service, "_change_log", lambda connection: change_log)
+    monkeypatch.setattr(cache_coherence_service, "_pending", [])
+    monkeypatch.setattr(cache_coherence_service, "_unwritten", [])
+    return change_log
+
+
+@pytest.mark.asyncio
+async def test_publish_pending_retries_entries_that_failed_to_be_inserted(change_log):
+    cache_coherence_service._pending.append(("kanji", "k1", "write"))
+    change_log.fail_inserts = 1
+
+    with pytest.raises(PyMongoError):
+        await cache_coherence_service.publish_pending(None)
+    assert change_log.seq == 1
+    assert not change_log.entries
+
+    cache_coherence_service._pending.append(("kanji", "k2", "write"))
+    await cache_coherence_service.publish_pending(None)
+
+    written = sorted(change_log.entries.items())
+    assert [(seq, entry["doc_id"]) for seq, entry in written] == [(1, "k1"), (2, "k2")]
+    assert not cache_coherence_service._pending
+    assert not cache_coherence_service._unwritten
+
+
+@pytest.mark.asyncio
+async def test_publish_pending_keeps_the_changes_when_the_version_update_fails(change_log):
+    async def fail(*args, **kwargs):
+        raise PyMongoError("update failed")
+
+    change_log.find_one_and_update = fail
+    cache_coherence_service._pending.append(("kanji", "k1", "write"))
+
+    with pytest.raises(PyMongoError):
+        await cache_coherence_service.publish_pending(None)
+    assert cache_coherence_service._pending == [("kanji", "k1", "write")]
+
+
+def test_latest_changes_deduplicates_and_handles_drops():
+    entries = [
+        entry(1, "kanji", "k1"),
+        entry(2, "kanji_compound_word", "c1"),
+        entry(3, "kanji", "k1", "delete"),
+        entry(4, "kanji", "k2"),
+        entry(5, "kanji_compound_word", op="drop"),
+        entry(6, "kanji_compound_word", "c2"),
+    ]
+
+    assert latest_changes(entries) == [
+        ("kanji", ["k1", "k2"]),
+        ("kanji_compound_word", None),
+        ("kanji_compound_word", ["c2"]),
+    ]
+
+
+def test_rating_changes_deduplicates_per_collection():
+    entries = [
+        entry(1, "kanji_compound_word", "c1", "rating"),
+        entry(2, "kanji_compound_word", "c2"),
+        entry(3, "kanji_example_sentence", "e1", "rating"),
+        entry(4, "kanji_compound_word", "c1", "rating"),
+    ]
+
+    assert rating_changes(entries) == {"kanji_compound_word": ["c1"], "kanji_example_sentence": ["e1"]}
@@ -0,0 +1,33 @@
+from app.services.cooccurrence_service import CooccurrenceGraph
+
+COMPOUND_WORDS, EXAMPLE_SENTENCES = "compound_word", "example_sentence"
+
+
+def test_neighbors_follow_upserts():
+    graph = CooccurrenceGraph()
+    graph.upsert(COMPOUND_WORDS, "c1", ["日", "本"])
+    graph.upsert(COMPOUND_WORDS, "c2", ["日", "曜"])
+    graph.upsert(EXAMPLE_SENTENCES, "e1", ["日", "本", "語", "本"])
+
+    assert graph.neighbors("日", 10) == [("本", 2), ("曜", 1), ("語", 1)]
+    assert graph.neighbors("日", 1) == [("本", 2)]
+    assert graph.neighbors("語", 10) == [("日", 1), ("本", 1)]
+
+    graph.upsert(EXAMPLE_SENTENCES, "e1", ["日", "曜"])
+    assert graph.neighbors("日", 10) == [("曜", 2), ("本", 1)]
+    assert graph.neighbors("語", 10) == []
+
+    graph.upsert(COMPOUND_WORDS, "c2", None)
+    assert graph.neighbors("曜", 10) == [("日", 1)]
+
+
+def test_clear_removes_only_the_collection():
+    graph = CooccurrenceGraph()
+    graph.upsert(COMPOUND_WORDS, "c1", ["日", "本"])
+    graph.upsert(EXAMPLE_SENTENCES, "e1", ["日", "本"])
+    graph.upsert(EXAMPLE_SENTENCES, "e2", ["日"])
+
+    graph.clear(COMPOUND_WORDS)
+
+    assert graph.neighbors("本", 10) == [("日", 1)]
+    assert len(graph) == 2
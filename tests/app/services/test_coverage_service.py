@@ -0,0 +1,57 @@
+from app import models
+from app.core.config import settings
+from app.services.coverage_service import CoverageIndex
+from app.services.facet_service import ItemFacetCounters
+
+COMPOUND_WORDS = settings.MONGO_COMPOUND_WORD_COLLECTION
+EXAMPLE_SENTENCES = settings.MONGO_EXAMPLE_SENTENCE_COLLECTION
+
+
+def coverage_index():
+    item_counters = {COMPOUND_WORDS: ItemFacetCounters(), EXAMPLE_SENTENCES: ItemFacetCounters()}
+    coverage = CoverageIndex(item_counters)
+    coverage.upsert_kanji("k1", "日", 1, "N5")
+    coverage.upsert_kanji("k2", "本", 2, "N5")
+    coverage.upsert_kanji("k3", "曜", 3, "N4")
+    item_counters[COMPOUND_WORDS].upsert("c1", True, 1, ["日", "本"])
+    item_counters[COMPOUND_WORDS].upsert("c2", True, 2, ["日", "曜"])
+    item_counters[EXAMPLE_SENTENCES].upsert("e1", True, 3, ["日"])
+    return coverage, item_counters
+
+
+def test_counts_per_kanji_and_rating():
+    coverage, _ = coverage_index()
+    stats = coverage.stats(models.CoverageFilterParams())
+
+    assert stats.total == 3
+    assert [(item.kanji, item.compound_words, item.example_sentences) for item in stats.kanji] == [
+        ("日", 2, 1),
+        ("本", 1, 0),
+        ("曜", 1, 0),
+    ]
+    assert stats.kanji[0].compound_word_ratings == {1: 1, 2: 1}
+    assert stats.jlpt_levels["N5"] == models.JlptCoverage(
+        kanji=2, with_compound_words=2, with_example_sentences=1
+    )
+    assert stats.compound_word_ratings == {1: 1, 2: 1}
+    assert stats.example_sentence_ratings == {3: 1}
+
+
+def test_ranges_sorting_and_updates():
+    coverage, item_counters = coverage_index()
+    filters = models.CoverageFilterParams(
+        max_example_sentences=0, sort=models.CoverageSortEnum.compound_words, descending=True, limit=1
+    )
+
+    stats = coverage.stats(filters)
+    assert stats.total == 2
+    assert [item.kanji for item in stats.kanji] == ["本"]
+
+    item_counters[COMPOUND_WORDS].upsert("c2", True, 2, ["日"])
+    item_counters[EXAMPLE_SENTENCES].upsert("e2", True, 0, ["本"])
+    stats = coverage.stats(models.CoverageFilterParams(jlpt_levels=["N4"], max_compound_words=0))
+    assert [item.kanji for item in stats.kanji] == ["曜"]
+    assert coverage.stats(filters).total == 1
+
+    item_counters[COMPOUND_WORDS].clear()
+    assert coverage.stats(models.CoverageFilterParams(min_compound_words=1)).total == 0
@@ -0,0 +1,85 @@
+from bson import ObjectId
+
+from app import models
+from app.services.dataset_service import ItemTable, KanjiTable, StringPool
+
+
+def compound_word(word, related_kanji, rating=0, hiragana="", translation=""):
+    return {
+        "compound_word": word,
+        "hiragana": hiragana,
+        "translation": translation,
+        "rating": rating,
+        "related_kanji": related_kanji,
+    }
+
+
+def words(items):
+    return [item.compound_word for item in items]
+
+
+def test_item_table_filters_in_insertion_order():
+    table = ItemTable(StringPool(), "compound_word", models.CompoundWordInDb)
+    first, second, third = ObjectId(), ObjectId(), ObjectId()
+    table.upsert(first, compound_word("亜鉛", ["亜", "鉛"], rating=1))
+    table.upsert(second, compound_word("日本", ["日", "本"], rating=2))
+    table.upsert(third, compound_word("亜流", ["亜", "流"], rating=2))
+
+    assert words(table.find([], [])) == ["亜鉛", "日本", "亜流"]
+    assert words(table.find(["流", "亜"], [])) == ["亜鉛", "亜流"]
+    assert words(table.find(["亜"], [2])) == ["亜流"]
+    assert words(table.find([], [], offset=1, limit=1)) == ["日本"]
+    assert words(table.find(["火"], [])) == []
+
+    result = table.find(["日"], [])[0]
+    assert result.doc_id == second
+    assert result.related_kanji == ["日", "本"]
+
+
+def test_item_table_follows_upserts():
+    table = ItemTable(StringPool(), "compound_word", models.CompoundWordInDb)
+    first, second = ObjectId(), ObjectId()
+    table.upsert(first, compound_word("亜鉛", ["亜", "鉛"]))
+    table.upsert(second, models.CompoundWordInDb(**compound_word("日本", ["日", "本"])))
+
+    table.upsert(first, compound_word("亜鉛", ["鉛"], rating=3))
+
+    assert words(table.find([], [])) == ["亜鉛", "日本"]
+    assert words(table.find(["亜"], [])) == []
+    assert words(table.find([], [3])) == ["亜鉛"]
+
+    table.upsert(first, None)
+
+    assert len(table) == 1
+    assert words(table.find(["鉛"], [])) == []
+
+
+def test_strings_are_interned_and_memory_is_tracked():
+    pool = StringPool()
+    table = ItemTable(pool, "compound_word", models.CompoundWordInDb)
+    first, second = ObjectId(), ObjectId()
+    table.upsert(first, compound_word("亜鉛", ["亜"], hiragana="".join(["あ", "えん"])))
+    table.upsert(second, compound_word("亜鉛華", ["亜"], hiragana="".join(["あ", "えん"])))
+
+    first_record, second_record = table._records[first], table._records[second]
+    assert first_record.hiragana is second_record.hiragana
+    assert list(first_record.related_kanji) == [pool.known_kanji_id("亜")]
+
+    memory_bytes = table.memory_bytes
+    table.upsert(second, None)
+    assert 0 < table.memory_bytes < memory_bytes
+
+
+def test_kanji_table():
+    table = KanjiTable(StringPool())
+    doc_id = ObjectId()
+    table.upsert(doc_id, {"kanji": "亜", "jouyou_number": 1, "kanji_section": "あ", "onyomi": ["ア"]})
+    table.upsert(ObjectId(), {"kanji": "哀", "jouyou_number": 2, "meaning": ["sorrow"]})
+
+    kanji = table.find(limit=1)
+
+    assert [item.kanji for item in kanji] == ["亜"]
+    assert kanji[0].doc_id == doc_id
+    assert kanji[0].kanji_section == models.kanji.KanjiSectionEnum.a
+    assert kanji[0].onyomi == ["ア"]
+    assert [item.kanji for item in table.find(offset=1)] == ["哀"]
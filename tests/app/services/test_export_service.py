@@ -0,0 +1,91 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.db.memory_repository import InMemoryStorage
+from app.services.export_service import accepts_gzip, export_items
+
+COLLECTION = settings.MONGO_COMPOUND_WORD_COLLECTION
+
+
+async def storage_with_compound_words():
+    storage = InMemoryStorage()
+    repository = storage.repository(COLLECTION)
+    for word, hiragana, translation, rating, related_kanji in [
+        ("亜鉛", "あ,えん", "zinc", 1, ["亜", "鉛"]),
+        ("日本", "に,ほん", "Japan,\tnation", 2, ["日", "本"]),
+        ("亜流", "あ,りゅう", "imitator", 2, ["亜", "流"]),
+    ]:
+        await repository.insert_one(
+            {
+                "compound_word": word,
+                "hiragana": hiragana,
+                "translation": translation,
+                "rating": rating,
+                "related_kanji": related_kanji,
+            }
+        )
+    return storage
+
+
+async def export(storage, export_format, compress=False, **filters):
+    filters = models.CompoundWordFilterParams(**filters)
+    chunks = export_items(storage, COLLECTION, "compound_word", filters, export_format, compress)
+    content = b"".join([chunk async for chunk in chunks])
+    return (gzip.decompress(content) if compress else content).decode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_with_filters():
+    storage = await storage_with_compound_words()
+
+    content = await export(storage, models.ExportFormatEnum.ndjson, related_kanji=["亜"], ratings=[2])
+
+    items = [json.loads(line) for line in content.splitlines()]
+    assert [item["compound_word"] for item in items] == ["亜流"]
+    assert items[0]["related_kanji"] == ["亜", "流"]
+    assert set(items[0]) == {"doc_id", "compound_word", "hiragana", "translation", "rating", "related_kanji"}
+
+
+@pytest.mark.asyncio
+async def test_export_csv_gzip():
+    storage = await storage_with_compound_words()
+
+    content = await export(storage, models.ExportFormatEnum.csv, compress=True, offset=1)
+
+    rows = list(csv.reader(io.StringIO(content)))
+    assert rows[0] == ["doc_id", "compound_word", "hiragana", "translation", "rating", "related_kanji"]
+    assert [row[1:] for row in rows[1:]] == [
+        ["日本", "に,ほん", "Japan,\tnation", "2", "日 本"],
+        ["亜流", "あ,りゅう", "imitator", "2", "亜 流"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_anki_tsv():
+    storage = await storage_with_compound_words()
+
+    content = await export(storage, models.ExportFormatEnum.tsv, limit=2)
+
+    lines = content.splitlines()
+    assert lines[:3] == ["#separator:tab", "#html:false", "#tags column:4"]
+    assert [line.split("\t") for line in lines[3:]] == [
+        ["亜鉛", "あ,えん", "zinc", "亜 鉛"],
+        ["日本", "に,ほん", "Japan, nation", "日 本"],
+    ]
+
+
+def test_accepts_gzip_reads_quality_values():
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("deflate, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("gzip; q=0.0, br")
+    assert not accepts_gzip("*, gzip;q=0")
+    assert not accepts_gzip("identity")
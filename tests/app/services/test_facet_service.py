@@ -0,0 +1,41 @@
+from app.services.facet_service import ItemFacetCounters, KanjiFacetCounters, strokes_bucket
+
+
+def test_strokes_bucket():
+    assert strokes_bucket(1) == "1-5"
+    assert strokes_bucket(5) == "1-5"
+    assert strokes_bucket(7) == "6-10"
+    assert strokes_bucket(None) is None
+
+
+def test_kanji_facets_follow_upserts():
+    counters = KanjiFacetCounters()
+    counters.upsert("k1", "亜", "1", "あ", "二", 7)
+    counters.upsert("k2", "哀", "1", "あ", "口", 9)
+    counters.upsert("k2", "哀", "2", "あ", "口", 9)
+
+    facets = counters.facets([])
+    assert facets.jlpt_level == {"1": 1, "2": 1}
+    assert facets.kanji_section == {"あ": 2}
+    assert facets.strokes == {"6-10": 2}
+
+    counters.upsert("k1", None)
+    assert counters.facets([]).radical == {"口": 1}
+    assert counters.facets(["哀"]).jlpt_level == {"2": 1}
+
+
+def test_item_facets_follow_upserts():
+    counters = ItemFacetCounters()
+    counters.upsert("c1", True, 1, ["亜", "鉛"])
+    counters.upsert("c2", True, 2, ["亜"])
+    counters.upsert("c3", True, 2, ["鉛"])
+
+    assert counters.ratings([], []) == {1: 1, 2: 2}
+    assert counters.ratings(["亜"], []) == {1: 1, 2: 1}
+    assert counters.ratings(["亜", "鉛"], []) is None
+    assert counters.per_kanji([], []) == {"亜": 2, "鉛": 2}
+    assert counters.per_kanji(["鉛"], [2]) == {"鉛": 1}
+
+    counters.upsert("c1", False, None, ())
+    assert counters.per_kanji([], [1]) == {}
+    assert counters.ratings([], []) == {2: 2}
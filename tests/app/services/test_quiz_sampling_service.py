@@ -0,0 +1,92 @@
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.services import quiz_sampling_service
+from app.services.quiz_sampling_service import QuizSampler
+
+
+@pytest.fixture
+def sampler(monkeypatch):
+    sampler = QuizSampler()
+    monkeypatch.setattr(quiz_sampling_service, "_kanji_by_id", {})
+    monkeypatch.setattr(quiz_sampling_service, "_kanji_weights", {})
+    monkeypatch.setattr(quiz_sampling_service, "samplers", {settings.MONGO_COMPOUND_WORD_COLLECTION: sampler})
+    return sampler
+
+
+def test_weight_changes_patch_the_cached_tables():
+    sampler = QuizSampler()
+    sampler.upsert("a", True, 0, ["亜"])
+    sampler.upsert("b", True, 1, ["亜", "鉛"])
+    sampler.upsert("c", True, 2, ["日"])
+    by_kanji = sampler.table(["亜"], [])
+    by_rating = sampler.table([], [1])
+
+    sampler.upsert("a", True, 3, ["亜"])
+
+    assert sampler.table(["亜"], []) is by_kanji
+    assert by_kanji.keys == ["a", "b"]
+    assert by_kanji.weights == [4.0, 2.0]
+    # The item entered neither rating table, which is kept as it is.
+    assert sampler.table([], [1]) is by_rating
+
+
+def test_items_entering_or_leaving_a_filter_drop_its_table():
+    sampler = QuizSampler()
+    sampler.upsert("a", True, 1, ["亜"])
+    sampler.upsert("b", True, 2, ["日"])
+    by_rating = sampler.table([], [1])
+    by_kanji = sampler.table(["日"], [])
+
+    sampler.upsert("b", True, 1, ["日"])
+
+    assert sampler.table([], [1]) is not by_rating
+    assert sampler.table([], [1]).keys == ["a", "b"]
+    assert sampler.table(["日"], []) is by_kanji
+
+    sampler.upsert("a", False, None, ())
+
+    assert sampler.table([], [1]).keys == ["b"]
+
+
+def test_reweight_patches_the_items_of_the_kanji(sampler):
+    sampler.upsert("a", True, 0, ["亜"])
+    sampler.upsert("b", True, 0, ["日"])
+    table = sampler.table([], [])
+
+    quiz_sampling_service._kanji_weights["亜"] = 2.0
+    sampler.reweight(["亜"])
+
+    assert sampler.table([], []) is table
+    assert table.weights == [2.0, 1.0]
+
+
+def test_upsert_kanji_reweights_on_insert_update_and_delete(sampler):
+    sampler.upsert("a", True, 0, ["亜"])
+    table = sampler.table([], [])
+
+    quiz_sampling_service._upsert_kanji("k1", "亜", 1)
+    assert table.weights == [quiz_sampling_service.frequency_weight(1)]
+
+    quiz_sampling_service._upsert_kanji("k1", "亜", 2500)
+    assert table.weights == [1.0]
+
+    quiz_sampling_service._upsert_kanji("k1", None, None)
+    assert quiz_sampling_service._kanji_by_id == {}
+    assert table.weights == [1.0]
+    assert sampler.table([], []) is table
+
+
+def test_on_kanji_write(sampler):
+    sampler.upsert("a", True, 1, ["亜"])
+    table = sampler.table([], [])
+    kanji = models.KanjiInDb.construct(kanji="亜", frequency_rank=1)
+
+    quiz_sampling_service._on_kanji_write("k1", kanji)
+    assert quiz_sampling_service._kanji_by_id == {"k1": ("亜", 1)}
+    assert table.weights == [2 * quiz_sampling_service.frequency_weight(1)]
+
+    quiz_sampling_service._on_kanji_write("k1", None)
+    assert quiz_sampling_service._kanji_by_id == {}
+    assert table.weights == [2.0]
@@ -0,0 +1,193 @@
+import asyncio
+
+import pytest
+from loguru import logger
+
+from app import models
+from app.core.config import settings
+from app.db.memory_repository import InMemoryStorage
+from app.services import change_listeners, compound_word_service, rating_buffer_service
+
+COLLECTION = settings.MONGO_COMPOUND_WORD_COLLECTION
+
+
+async def create(storage, word):
+    return await compound_word_service.create_compound_word(
+        storage, models.CompoundWordCreate(compound_word=word, hiragana="", translation="", related_kanji=[])
+    )
+
+
+async def stored_rating(storage, doc_id):
+    return (await storage.repository(COLLECTION).find_one_by_id(doc_id))["rating"]
+
+
+@pytest.mark.asyncio
+async def test_buffered_ratings_are_read_and_written_on_stop(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    storage = InMemoryStorage()
+    first = await create(storage, "亜鉛")
+    second = await create(storage, "日本")
+
+    await compound_word_service.update_compound_word_rating(storage, str(first.doc_id), 2)
+    updated = await compound_word_service.update_compound_word_rating(storage, str(first.doc_id), 3)
+    await compound_word_service.update_compound_word_rating(storage, str(second.doc_id), 1)
+
+    assert updated.rating == 3
+    assert await stored_rating(storage, first.doc_id) == 0
+    assert (await compound_word_service.get_compound_word_doc_by_id(storage, str(first.doc_id))).rating == 3
+    words = await compound_word_service.get_compound_words(storage)
+    assert [(word.compound_word, word.rating) for word in words] == [("亜鉛", 3), ("日本", 1)]
+
+    await rating_buffer_service.stop(storage)
+
+    assert await stored_rating(storage, first.doc_id) == 3
+    assert await stored_rating(storage, second.doc_id) == 1
+    assert (await storage.repository(COLLECTION).find_one_by_id(first.doc_id))["updated_at"]
+
+
+@pytest.mark.asyncio
+async def test_flush_size_and_discard(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "RATING_FLUSH_SIZE", 2)
+    storage = InMemoryStorage()
+    first = await create(storage, "亜鉛")
+    second = await create(storage, "日本")
+    deleted = await create(storage, "亜流")
+
+    await compound_word_service.update_compound_word_rating(storage, str(deleted.doc_id), 4)
+    await compound_word_service.delete_compound_word_doc_by_id(storage, str(deleted.doc_id))
+    await compound_word_service.update_compound_word_rating(storage, str(first.doc_id), 2)
+    assert await stored_rating(storage, first.doc_id) == 0
+
+    await compound_word_service.update_compound_word_rating(storage, str(second.doc_id), 5)
+    await rating_buffer_service.stop(storage)
+
+    assert await stored_rating(storage, first.doc_id) == 2
+    assert await stored_rating(storage, second.doc_id) == 5
+    assert await storage.repository(COLLECTION).find_one_by_id(deleted.doc_id) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_size_flush_is_logged(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "RATING_FLUSH_SIZE", 1)
+    storage = InMemoryStorage()
+    word = await create(storage, "亜鉛")
+
+    async def fail(updates):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(storage.repository(COLLECTION), "update_fields", fail)
+    messages = []
+    sink = logger.add(messages.append, level="ERROR")
+    try:
+        await compound_word_service.update_compound_word_rating(storage, str(word.doc_id), 2)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+    finally:
+        logger.remove(sink)
+
+    assert [message.record["message"] for message in messages] == ["Writing the buffered ratings failed."]
+    monkeypatch.undo()
+    await rating_buffer_service.stop(storage)
+    assert await stored_rating(storage, word.doc_id) == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_document():
+    storage = InMemoryStorage()
+
+    assert (
+        await compound_word_service.update_compound_word_rating(storage, "5f4f0e0e0e0e0e0e0e0e0e0e", 1)
+        is None
+    )
+
+
+@pytest.mark.asyncio
+async def test_rating_updates_notify_only_the_rating_listeners(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    storage = InMemoryStorage()
+    word = await create(storage, "亜鉛")
+    doc_id = str(word.doc_id)
+    notified = []
+    monkeypatch.setitem(change_listeners._write_listeners, COLLECTION, [lambda *args: notified.append(args)])
+    monkeypatch.setitem(
+        change_listeners._rating_listeners, COLLECTION, [lambda *args: notified.append(("rating", *args))]
+    )
+    monkeypatch.setitem(
+        change_listeners._rating_written_listeners,
+        COLLECTION,
+        [lambda doc_ids: notified.append(("written", doc_ids))],
+    )
+
+    await compound_word_service.update_compound_word_rating(storage, doc_id, 2)
+    assert notified == [("rating", doc_id, 2)]
+
+    await rating_buffer_service.stop(storage)
+    assert notified == [("rating", doc_id, 2), ("written", [doc_id])]
+
+
+@pytest.mark.asyncio
+async def test_replacing_waits_for_the_ratings_being_written(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    storage = InMemoryStorage()
+    word = await create(storage, "亜鉛")
+    doc_id = str(word.doc_id)
+    await compound_word_service.update_compound_word_rating(storage, doc_id, 2)
+
+    repository = storage.repository(COLLECTION)
+    update_fields = repository.update_fields
+    written = asyncio.Event()
+
+    async def slow_update_fields(updates):
+        await written.wait()
+        await update_fields(updates)
+
+    monkeypatch.setattr(repository, "update_fields", slow_update_fields)
+    flush = asyncio.ensure_future(rating_buffer_service.flush(storage))
+    await asyncio.sleep(0)
+    update = asyncio.ensure_future(
+        compound_word_service.update_compound_word_doc_by_id(
+            storage, doc_id, models.CompoundWordUpdate(rating=4)
+        )
+    )
+    await asyncio.sleep(0)
+    written.set()
+    await asyncio.gather(flush, update)
+
+    assert await stored_rating(storage, doc_id) == 4
+    await rating_buffer_service.stop(storage)
+
+
+@pytest.mark.asyncio
+async def test_replacing_keeps_the_rating_buffered_while_waiting(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    storage = InMemoryStorage()
+    word = await create(storage, "亜鉛")
+    doc_id = str(word.doc_id)
+    await compound_word_service.update_compound_word_rating(storage, doc_id, 2)
+
+    repository = storage.repository(COLLECTION)
+    update_fields = repository.update_fields
+    written = asyncio.Event()
+
+    async def slow_update_fields(updates):
+        await written.wait()
+        await update_fields(updates)
+
+    monkeypatch.setattr(repository, "update_fields", slow_update_fields)
+    flush = asyncio.ensure_future(rating_buffer_service.flush(storage))
+    await asyncio.sleep(0)
+    update = asyncio.ensure_future(
+        compound_word_service.update_compound_word_doc_by_id(
+            storage, doc_id, models.CompoundWordUpdate(translation="zinc")
+        )
+    )
+    await asyncio.sleep(0)
+    await compound_word_service.update_compound_word_rating(storage, doc_id, 3)
+    written.set()
+    await asyncio.gather(flush, update)
+
+    assert update.result().rating == 3
+    assert await stored_rating(storage, doc_id) == 3
+    await rating_buffer_service.stop(storage)
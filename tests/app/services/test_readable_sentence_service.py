@@ -0,0 +1,45 @@
+from app.services.readable_sentence_service import ReadableSentenceIndex
+
+
+def build_index():
+    index = ReadableSentenceIndex()
+    for doc_id, kanji, jouyou_number in [("k1", "亜", 1), ("k2", "鉛", 2), ("k3", "金", 3)]:
+        index.upsert_kanji(doc_id, kanji, jouyou_number)
+    index.load_sentences(
+        [
+            ("s1", "亜鉛です。", 1),
+            ("s2", "金です。", 2),
+            ("s3", "亜鉛と金。", 2),
+            ("s4", "鯖です。", 1),
+            ("s5", "ひらがなだけ。", 0),
+        ]
+    )
+    return index
+
+
+def test_query_returns_covered_sentences():
+    index = build_index()
+
+    assert index.query({"亜", "鉛"}, [], 0, 0) == (2, ["s1", "s5"])
+    assert index.query({"亜", "鉛", "金"}, [], 0, 0) == (4, ["s1", "s2", "s3", "s5"])
+    # Sentences with kanji outside of the jouyou list are never readable.
+    assert index.query({"亜", "鉛", "金", "鯖"}, [], 0, 0) == (4, ["s1", "s2", "s3", "s5"])
+
+
+def test_query_filters_ratings_and_paginates():
+    index = build_index()
+
+    assert index.query({"亜", "鉛", "金"}, [2], 0, 0) == (2, ["s2", "s3"])
+    assert index.query({"亜", "鉛", "金"}, [], 1, 2) == (4, ["s2", "s3"])
+
+
+def test_upserts_patch_the_index():
+    index = build_index()
+    index.upsert_sentence("s1", None, None)
+    index.upsert_sentence("s6", "亜です。", 3)
+    index.upsert_sentence("s2", "鉛です。", 2)
+
+    assert index.query({"亜", "鉛"}, [], 0, 0) == (3, ["s6", "s2", "s5"])
+
+    index.upsert_kanji("k4", "鯖", 4)
+    assert index.query({"鯖"}, [], 0, 0) == (2, ["s4", "s5"])
@@ -0,0 +1,56 @@
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.db.memory_repository import InMemoryStorage
+from app.services import compound_word_service, kanji_service, related_kanji_service, relink_service
+from app.services.related_kanji_service import JouyouKanjiSet
+
+
+def test_link_adds_jouyou_kanji_of_the_text():
+    jouyou_kanji = JouyouKanjiSet()
+    jouyou_kanji.upsert("k1", "日", 1)
+    jouyou_kanji.upsert("k2", "本", 2)
+    jouyou_kanji.upsert("k3", "鉛", None)
+
+    assert jouyou_kanji.link("日本の鉛", ["亜"]) == ["亜", "日", "本"]
+    assert jouyou_kanji.link("日本", ["本"]) == ["本", "日"]
+    assert jouyou_kanji.link(None, None) == []
+
+    jouyou_kanji.upsert("k2", None, None)
+    assert jouyou_kanji.link("日本", []) == ["日"]
+
+
+async def create_kanji(storage, kanji, jouyou_number):
+    await kanji_service.create_kanji(
+        storage,
+        models.KanjiCreate(kanji=kanji, jouyou_number=jouyou_number, onyomi=[], kunyomi=[], meaning=[]),
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_and_relink():
+    storage = InMemoryStorage()
+    await create_kanji(storage, "日", 1)
+    repository = storage.repository(settings.MONGO_COMPOUND_WORD_COLLECTION)
+    unlinked_id = await repository.insert_one(
+        {"compound_word": "本日", "hiragana": "", "translation": "", "related_kanji": ["本"]}
+    )
+    await related_kanji_service.load_jouyou_kanji(storage)
+
+    created = await compound_word_service.create_compound_word(
+        storage, models.CompoundWordCreate(compound_word="日本", hiragana="", translation="", related_kanji=[])
+    )
+    assert created.related_kanji == ["日"]
+
+    await create_kanji(storage, "本", 2)
+    status = await relink_service.relink_all(storage)
+
+    assert status.error is None and not status.running
+    assert status.scanned[settings.MONGO_COMPOUND_WORD_COLLECTION] == 2
+    assert status.changed[settings.MONGO_COMPOUND_WORD_COLLECTION] == 2
+    assert (await repository.find_one_by_id(unlinked_id))["related_kanji"] == ["本", "日"]
+    assert (await repository.find_one_by_id(created.doc_id))["related_kanji"] == ["日", "本"]
+
+    status = await relink_service.relink_all(storage)
+    assert status.changed[settings.MONGO_COMPOUND_WORD_COLLECTION] == 0
@@ -0,0 +1,56 @@
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.db.memory_repository import InMemoryStorage
+from app.services import compound_word_service, sync_service
+
+
+def compound_word(word, related_kanji):
+    return models.CompoundWordCreate(
+        compound_word=word, hiragana="", translation="", related_kanji=related_kanji
+    )
+
+
+@pytest.mark.asyncio
+async def test_changes_since_watermark(monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_WATERMARK_LAG_SECONDS", 0)
+    storage = InMemoryStorage()
+    kept = await compound_word_service.create_compound_word(storage, compound_word("亜鉛", ["亜", "鉛"]))
+    updated = await compound_word_service.create_compound_word(storage, compound_word("日本", ["日", "本"]))
+    deleted = await compound_word_service.create_compound_word(storage, compound_word("亜流", ["亜", "流"]))
+
+    first = await sync_service.get_changes(storage)
+    assert first.reset
+    assert [item.compound_word for item in first.compound_words] == ["亜鉛", "日本", "亜流"]
+
+    await compound_word_service.update_compound_word_doc_by_id(
+        storage, str(updated.doc_id), models.CompoundWordUpdate(rating=3)
+    )
+    await compound_word_service.delete_compound_word_doc_by_id(storage, str(deleted.doc_id))
+
+    second = await sync_service.get_changes(storage, first.watermark)
+    assert not second.reset
+    assert [(item.compound_word, item.rating) for item in second.compound_words] == [("日本", 3)]
+    assert second.deleted_compound_words == [str(deleted.doc_id)]
+    assert second.kanji == []
+
+    third = await sync_service.get_changes(storage, second.watermark)
+    assert third.compound_words == [] and third.deleted_compound_words == []
+    assert str(kept.doc_id) not in second.deleted_compound_words
+
+
+@pytest.mark.asyncio
+async def test_drop_resets_clients(monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_WATERMARK_LAG_SECONDS", 0)
+    storage = InMemoryStorage()
+    await compound_word_service.create_compound_word(storage, compound_word("亜鉛", ["亜", "鉛"]))
+    first = await sync_service.get_changes(storage)
+
+    await storage.repository(settings.MONGO_COMPOUND_WORD_COLLECTION).drop()
+    await sync_service.record_drop(storage, settings.MONGO_COMPOUND_WORD_COLLECTION)
+    await compound_word_service.create_compound_word(storage, compound_word("日本", ["日", "本"]))
+
+    second = await sync_service.get_changes(storage, first.watermark)
+    assert second.reset
+    assert [item.compound_word for item in second.compound_words] == ["日本"]
@@ -0,0 +1,36 @@
+from app import models
+from app.services.text_annotation_service import TextAnnotationIndex
+
+
+def test_annotate_after_patching():
+    index = TextAnnotationIndex()
+    index.upsert(models.AnnotationKindEnum.kanji, "k1", "亜")
+    index.upsert(models.AnnotationKindEnum.compound_word, "c1", "亜鉛")
+
+    annotations = index.annotate("亜鉛")
+    assert [(a.start, a.end, a.kind, a.doc_id) for a in annotations] == [
+        (0, 2, models.AnnotationKindEnum.compound_word, "c1"),
+        (0, 1, models.AnnotationKindEnum.kanji, "k1"),
+    ]
+
+    index.upsert(models.AnnotationKindEnum.compound_word, "c1", None)
+    index.upsert(models.AnnotationKindEnum.compound_word, "c2", "鉛")
+
+    annotations = index.annotate("亜鉛")
+    assert [(a.surface, a.doc_id) for a in annotations] == [("亜", "k1"), ("鉛", "c2")]
+
+
+def test_automaton_is_rebuilt_only_for_new_surfaces():
+    index = TextAnnotationIndex()
+    index.upsert(models.AnnotationKindEnum.kanji, "k1", "亜")
+    index.annotate("亜")
+    automaton = index._automaton
+
+    index.upsert(models.AnnotationKindEnum.kanji, "k1", None)
+    index.upsert(models.AnnotationKindEnum.kanji, "k2", "亜")
+    index.annotate("亜")
+    assert index._automaton is automaton
+
+    index.upsert(models.AnnotationKindEnum.kanji, "k3", "鉛")
+    assert [a.doc_id for a in index.annotate("亜鉛")] == ["k2", "k3"]
+    assert index._automaton is not automaton
@@ -0,0 +1,59 @@
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.db.memory_repository import InMemoryStorage
+from app.services import compound_word_service, rating_buffer_service, total_count_service
+
+
+def compound_word(word, related_kanji, rating=0):
+    return models.CompoundWordCreate(
+        compound_word=word, hiragana="", translation="", related_kanji=related_kanji, rating=rating
+    )
+
+
+@pytest.mark.asyncio
+async def test_estimated_counts_are_cached_until_a_write():
+    storage = InMemoryStorage()
+    repository = storage.repository(settings.MONGO_COMPOUND_WORD_COLLECTION)
+    await compound_word_service.create_compound_word(storage, compound_word("亜鉛", ["亜", "鉛"]))
+    filters = models.CompoundWordFilterParams(related_kanji=["亜"])
+    estimated, exact = models.TotalCountEnum.estimated, models.TotalCountEnum.exact
+
+    assert await compound_word_service.count_compound_words(storage, filters, estimated) == 1
+
+    # Written around the service, the cache doesn't see it.
+    await repository.insert_one({"compound_word": "亜流", "related_kanji": ["亜"]})
+    assert await compound_word_service.count_compound_words(storage, filters, estimated) == 1
+    assert await compound_word_service.count_compound_words(storage, filters, exact) == 2
+
+    await compound_word_service.create_compound_word(storage, compound_word("日本", ["日", "本"]))
+    assert await compound_word_service.count_compound_words(storage, filters, estimated) == 2
+    assert (
+        await compound_word_service.count_compound_words(
+            storage, models.CompoundWordFilterParams(), estimated
+        )
+        == 3
+    )
+
+
+@pytest.mark.asyncio
+async def test_rating_counts_are_invalidated_when_the_ratings_are_written(monkeypatch):
+    monkeypatch.setattr(settings, "RATING_FLUSH_INTERVAL_SECONDS", 60.0)
+    storage = InMemoryStorage()
+    word = await compound_word_service.create_compound_word(storage, compound_word("亜鉛", ["亜", "鉛"]))
+    filters = models.CompoundWordFilterParams(ratings=[2])
+    estimated = models.TotalCountEnum.estimated
+
+    await compound_word_service.update_compound_word_rating(storage, str(word.doc_id), 2)
+    assert await compound_word_service.count_compound_words(storage, filters, estimated) == 0
+
+    await rating_buffer_service.flush(storage)
+    assert await compound_word_service.count_compound_words(storage, filters, estimated) == 1
+    await rating_buffer_service.stop(storage)
+
+
+def test_cache_key_ignores_order_and_duplicates():
+    assert total_count_service._cache_key("c", {"rating": [2, 1], "related_kanji": ["亜"]}) == (
+        total_count_service._cache_key("c", {"related_kanji": ["亜", "亜"], "rating": [1, 2]})
+    )
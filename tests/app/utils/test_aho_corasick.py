@@ -0,0 +1,29 @@
+from app.utils.aho_corasick import AhoCorasickAutomaton
+
+
+def test_find_all_overlapping_matches():
+    automaton = AhoCorasickAutomaton(["亜", "亜鉛", "鉛", "鉛筆", "筆"])
+    text = "亜鉛と鉛筆"
+
+    matches = sorted((start, end, text[start:end]) for start, end in automaton.find_all(text))
+
+    assert matches == [
+        (0, 1, "亜"),
+        (0, 2, "亜鉛"),
+        (1, 2, "鉛"),
+        (3, 4, "鉛"),
+        (3, 5, "鉛筆"),
+        (4, 5, "筆"),
+    ]
+
+
+def test_find_all_follows_failure_links():
+    automaton = AhoCorasickAutomaton(["abcd", "bc", "c"])
+
+    assert sorted(automaton.find_all("xabcx")) == [(2, 4), (3, 4)]
+
+
+def test_find_all_without_patterns():
+    automaton = AhoCorasickAutomaton([])
+
+    assert list(automaton.find_all("亜鉛")) == []
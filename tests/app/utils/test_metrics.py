@@ -0,0 +1,27 @@
+from app.utils.metrics import Counter, Histogram, Registry
+
+
+def test_render_counter_and_histogram(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr("app.utils.metrics.registry", registry)
+
+    requests = Counter("test_requests_total", "Requests.", ("route",))
+    duration = Histogram("test_duration_seconds", "Duration.", buckets=(0.1, 1.0))
+    requests.labels("/kanjis/{doc_id}").inc()
+    requests.labels("/kanjis/{doc_id}").inc(2)
+    duration.observe(0.05)
+    duration.observe(0.1)
+    duration.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP test_requests_total Requests.",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{route="/kanjis/{doc_id}"} 3',
+        "# HELP test_duration_seconds Duration.",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{le="0.1"} 2',
+        'test_duration_seconds_bucket{le="1"} 2',
+        'test_duration_seconds_bucket{le="+Inf"} 3',
+        "test_duration_seconds_sum 5.15",
+        "test_duration_seconds_count 3",
+    ]
@@ -0,0 +1,38 @@
+import sys
+import time
+
+import pytest
+
+from app.utils.profiling import SamplingProfiler, list_profiles, read_profile, save_profile
+
+
+def busy_function(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_profiler_samples_the_current_task():
+    switch_interval = sys.getswitchinterval()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    busy_function(0.1)
+    profiler.stop()
+
+    assert profiler.samples
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profiler.folded().splitlines())
+    assert any("busy_function" in stack.split(";")[-1] for stack in profiler.samples)
+    assert sys.getswitchinterval() == switch_interval
+
+
+def test_save_list_and_read_profiles(tmp_path):
+    directory = str(tmp_path)
+    for name in ("first", "second", "third"):
+        save_profile(directory, name, f"main;{name} 1\n", max_files=2)
+        time.sleep(0.01)
+
+    assert [profile["name"] for profile in list_profiles(directory)] == ["third.folded", "second.folded"]
+    assert read_profile(directory, "third.folded") == "main;third 1\n"
+    assert read_profile(directory, "first.folded") is None
+    assert read_profile(directory, "../third.folded") is None
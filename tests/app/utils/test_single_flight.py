@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import single_flight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_call():
+    calls = []
+
+    @single_flight("test_reads")
+    async def read(connection, filters):
+        calls.append(filters)
+        await asyncio.sleep(0.01)
+        return [filters]
+
+    connection = object()
+    first, second, other = await asyncio.gather(
+        read(connection, "a"), read(connection, "a"), read(connection, "b")
+    )
+    assert first is second
+    assert other == ["b"]
+    assert calls == ["a", "b"]
+
+    await read(connection, "a")
+    assert calls == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_call():
+    @single_flight("test_cancel")
+    async def read(connection):
+        await asyncio.sleep(0.01)
+        return "result"
+
+    connection = object()
+    leader = asyncio.ensure_future(read(connection))
+    follower = asyncio.ensure_future(read(connection))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "result"
+
+
+@pytest.mark.asyncio
+async def test_forget_starts_a_new_call():
+    calls = 0
+
+    @single_flight("test_forget")
+    async def read(connection):
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.01)
+        return call
+
+    connection = object()
+    before = asyncio.ensure_future(read(connection))
+    await asyncio.sleep(0)
+    read.flight.forget()
+
+    assert await asyncio.gather(before, read(connection)) == [1, 2]
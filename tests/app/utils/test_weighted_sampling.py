@@ -0,0 +1,39 @@
+from collections import Counter
+from random import Random
+
+from app.utils.weighted_sampling import WeightTable
+
+
+def test_sample_is_without_replacement():
+    table = WeightTable(["a", "b", "c", "d", "e"], [1, 2, 3, 4, 5])
+    rng = Random(1)
+
+    for size in range(7):
+        sample = table.sample(size, rng)
+        assert len(sample) == min(size, 5)
+        assert len(set(sample)) == len(sample)
+
+
+def test_sample_skips_zero_weights():
+    table = WeightTable(["a", "b", "c"], [0, 1, 0])
+
+    assert len(table) == 1
+    assert table.sample(2, Random(1)) == ["b"]
+
+
+def test_sample_follows_weights():
+    table = WeightTable(["light", "heavy"] + [f"other{i}" for i in range(8)], [1, 10] + [1] * 8)
+    rng = Random(1)
+
+    counts = Counter(key for _ in range(2000) for key in table.sample(1, rng))
+    assert counts["heavy"] > 5 * counts["light"]
+
+
+def test_set_weight_is_used_by_the_next_draw():
+    table = WeightTable(["a", "b"] + [f"other{i}" for i in range(8)], [1] * 10)
+    rng = Random(1)
+
+    table.set_weight(1, 100)
+
+    counts = Counter(key for _ in range(500) for key in table.sample(1, rng))
+    assert counts["b"] > 400